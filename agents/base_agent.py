@@ -0,0 +1,247 @@
+import io
+import json
+import math
+import time
+import random
+import base64
+import asyncio
+import hashlib
+import weakref
+import threading
+from collections import deque, OrderedDict
+
+from PIL import Image
+import anthropic
+from anthropic import Anthropic, AsyncAnthropic
+
+# One client (and so one HTTP connection pool) per API key, shared by every agent. Async
+# clients are bound to the event loop they were created on, so they are pooled per loop.
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504, 529)
+
+# Encoded payloads of recently sent images, keyed by pixel digest and encoding settings. Charts
+# that did not change since the last step (or that go to several agents) are encoded once.
+_payloads = OrderedDict()
+_payloads_lock = threading.Lock()
+MAX_PAYLOADS = 64
+
+
+def shared_client(api_key, asynchronous=False):
+    """
+    Return the pooled `Anthropic` (or `AsyncAnthropic`) client for `api_key`.
+
+    Retries are handled by `BaseAgent`, so the SDK's own retries are disabled.
+    """
+    with _clients_lock:
+        if asynchronous:
+            clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+            if api_key not in clients:
+                clients[api_key] = AsyncAnthropic(api_key=api_key, max_retries=0)
+            return clients[api_key]
+        if api_key not in _clients:
+            _clients[api_key] = Anthropic(api_key=api_key, max_retries=0)
+        return _clients[api_key]
+
+
+def retry_after(error):
+    """
+    Seconds requested by the server's retry-after header, or None.
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRY_STATUS
+
+
+def tile_images(images, columns=2):
+    """
+    Paste the images into one grid image (e.g. the 4 timeframe charts as 2x2), left to right, top to bottom.
+    """
+    rows = math.ceil(len(images) / columns)
+    cell_width = max(image.width for image in images)
+    cell_height = max(image.height for image in images)
+    sheet = Image.new("RGB", (cell_width * columns, cell_height * rows), "white")
+    for i, image in enumerate(images):
+        sheet.paste(image, ((i % columns) * cell_width, (i // columns) * cell_height))
+    return sheet
+
+
+class BaseAgent:
+    """
+    Shared request logic of the chart analysis agents.
+
+    Subclasses set `agent_instruction` (and optionally `max_tokens`). The base class encodes
+    the chart images as JPEG at `image_quality`, and reuses the encoding of an image it has
+    recently sent. Downscaling to `image_max_side` pixels on the long edge is opt-in. With `tile=True` the charts are sent as one grid image. The static
+    instruction block is marked for prompt caching. Transient API errors are retried with
+    jittered exponential backoff, and a retry-after header sets the wait instead. Request
+    size, latency and attempts of every call are kept in `metrics`.
+    """
+    model = "claude-3-5-sonnet-20241022"
+    max_tokens = 300
+    temperature = 0.0
+    agent_instruction = ""
+
+    def __init__(
+        self,
+        api_key,
+        client=None,
+        async_client=None,
+        cache=None,
+        max_retries: int=4,
+        backoff: float=1.0,
+        max_backoff: float=30.0,
+        image_max_side: int=None,
+        image_quality: int=75,
+        tile: bool=False,
+        prompt_cache: bool=True
+    ):
+        self.api_key = api_key
+        self.anthropic = shared_client(api_key) if client is None else client
+        # None uses the pooled client of the running event loop, see `shared_client`
+        self.async_anthropic = async_client
+        # Optional ResponseCache, identical requests are answered from it instead of the model
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.image_max_side = image_max_side
+        self.image_quality = image_quality
+        self.tile = tile
+        self.prompt_cache = prompt_cache
+        self.metrics = deque(maxlen=1000)
+
+    def encode_image(self, image):
+        """
+        Base64 JPEG payload of a PIL image, from the payload cache when it was encoded before.
+        """
+        digest = hashlib.sha1(image.tobytes()).hexdigest()
+        key = (digest, image.mode, image.size, self.image_max_side, self.image_quality)
+        with _payloads_lock:
+            if key in _payloads:
+                _payloads.move_to_end(key)
+                return _payloads[key]
+        data = self._encode(image)
+        with _payloads_lock:
+            _payloads[key] = data
+            while len(_payloads) > MAX_PAYLOADS:
+                _payloads.popitem(last=False)
+        return data
+
+    def _encode(self, image):
+        image = image.convert("RGB")
+        if self.image_max_side is not None and max(image.size) > self.image_max_side:
+            image = image.copy()
+            image.thumbnail((self.image_max_side, self.image_max_side), Image.LANCZOS)
+        img_buffer = io.BytesIO()
+        image.save(img_buffer, format="JPEG", quality=self.image_quality)
+        return base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+
+    def request(self, images):
+        """
+        Build the `messages.create` arguments for a list of PIL chart images.
+        """
+        instruction = {"type": "text", "text": self.agent_instruction}
+        if self.prompt_cache:
+            instruction["cache_control"] = {"type": "ephemeral"}
+        chart_messages = [instruction]
+        if self.tile and len(images) > 1:
+            chart_messages.append({"type": "text", "text": f"The {len(images)} charts are tiled in one image, 2 per row, left to right then top to bottom."})
+            images = [tile_images(images)]
+        for image in images:
+            chart_messages.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg",
+                    "data": self.encode_image(image)
+                }
+            })
+        return dict(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            messages=[
+                {
+                    "role": "user",
+                    "content": chart_messages
+                }
+            ]
+        )
+
+    def _delay(self, error, attempt):
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        wait = retry_after(error)
+        if wait is None:
+            # Full jitter: spreads out retries of concurrent callers
+            wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        return wait
+
+    def _record(self, request, start, attempts, cached):
+        self.metrics.append({
+            "request_bytes": len(json.dumps(request)),
+            "latency": time.perf_counter() - start,
+            "attempts": attempts,
+            "cached": cached,
+        })
+
+    def analyze(self, images):
+        request = self.request(images)
+        start = time.perf_counter()
+        text = self.cache.get(request) if self.cache is not None else None
+        if text is not None:
+            self._record(request, start, 0, True)
+            return text
+        attempt = 0
+        while True:
+            try:
+                message = self.anthropic.messages.create(**request)
+                break
+            except Exception as e:
+                wait = self._delay(e, attempt)
+                if wait is None:
+                    raise
+                attempt += 1
+                time.sleep(wait)
+        text = message.content[0].text
+        if self.cache is not None:
+            self.cache.put(request, text)
+        self._record(request, start, attempt + 1, False)
+        return text
+
+    async def analyze_async(self, images):
+        request = self.request(images)
+        start = time.perf_counter()
+        text = self.cache.get(request) if self.cache is not None else None
+        if text is not None:
+            self._record(request, start, 0, True)
+            return text
+        client = self.async_anthropic if self.async_anthropic is not None else shared_client(self.api_key, asynchronous=True)
+        attempt = 0
+        while True:
+            try:
+                message = await client.messages.create(**request)
+                break
+            except Exception as e:
+                wait = self._delay(e, attempt)
+                if wait is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(wait)
+        text = message.content[0].text
+        if self.cache is not None:
+            self.cache.put(request, text)
+        self._record(request, start, attempt + 1, False)
+        return text
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+
+
+class AnthropicBatchBackend:
+    """
+    Batch backend on the Message Batches API (`client.messages.batches`).
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests):
+        """
+        Submit [(custom_id, params)] and return the batch id.
+        """
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests]
+        )
+        return batch.id
+
+    def ended(self, batch_id):
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id):
+        """
+        Yield (custom_id, text, error) for every request of an ended batch.
+        """
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, entry.result.message.content[0].text, None
+            else:
+                yield entry.custom_id, None, entry.result.type
+
+
+class LocalBatchBackend:
+    """
+    File based stand-in for the batch API, for tests and offline runs.
+
+    Submitted batches are written to `directory`. A batch is processed the first time its
+    status is checked, by sending each request through `client` (e.g. a `StubClient`).
+    """
+    def __init__(self, directory, client):
+        self.directory = directory
+        self.client = client
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, requests):
+        batch_id = f"local_{uuid.uuid4().hex}"
+        with open(self._path(batch_id, "requests"), "w") as f:
+            for custom_id, params in requests:
+                f.write(json.dumps({"custom_id": custom_id, "params": params}) + "\n")
+        return batch_id
+
+    def ended(self, batch_id):
+        if not os.path.exists(self._path(batch_id, "results")):
+            tmp = self._path(batch_id, "results") + ".tmp"
+            with open(self._path(batch_id, "requests")) as requests, open(tmp, "w") as results:
+                for line in requests:
+                    request = json.loads(line)
+                    try:
+                        text, error = self.client.messages.create(**request["params"]).content[0].text, None
+                    except Exception as e:
+                        text, error = None, repr(e)
+                    results.write(json.dumps({"custom_id": request["custom_id"], "text": text, "error": error}) + "\n")
+            os.replace(tmp, self._path(batch_id, "results"))
+        return True
+
+    def results(self, batch_id):
+        with open(self._path(batch_id, "results")) as f:
+            for line in f:
+                result = json.loads(line)
+                yield result["custom_id"], result["text"], result["error"]
+
+
+class BatchRun:
+    """
+    Offline agent requests of a replay, submitted in bulk and joined back to their steps.
+
+    Everything lives in `directory` and is appended as it happens, so an interrupted run
+    continues where it stopped:
+    - requests.jsonl: one recorded request per (step, agent), written by `record`
+    - batches.jsonl: the submitted batches and the requests they contain
+    - results.jsonl: the collected responses
+    """
+    def __init__(self, directory, backend, max_batch_requests: int=10000, max_batch_bytes: int=200 * 2**20):
+        """
+        Parameters:
+        directory (str): State directory of the run.
+        backend: `AnthropicBatchBackend` or `LocalBatchBackend` (submit, ended, results).
+        max_batch_requests (int): Requests per submitted batch.
+        max_batch_bytes (int): Serialized request bytes per submitted batch (the API caps batch size).
+        """
+        self.directory = directory
+        self.backend = backend
+        self.max_batch_requests = max_batch_requests
+        self.max_batch_bytes = max_batch_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.recorded = {}
+        for record in self._read("requests"):
+            self.recorded[record["custom_id"]] = (record["step_time"], record["agent"])
+        self.batches = {batch["batch_id"]: batch["custom_ids"] for batch in self._read("batches")}
+        self.submitted = {custom_id for custom_ids in self.batches.values() for custom_id in custom_ids}
+        self.results = {result["custom_id"]: result for result in self._read("results")}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def _read(self, name):
+        if not os.path.exists(self._path(name)):
+            return
+        with open(self._path(name)) as f:
+            for line in f:
+                # A line cut short by an interruption is dropped, it is recorded again on resume
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _append(self, name, record):
+        with open(self._path(name), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def custom_id(step_time, agent):
+        return f"{type(agent).__name__}-{int(step_time)}"
+
+    def has(self, step_time, agent):
+        """
+        Whether the request of `agent` at `step_time` is already recorded (lets a replay skip rendering it).
+        """
+        return self.custom_id(step_time, agent) in self.recorded
+
+    def record(self, step_time, agent, images):
+        """
+        Record the request `agent` would send for `images` at `step_time` (epoch ms).
+        """
+        custom_id = self.custom_id(step_time, agent)
+        if custom_id in self.recorded:
+            return custom_id
+        self._append("requests", {
+            "custom_id": custom_id,
+            "step_time": int(step_time),
+            "agent": type(agent).__name__,
+            "params": agent.request(images),
+        })
+        self.recorded[custom_id] = (int(step_time), type(agent).__name__)
+        return custom_id
+
+    def submit(self):
+        """
+        Submit every recorded request not yet in a batch.
+
+        Returns:
+        list: The ids of the new batches.
+        """
+        batch_ids, chunk, chunk_bytes = [], [], 0
+        for record in self._read("requests"):
+            if record["custom_id"] in self.submitted:
+                continue
+            size = len(json.dumps(record["params"]))
+            if chunk and (len(chunk) >= self.max_batch_requests or chunk_bytes + size > self.max_batch_bytes):
+                batch_ids.append(self._submit_chunk(chunk))
+                chunk, chunk_bytes = [], 0
+            chunk.append((record["custom_id"], record["params"]))
+            chunk_bytes += size
+        if chunk:
+            batch_ids.append(self._submit_chunk(chunk))
+        return batch_ids
+
+    def _submit_chunk(self, chunk):
+        batch_id = self.backend.submit(chunk)
+        custom_ids = [custom_id for custom_id, _ in chunk]
+        self._append("batches", {"batch_id": batch_id, "custom_ids": custom_ids, "submitted": time.time()})
+        self.batches[batch_id] = custom_ids
+        self.submitted.update(custom_ids)
+        return batch_id
+
+    def pending(self):
+        """
+        Ids of the submitted batches whose results have not been collected.
+        """
+        return [batch_id for batch_id, custom_ids in self.batches.items() if any(c not in self.results for c in custom_ids)]
+
+    def poll(self, wait: bool=False, interval: float=60.0):
+        """
+        Collect the results of ended batches; with `wait`, block until every batch has ended.
+
+        Returns:
+        int: The number of batches still pending.
+        """
+        while True:
+            for batch_id in self.pending():
+                if not self.backend.ended(batch_id):
+                    continue
+                for custom_id, text, error in self.backend.results(batch_id):
+                    if custom_id in self.results:
+                        continue
+                    result = {"custom_id": custom_id, "text": text, "error": error}
+                    self._append("results", result)
+                    self.results[custom_id] = result
+            pending = len(self.pending())
+            if not wait or pending == 0:
+                return pending
+            time.sleep(interval)
+
+    def joined(self):
+        """
+        Join the collected responses back to their steps.
+
+        Returns:
+        dict: step_time (epoch ms) -> {agent class name: response text, None if the request failed}.
+        """
+        steps = {}
+        for custom_id, (step_time, agent) in sorted(self.recorded.items(), key=lambda item: item[1]):
+            if custom_id in self.results:
+                steps.setdefault(step_time, {})[agent] = self.results[custom_id]["text"]
+        return steps
+
+    def fill_cache(self, cache):
+        """
+        Store the collected responses in a `ResponseCache`, e.g. to replay the run deterministically.
+        """
+        for record in self._read("requests"):
+            result = self.results.get(record["custom_id"])
+            if result is not None and result["text"] is not None:
+                cache.put(record["params"], result["text"])
@@ -0,0 +1,60 @@
+import time
+import asyncio
+
+
+class AgentOrchestrator:
+    """
+    Run many agent pipelines (e.g. one per symbol) concurrently on one event loop.
+
+    Every model call goes through `call`. A semaphore caps the number of requests in
+    flight across all pipelines, and each call has its own timeout. Because the pipelines
+    only wait while their requests are in flight, stage one of one symbol overlaps with
+    stage two of another. `gather` returns the results in the order the pipelines were
+    given, with failures (including timeouts) in place of the result.
+    """
+    def __init__(self, max_in_flight: int=8, timeout: float=120.0):
+        """
+        Parameters:
+        max_in_flight (int): Maximum number of concurrent model requests.
+        timeout (float): Seconds before a single request is abandoned, None for no limit.
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.calls = 0
+        self.timeouts = 0
+        self.request_seconds = 0.0
+        self._semaphore = None
+
+    async def call(self, agent, images):
+        """
+        Run `agent.analyze_async(images)` within the in-flight cap and the timeout.
+        """
+        # Created lazily so it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                return await asyncio.wait_for(agent.analyze_async(images), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            finally:
+                self.calls += 1
+                self.request_seconds += time.perf_counter() - start
+
+    async def gather(self, pipelines):
+        """
+        Await the pipeline coroutines concurrently.
+
+        Returns:
+        list: One entry per pipeline in the given order, the exception raised for failed pipelines.
+        """
+        return await asyncio.gather(*pipelines, return_exceptions=True)
+
+    def run(self, pipelines):
+        """
+        Synchronous entry point: run `gather` on a new event loop.
+        """
+        self._semaphore = None
+        return asyncio.run(self.gather(pipelines))
@@ -0,0 +1,132 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class CacheMiss(KeyError):
+    """
+    Raised in replay mode when a request has no cached response.
+    """
+
+
+def request_key(request):
+    """
+    Digest of a `messages.create` request: model, parameters, text blocks and a SHA-256 of
+    every image, so identical charts and prompts map to the same key.
+    """
+    def canonical(value):
+        if isinstance(value, dict):
+            if value.get("type") == "base64" and "data" in value:
+                return {"media_type": value.get("media_type"), "sha256": hashlib.sha256(value["data"].encode()).hexdigest()}
+            return {key: canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(item) for item in value]
+        return value
+    text = json.dumps(canonical(request), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk (SQLite) cache of agent responses, keyed by `request_key`.
+
+    Entries expire after `ttl` seconds (None keeps them forever). Beyond `max_entries`, the
+    least recently used entries are evicted. In replay mode the cache is read-only and a
+    miss raises `CacheMiss` instead of letting the agent call the model, so a backtest
+    reproduces a recorded run exactly.
+    """
+    def __init__(self, path: str="agent_cache.sqlite", ttl: float=None, max_entries: int=100000, replay: bool=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        # Agents may be called from worker threads, access is serialised by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, request):
+        """
+        Return the cached response text for `request`, or None (CacheMiss in replay mode).
+        """
+        key = request_key(request)
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                if not self.replay:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.connection.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                if self.replay:
+                    raise CacheMiss(key)
+                return None
+            self.hits += 1
+            if not self.replay:
+                self.connection.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self.connection.commit()
+            return row[0]
+
+    def put(self, request, response):
+        """
+        Store the response text of `request`. Ignored in replay mode.
+        """
+        if self.replay:
+            return
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (request_key(request), request.get("model"), response, now, now),
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.connection.commit()
+            self.stores += 1
+
+    def purge_expired(self):
+        """
+        Delete the entries older than the TTL.
+
+        Returns:
+        int: The number of entries deleted.
+        """
+        if self.ttl is None or self.replay:
+            return 0
+        with self._lock:
+            deleted = self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            self.connection.commit()
+        return deleted
+
+    def stats(self):
+        """
+        Return hit/miss counters. Each hit is a model round trip saved.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "saved_round_trips": self.hits,
+            "stores": self.stores,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,67 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+DEFAULT_RESPONSE = "< Support: [100.0: stub level], Resistance: [110.0: stub level]> \
+< Short Term: NO_TRADE: <0: 0: 0><stub response> > < Long Term: NO_TRADE: <0: 0: 0><stub response> >"
+
+
+def default_responder(request):
+    return DEFAULT_RESPONSE
+
+
+class _StubBase:
+    def __init__(self, latency: float=0.5, responder=None):
+        """
+        Parameters:
+        latency (float): Seconds each `messages.create` call takes.
+        responder (callable): responder(request kwargs) -> response text.
+        """
+        self.latency = latency
+        self.responder = default_responder if responder is None else responder
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def _enter(self, request):
+        with self._lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self, request):
+        with self._lock:
+            self.in_flight -= 1
+        text = self.responder(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(input_tokens=0, output_tokens=len(text.split())),
+        )
+
+
+class StubClient(_StubBase):
+    """
+    Stand-in for `anthropic.Anthropic` that answers `messages.create` locally after `latency`
+    seconds. It records every request and the peak number of concurrent calls.
+    """
+    def create(self, **request):
+        self._enter(request)
+        time.sleep(self.latency)
+        return self._exit(request)
+
+
+class AsyncStubClient(_StubBase):
+    """
+    Stand-in for `anthropic.AsyncAnthropic`, see `StubClient`.
+    """
+    async def create(self, **request):
+        self._enter(request)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            # Cancelled calls (e.g. on timeout) still leave the in-flight count balanced
+            response = self._exit(request)
+        return response
@@ -1,10 +1,10 @@
-import io
-import base64
-from anthropic import Anthropic
+from agents.base_agent import BaseAgent
 
-class TradingAgent:
-    def __init__(self, api_key):
-        self.anthropic = Anthropic(api_key=api_key)
+class TradingAgent(BaseAgent):
+    max_tokens = 300
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(api_key, **kwargs)
         self.agent_instruction = "You are a professional trader. Your role is to analyze the given candlestick charts. \
             Be as accurate as possible with mentioning price values. When given multiple timeframes of the chart, \
             analyze each one individually, and then combine the analysis from all of them into giving a holistic \
@@ -35,33 +35,3 @@ class TradingAgent:
    			Your output must strictly be in the following format: \
             <<BUY, SELL, or NO_TRADE>: <Exit Price>: <Reasoning for the action> >\
 		"
-            
-        self.trading_agent_message = {"type": "text", "text": self.agent_instruction}
-
-    def analyze(self, images):
-        chart_messages = [self.trading_agent_message]
-        for image in images:
-            img_buffer = io.BytesIO()
-            image.save(img_buffer, format="JPEG")
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-            chart_messages.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": img_base64
-                }
-            })
-        
-        message = self.anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=300,
-                    temperature=0.0,
-                    messages=[
-                            {
-                            "role": "user",
-                            "content": chart_messages
-                        }
-                    ]
-                )
-        return message.content[0].text
\ No newline at end of file
@@ -1,10 +1,10 @@
-import io
-import base64
-from anthropic import Anthropic
+from agents.base_agent import BaseAgent
 
-class TrendAnalysisAgent:
-    def __init__(self, api_key):
-        self.anthropic = Anthropic(api_key=api_key)
+class TrendAnalysisAgent(BaseAgent):
+    max_tokens = 200
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(api_key, **kwargs)
         self.agent_instruction = "You are a professional trader. Your role is to analyze the given candlestick charts. \
             Be as accurate as possible with mentioning price values. When given multiple timeframes of the chart, \
             analyze each one individually, and then combine the analysis from all of them into giving a holistic \
@@ -19,32 +19,3 @@ class TrendAnalysisAgent:
             output your answer in the format(Do not include any other text): \
                < Support: [list of support levels: Reasoning for each level], Resistance: [list of resistance levels: Reasoning for each level]> \
             "
-        self.trading_agent_message = {"type": "text", "text": self.agent_instruction}
-
-    def analyze(self, images):
-        chart_messages = [self.trading_agent_message]
-        for image in images:
-            img_buffer = io.BytesIO()
-            image.save(img_buffer, format="JPEG")
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-            chart_messages.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": img_base64
-                }
-            })
-        
-        message = self.anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=200,
-                    temperature=0.0,
-                    messages=[
-                            {
-                            "role": "user",
-                            "content": chart_messages
-                        }
-                    ]
-                )
-        return message.content[0].text
\ No newline at end of file
@@ -1,34 +1,96 @@
 import os
-import io
+import asyncio
 from PIL import Image
 from dotenv import load_dotenv
-import pandas as pd
-import matplotlib.pyplot as plt
 import re
 from get_data import BinanceDataFetcher
+from market_data.candle_store import CandleStore, columns_to_frame
+from charts.pool import RenderPool
+from charts.cache import ChartCache
 from agents.trend_analysis_agent import TrendAnalysisAgent
 from agents.market_analysis_agent import MarketAnalysisAgent
+from agents.orchestrator import AgentOrchestrator
 
 class TrendAnalyzer:
     def __init__(
         self,
         load_local=True,
-        base_path="data"
+        base_path="data",
+        render_workers=1,
+        chart_cache=None,
+        client=None,
+        async_client=None,
+        response_cache=None,
+        agent_options=None,
+        save_png=False
     ):
         self.load_local = load_local
         self.base_path = base_path
         self.api_key = os.getenv("API_KEY")
         self.api_secret = os.getenv("API_SECRET")
-        self.trend_analysis_agent = TrendAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"))
-        self.market_analysis_agent = MarketAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"))
+        # Both agents share the (optionally injected) clients and response cache. agent_options holds
+        # BaseAgent settings such as image_max_side, image_quality, tile or max_retries.
+        agent_kwargs = dict(client=client, async_client=async_client, cache=response_cache, **(agent_options or {}))
+        self.trend_analysis_agent = TrendAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"), **agent_kwargs)
+        self.market_analysis_agent = MarketAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"), **agent_kwargs)
         self.fetcher = BinanceDataFetcher(self.api_key, self.api_secret)
+        self.store = CandleStore(self.base_path)
+        # Repeated analyses of unchanged windows (both stages) reuse the rendered charts
+        self.chart_cache = ChartCache() if chart_cache is None else chart_cache
+        self.renderer = RenderPool(render_workers, cache=self.chart_cache)
+        # Also write every chart sent to the agents to '<stage>_<symbol>_<timeframe>.png' (debugging)
+        self.save_png = save_png
     
     def load_data(self, symbol: str="SOLUSDT", timeframe: str="15m", from_date: str="1 Jan 2024", end_date: str=None):
+        """
+        Load candles as a DataFrame with epoch ms times; the charts format them only for the axis labels.
+        """
         if self.load_local:
-            df = pd.read_csv(f"{self.base_path}/{symbol}_{timeframe}_data.csv")
-            return df
+            return self.store.read_frame(symbol, timeframe, from_date, end_date, time_format=None)
         else:
-            return self.fetcher.get_historical_data(symbol, timeframe, from_date, end_date)
+            columns = self.fetcher.get_historical_data(symbol, timeframe, from_date, end_date, as_frame=False)
+            self.store.append(symbol, timeframe, columns)
+            return columns_to_frame(columns, time_format=None)
+
+    def load_symbol_data(self, symbol, timeframes, from_date, end_date, indicators):
+        data = {}
+        for timeframe in timeframes:
+            data[timeframe] = self.load_data(symbol, timeframe, from_date, end_date)
+            data[timeframe] = self.fetcher.add_indicator(data[timeframe], indicators)
+        return data
+
+    def stage_one_charts(self, symbol, data, timeframes):
+        """
+        Candlestick and volume charts of the last 200 candles, sent to the trend analysis agent.
+        """
+        images = []
+        rendered = self.renderer.render_many([data[timeframe].tail(200) for timeframe in timeframes], timeframes)
+        for timeframe, rgb in zip(timeframes, rendered):
+            img = Image.fromarray(rgb)
+            if self.save_png:
+                img.save(f'market_analysis_{symbol}_{timeframe}.png')
+            images.append(img)
+        return images
+
+    @staticmethod
+    def parse_levels(output_message):
+        # Updated regex to capture levels in both Support and Resistance sections
+        # levels = re.findall(r'\d+:', output_message)
+        levels = re.findall(r'(\d+\.\d+|\d+):', output_message)
+        return [float(level.strip(':')) for level in levels]
+
+    def stage_two_charts(self, symbol, data, timeframes, indicators, levels):
+        """
+        Indicator charts of the last 100 candles with the stage one levels, sent to the market analysis agent.
+        """
+        stage2_charts = []
+        rendered = self.renderer.render_many([data[timeframe].tail(100) for timeframe in timeframes], timeframes, indicators, levels=levels)
+        for timeframe, rgb in zip(timeframes, rendered):
+            img = Image.fromarray(rgb)
+            if self.save_png:
+                img.save(f"trend_analysis_{symbol}_{timeframe}.png")
+            stage2_charts.append(img)
+        return stage2_charts
 
     def analyze_trend(
         self, 
@@ -38,54 +100,75 @@ class TrendAnalyzer:
         end_date: str=None, 
         indicators: list=['rsi', 'vwap', 'supertrend']
     ):
-        data, plots, images = {}, [], []
-        for timeframe in timeframes:
-            data[timeframe] = self.load_data(symbol, timeframe, from_date, end_date)
-            data[timeframe] = self.fetcher.add_indicator(data[timeframe], indicators)
-            data[timeframe].to_csv(f"{self.base_path}/{symbol}_{timeframe}_data.csv", index=False)
-        
-        for timeframe in timeframes:
-            img, fig = self.fetcher.plot_candlestick_and_volume(data[timeframe].tail(200), timeframe)
-            plots.append(fig)
-            images.append(img)
-            # convert the figure to a pil image
-            # fig.show(title="My Image")
-#       
+        data = self.load_symbol_data(symbol, timeframes, from_date, end_date, indicators)
+        images = self.stage_one_charts(symbol, data, timeframes)
         output_message = self.trend_analysis_agent.analyze(images)
         print(output_message)
         
-        # Updated regex to capture levels in both Support and Resistance sections
-        # levels = re.findall(r'\d+:', output_message)
-        levels = re.findall(r'(\d+\.\d+|\d+):', output_message)
-        levels = [float(level.strip(':')) for level in levels]
+        levels = self.parse_levels(output_message)
         print(levels)
         
-        stage2_charts = []
-        for timeframe in timeframes:
-            fig = self.fetcher.plot_indicators(data[timeframe].tail(100), indicators)
-            for level in levels:    
-                fig.axes[0].axhline(y=level, color='r', linestyle='--')
-            img_buf = io.BytesIO()
-            plt.savefig(img_buf, format='png')
-            img_buf.seek(0)
-            img = Image.open(img_buf).convert('RGB')
-            # save the image to a file
-            img.save(f"trend_analysis_{symbol}_{timeframe}.png")
-            stage2_charts.append(img)
-
+        stage2_charts = self.stage_two_charts(symbol, data, timeframes, indicators, levels)
         output_message = self.market_analysis_agent.analyze(stage2_charts)
         
         print(output_message)
+        return output_message
+
+    async def analyze_trend_async(
+        self,
+        orchestrator,
+        symbol,
+        timeframes,
+        from_date: str="1 Jan 2024 00:00",
+        end_date: str=None,
+        indicators: list=['rsi', 'vwap', 'supertrend']
+    ):
+        """
+        `analyze_trend` with the two agent calls awaited through `orchestrator`, so several
+        symbols can be analyzed concurrently. Data loading and rendering run in worker threads,
+        so one symbol's download or charts never stall the other symbols' pipelines on the event loop.
+        """
+        data = await asyncio.to_thread(self.load_symbol_data, symbol, timeframes, from_date, end_date, indicators)
+        images = await asyncio.to_thread(self.stage_one_charts, symbol, data, timeframes)
+        output_message = await orchestrator.call(self.trend_analysis_agent, images)
+        levels = self.parse_levels(output_message)
+        stage2_charts = await asyncio.to_thread(self.stage_two_charts, symbol, data, timeframes, indicators, levels)
+        return await orchestrator.call(self.market_analysis_agent, stage2_charts)
+
+    def scan(
+        self,
+        symbols,
+        timeframes,
+        from_date: str="1 Jan 2024 00:00",
+        end_date: str=None,
+        indicators: list=['rsi', 'vwap', 'supertrend'],
+        max_in_flight: int=8,
+        timeout: float=120.0
+    ):
+        """
+        Analyze many symbols concurrently.
+
+        Returns:
+        dict: symbol -> stage two analysis, or the exception that stopped that symbol's pipeline (e.g. a timeout).
+        """
+        orchestrator = AgentOrchestrator(max_in_flight=max_in_flight, timeout=timeout)
+        results = orchestrator.run([
+            self.analyze_trend_async(orchestrator, symbol, timeframes, from_date, end_date, indicators)
+            for symbol in symbols
+        ])
+        return dict(zip(symbols, results))
 
 if __name__ == "__main__":
     load_dotenv('envs/.env')
 
     load_local = False
 
-    analyzer = TrendAnalyzer(load_local)
+    analyzer = TrendAnalyzer(load_local, save_png=True)
 
     # analyzer.analyze_trend("BTCUSDT", ["15m", "1h", "4h", "1d"], from_date="11 Jun 2024 00:00", end_date="7 Jan 2025 11:00", indicators=['ema_20', 'ema_200', 'rsi'])
     # analyzer.analyze_trend("BTCUSDT", ["15m", "1h", "4h", "1d"], from_date="11 Jan 2024 00:00", end_date="26 Dec 2024 07:30", indicators=['ema_20', 'ema_200', 'rsi'])
     analyzer.analyze_trend("BTCUSDT", ["15m", "1h", "4h", "1d"], from_date="11 Jan 2024 00:00:00", end_date="10 Jan 2025 22:00:00", indicators=['ema_20', 'ema_200', 'rsi'])
     # analyzer.analyze_trend("SOLUSDT", ["15m", "1h", "4h", "1d"], indicators=['vwap'])
+    # Many pairs at once, at most 8 model requests in flight:
+    # results = analyzer.scan(["BTCUSDT", "ETHUSDT", "SOLUSDT"], ["15m", "1h", "4h", "1d"], indicators=['ema_20', 'ema_200', 'rsi'])
     
\ No newline at end of file
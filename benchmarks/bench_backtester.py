@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trading_env.backtester import backtest, signals_to_decisions, STOP, TAKE_PROFIT, CLOSED, UNFILLED
+
+
+def make_minutes(rows, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.05, rows))
+    open_ = np.r_[close[0], close[:-1]] + rng.normal(0, 0.01, rows)
+    return {
+        'OpenTime': np.arange(rows, dtype=np.int64) * 60000,
+        'Open': open_,
+        'High': np.maximum(open_, close) + rng.random(rows) * 0.05,
+        'Low': np.minimum(open_, close) - rng.random(rows) * 0.05,
+        'Close': close,
+    }
+
+
+def make_decisions(base, seed=2):
+    """
+    EMA cross decisions on 15m closes, every 7th one a limit entry and every 11th one a limit
+    far from the price that never fills.
+    """
+    close, times = base['Close'][14::15], base['OpenTime'][14::15] + 59999
+    ema = pd.Series(close).ewm(span=34).mean().to_numpy()
+    decisions = signals_to_decisions(times, np.where(close > ema, 1, -1), close, stop_pct=0.01, take_pct=0.02)
+    price = close[np.searchsorted(times, decisions['time'])]
+    decisions.loc[::7, 'entry'] = price[::7] * (1 - 0.002 * decisions['side'][::7])
+    decisions.loc[::11, 'entry'] = price[::11] * (1 - 0.5 * decisions['side'][::11])
+    return decisions
+
+
+def backtest_loop(base, decisions, fee=0.001, max_hold_minutes=None):
+    """
+    Candle by candle reference of `backtest` (fixed size, no slippage), returns (reason, return) per decision.
+    """
+    open_time, o, h, l, c = (np.asarray(base[column]) for column in ('OpenTime', 'Open', 'High', 'Low', 'Close'))
+    n = len(open_time)
+    decisions = pd.DataFrame(decisions).sort_values('time', kind='stable')
+    decisions = decisions[decisions['side'] != 0].reset_index(drop=True)
+    starts = np.searchsorted(open_time, decisions['time'].to_numpy(), side='right')
+    # Orders are live until the next decision
+    fills = []
+    for k, row in decisions.iterrows():
+        order_end = starts[k + 1] if k + 1 < len(decisions) else n
+        fill = None
+        for i in range(starts[k], order_end):
+            if np.isnan(row['entry']) or l[i] <= row['entry'] <= h[i]:
+                fill = (i, o[i] if np.isnan(row['entry']) else row['entry'])
+                break
+        fills.append(fill)
+    out = []
+    for k, row in decisions.iterrows():
+        if fills[k] is None:
+            out.append((UNFILLED, 0.0))
+            continue
+        fill_bar, entry = fills[k]
+        end = next((fill[0] for fill in fills[k + 1:] if fill is not None), n)
+        if max_hold_minutes is not None:
+            end = min(end, fill_bar + max_hold_minutes)
+        side, stop, take = row['side'], row['stop_loss'], row['take_profit']
+        result = None
+        # A market fill is at the open, the whole fill candle comes after it
+        for i in range(fill_bar if np.isnan(row['entry']) else fill_bar + 1, end):
+            stop_hit = not np.isnan(stop) and (l[i] <= stop if side > 0 else h[i] >= stop)
+            take_hit = not np.isnan(take) and (h[i] >= take if side > 0 else l[i] <= take)
+            if stop_hit or take_hit:
+                level = stop if stop_hit else take
+                if stop_hit:
+                    gapped = o[i] < level if side > 0 else o[i] > level
+                else:
+                    gapped = o[i] > level if side > 0 else o[i] < level
+                result = (STOP if stop_hit else TAKE_PROFIT, o[i] if gapped else level)
+                break
+        if result is None:
+            result = (CLOSED, o[end] if end < n else c[-1])
+        price = result[1]
+        out.append((result[0], side * (price / entry - 1) - fee * (1 + price / entry)))
+    return out
+
+
+def compare(base, decisions, **kwargs):
+    """
+    Number of trades whose exit reason or return differs between `backtest` and the loop.
+    """
+    trades = backtest(base, decisions, **kwargs)['trades']
+    expected = backtest_loop(base, decisions, **kwargs)
+    reasons = trades['reason'].to_numpy() != np.array([reason for reason, _ in expected])
+    returns = ~np.isclose(trades['return'].to_numpy(), [ret for _, ret in expected])
+    return int((reasons | returns).sum())
+
+
+def fill_candle_case():
+    """
+    A market BUY filled at 100 on a candle whose low (90) goes through the stop (95) must be stopped out on that candle.
+    """
+    base = {'OpenTime': np.array([0, 60000, 120000]), 'Open': np.array([100.0, 100, 96]),
+            'High': np.array([101.0, 101, 97]), 'Low': np.array([99.0, 90, 95.5]), 'Close': np.array([100.0, 96, 96.5])}
+    decisions = pd.DataFrame({'time': [1], 'side': [1], 'entry': [np.nan], 'stop_loss': [95.0], 'take_profit': [110.0]})
+    trade = backtest(base, decisions, fee=0.0)['trades'].iloc[0]
+    assert trade['reason'] == STOP and trade['exit_price'] == 95.0 and trade['exit_time'] == 60000, trade
+    assert compare(base, decisions, fee=0.0) == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vectorised backtester against a candle by candle loop.")
+    parser.add_argument("--minutes", type=int, default=525600, help="Number of 1m candles (default one year)")
+    parser.add_argument("--checked", type=int, default=400, help="Decisions replayed by the loop for the comparison")
+    args = parser.parse_args()
+
+    fill_candle_case()
+    base = make_minutes(args.minutes)
+    decisions = make_decisions(base)
+    start = time.perf_counter()
+    result = backtest(base, decisions)
+    elapsed = time.perf_counter() - start
+    print(f"backtest   : {elapsed * 1000:8.1f}ms for {len(decisions)} decisions over {args.minutes} candles")
+    print(f"stats      : {result['stats']}")
+    subset = decisions.iloc[:args.checked]
+    start = time.perf_counter()
+    backtest_loop(base, subset)
+    loop_time = time.perf_counter() - start
+    print(f"loop       : {loop_time * 1000:8.1f}ms for {len(subset)} decisions")
+    print(f"mismatches : {compare(base, subset)} (max hold 600m: {compare(base, subset, max_hold_minutes=600)})")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators.indicator as ta
+from indicators.batch import stack_series, ema_batch, rsi_batch, vwap_batch, supertrend_batch
+
+
+def make_watchlist(symbols, rows, seed=0):
+    """
+    Random candles for `symbols` symbols; a third of them have a shorter (ragged) history.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(symbols):
+        length = rows if i % 3 else rng.integers(rows // 4, rows)
+        close = 100 + np.cumsum(rng.normal(0, 0.2, length))
+        frames.append(pd.DataFrame({
+            'Open': close + rng.normal(0, 0.05, length),
+            'High': close + rng.random(length) * 0.5,
+            'Low': close - rng.random(length) * 0.5,
+            'Close': close,
+            'Volume': rng.random(length) * 1000,
+        }))
+    return frames
+
+
+def per_symbol(frames):
+    out = []
+    for df in frames:
+        df = ta.ema(df.copy(), 20)
+        df = ta.rsi(df, 14)
+        df = ta.vwap(df)
+        df = ta.supertrend(df, 10, 3)
+        out.append(df)
+    return out
+
+
+def batched(frames):
+    columns = {column: stack_series([df[column].to_numpy() for df in frames]) for column in ('High', 'Low', 'Close', 'Volume')}
+    mask = columns['Close'][1]
+    high, low, close, volume = (columns[column][0] for column in ('High', 'Low', 'Close', 'Volume'))
+    return {
+        'ema_20': ema_batch(close, 20, mask),
+        'rsi': rsi_batch(close, 14, mask),
+        'vwap': vwap_batch(high, low, close, volume, mask),
+        'supertrend': supertrend_batch(high, low, close, 10, 3, mask),
+    }, mask
+
+
+def max_difference(frames, results, mask):
+    """
+    Largest absolute difference between the batch and the per-symbol results, per indicator.
+    """
+    diffs = {}
+    trend, lower, upper = results['supertrend']
+    for name, column, matrix in (('ema_20', 'ema_20', results['ema_20']), ('rsi', 'rsi', results['rsi']),
+                                 ('vwap', 'vwap', results['vwap']), ('final_lowerband', 'final_lowerband', lower),
+                                 ('final_upperband', 'final_upperband', upper)):
+        worst = 0.0
+        for row, df in enumerate(frames):
+            expected, got = df[column].to_numpy(dtype=np.float64), matrix[row][mask[row]]
+            if not np.array_equal(np.isnan(expected), np.isnan(got)):
+                worst = np.inf
+                break
+            if np.any(~np.isnan(expected)):
+                worst = max(worst, np.nanmax(np.abs(expected - got)))
+        diffs[name] = worst
+    diffs['supertrend (mismatches)'] = sum(int((df['supertrend'].to_numpy() != trend[row][mask[row]]).sum()) for row, df in enumerate(frames))
+    return diffs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the batched 2D indicator kernels against per-symbol calls.")
+    parser.add_argument("--symbols", type=int, default=150, help="Number of symbols in the watchlist")
+    parser.add_argument("--rows", type=int, default=1000, help="Candles per symbol (the longest history)")
+    args = parser.parse_args()
+
+    frames = make_watchlist(args.symbols, args.rows)
+    start = time.perf_counter()
+    expected = per_symbol(frames)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    results, mask = batched(frames)
+    batch_time = time.perf_counter() - start
+    print(f"per-symbol : {loop_time:8.3f}s for {args.symbols} symbols x {args.rows} candles")
+    print(f"batched    : {batch_time:8.3f}s")
+    print(f"speedup    : {loop_time / batch_time:8.1f}x")
+    for name, diff in max_difference(expected, results, mask).items():
+        print(f"{name:<24} max abs difference: {diff}")
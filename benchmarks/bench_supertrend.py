@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators.indicator as ta
+
+
+def supertrend_reference(df, length=10, multiplier=3):
+    """
+    The original per-row pandas implementation, kept as the correctness and speed baseline.
+    """
+    high = df['High']
+    low = df['Low']
+    close = df['Close']
+    price_diffs = [high - low, high - close.shift(), close.shift() - low]
+    true_range = pd.concat(price_diffs, axis=1).abs().max(axis=1)
+    atr = true_range.ewm(alpha=1/length, min_periods=length).mean()
+    hl2 = (high + low) / 2
+    final_upperband = hl2 + (multiplier * atr)
+    final_lowerband = hl2 - (multiplier * atr)
+    supertrend = [True] * len(df)
+    for i in range(1, len(df.index)):
+        curr, prev = i, i-1
+        if close[curr] > final_upperband[prev]:
+            supertrend[curr] = True
+        elif close[curr] < final_lowerband[prev]:
+            supertrend[curr] = False
+        else:
+            supertrend[curr] = supertrend[prev]
+            if supertrend[curr] == True and final_lowerband[curr] < final_lowerband[prev]:
+                final_lowerband[curr] = final_lowerband[prev]
+            if supertrend[curr] == False and final_upperband[curr] > final_upperband[prev]:
+                final_upperband[curr] = final_upperband[prev]
+        if supertrend[curr] == True:
+            final_upperband[curr] = np.nan
+        else:
+            final_lowerband[curr] = np.nan
+    df['supertrend'] = supertrend
+    df['final_lowerband'] = final_lowerband
+    df['final_upperband'] = final_upperband
+    return df
+
+
+def make_candles(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.2, rows))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.05, rows),
+        'High': close + rng.random(rows) * 0.5,
+        'Low': close - rng.random(rows) * 0.5,
+        'Close': close,
+        'Volume': rng.random(rows) * 1000,
+    })
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    out = fn(df.copy())
+    return out, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the array supertrend kernel against the per-row loop.")
+    parser.add_argument("--rows", type=int, default=525_600, help="Number of candles (default: one year of 1m data)")
+    parser.add_argument("--skip-reference", action="store_true", help="Only time the array kernel")
+    args = parser.parse_args()
+
+    df = make_candles(args.rows)
+    fast, fast_time = timed(ta.supertrend, df)
+    print(f"array kernel : {fast_time:8.3f}s for {args.rows} rows")
+
+    if not args.skip_reference:
+        slow, slow_time = timed(supertrend_reference, df)
+        print(f"per-row loop : {slow_time:8.3f}s for {args.rows} rows")
+        print(f"speedup      : {slow_time / fast_time:8.1f}x")
+        for col in ['supertrend', 'final_lowerband', 'final_upperband']:
+            same = np.array_equal(slow[col].to_numpy(), fast[col].to_numpy(), equal_nan=True)
+            print(f"{col:<16} identical: {same}")
@@ -0,0 +1,130 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def chart_key(columns, timeframe, indicators=(), levels=(), params=None):
+    """
+    Content hash of a chart: the plotted arrays (see `chart_columns`), the timeframe, the
+    indicators and levels drawn on it and the renderer parameters (figure size, dpi, ...).
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((timeframe, tuple(indicators), tuple(float(level) for level in levels), sorted((params or {}).items()))).encode())
+    for name in sorted(columns):
+        values = np.ascontiguousarray(columns[name])
+        digest.update(f"{name}:{values.dtype.str}:{len(values)}".encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """
+    LRU cache of rendered chart images, keyed by `chart_key`.
+
+    Images are kept in memory up to `max_memory_bytes`. When `directory` is set they are
+    also written there as .npy files, up to `max_disk_bytes`, so they survive restarts.
+    When a budget is exceeded the least recently used images are evicted first. Safe to
+    share between threads.
+    """
+    def __init__(self, max_memory_bytes: int=256 * 2**20, directory: str=None, max_disk_bytes: int=2**30):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.directory = directory
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            # Oldest first, so the files of earlier sessions are evicted before new ones
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.npy')]
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                self.disk[entry.name[:-4]] = entry.stat().st_size
+                self.disk_bytes += entry.stat().st_size
+
+    def __contains__(self, key):
+        return key in self.memory or key in self.disk
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _remember(self, key, image):
+        # Handed out to every later caller, so it must not be modified in place
+        image.setflags(write=False)
+        self.memory[key] = image
+        self.memory_bytes += image.nbytes
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def get(self, key):
+        """
+        Return the cached image for `key`, or None.
+        """
+        with self.lock:
+            image = self.memory.get(key)
+            if image is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return image
+            if key in self.disk:
+                try:
+                    image = np.load(self._path(key))
+                except (OSError, ValueError):
+                    self.disk_bytes -= self.disk.pop(key)
+                else:
+                    self.disk.move_to_end(key)
+                    self._remember(key, image)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return image
+            self.misses += 1
+            return None
+
+    def put(self, key, image):
+        """
+        Store a rendered image (np.ndarray) under `key`.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= self.memory.pop(key).nbytes
+            self._remember(key, image)
+            if self.directory is not None and key not in self.disk:
+                path = self._path(key)
+                np.save(path, image)
+                self.disk[key] = os.path.getsize(path)
+                self.disk_bytes += self.disk[key]
+                while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+                    evicted, size = self.disk.popitem(last=False)
+                    self.disk_bytes -= size
+                    self.evictions += 1
+                    try:
+                        os.remove(self._path(evicted))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current memory and disk usage.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'memory_items': len(self.memory),
+            'memory_bytes': self.memory_bytes,
+            'disk_items': len(self.disk),
+            'disk_bytes': self.disk_bytes,
+        }
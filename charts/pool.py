@@ -0,0 +1,109 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from charts.renderer import ChartRenderer, chart_columns
+from charts.cache import chart_key
+
+# Renderer of the current worker process, created once by `_init_worker`
+_renderer = None
+
+
+def _init_worker(renderer_kwargs):
+    global _renderer
+    import matplotlib
+    matplotlib.use('Agg')
+    _renderer = ChartRenderer(**renderer_kwargs)
+
+
+def _render(columns, timeframe, indicators, levels):
+    return _renderer.render(columns, timeframe, indicators, levels)
+
+
+class RenderPool:
+    """
+    Render several charts at once in a pool of worker processes.
+
+    Each worker keeps its own persistent `ChartRenderer`. Only the arrays a chart needs are
+    sent to the workers (see `chart_columns`), not the DataFrames. Each worker sends back
+    the RGB buffer. Results come back in the order of the request, and a chart is always
+    drawn by the same code whichever worker gets it, so the output is deterministic. With
+    workers <= 1 the charts are drawn in-process. With a `ChartCache`, charts whose plotted
+    data did not change since they were last drawn are not rendered again.
+    """
+    def __init__(self, workers: int=4, cache=None, save_png: bool=False, png_path: str='market_analysis_{timeframe}.png', **renderer_kwargs):
+        """
+        Parameters:
+        workers (int): Number of worker processes.
+        cache (ChartCache): Cache of rendered images, None to always render.
+        save_png (bool): Also write every returned chart to `png_path` (debugging), whether it
+            was rendered or taken from the cache.
+        png_path (str): File name pattern, formatted with `timeframe`.
+        renderer_kwargs: Passed to every worker's `ChartRenderer` (figsize, dpi, ...).
+        """
+        self.workers = workers
+        self.cache = cache
+        self.save_png = save_png
+        self.png_path = png_path
+        # The PNGs are written here rather than by the renderers, so that cached charts are
+        # written too and the renderer parameters are exactly the ones that change the pixels
+        self.renderer_kwargs = renderer_kwargs
+        self.renderer = ChartRenderer(**renderer_kwargs) if workers <= 1 else None
+        self.executor = None
+        if workers > 1:
+            # Spawned rather than forked: the parent may be running threads (e.g. the 1m prefetcher)
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(renderer_kwargs,),
+            )
+
+    def render(self, data, timeframe, indicators=(), levels=()):
+        """
+        Render one chart, see `ChartRenderer.render`.
+        """
+        return self.render_many([data], [timeframe], indicators, levels)[0]
+
+    def render_many(self, frames, timeframes, indicators=(), levels=()):
+        """
+        Render one chart per (frame, timeframe) pair.
+
+        Returns:
+        list: RGB images (np.ndarray, uint8), in the order of `timeframes`.
+        """
+        indicators, levels = tuple(indicators), tuple(levels)
+        charts = [(chart_columns(data, indicators), timeframe) for data, timeframe in zip(frames, timeframes)]
+        images, keys = [None] * len(charts), [None] * len(charts)
+        if self.cache is not None:
+            for i, (columns, timeframe) in enumerate(charts):
+                keys[i] = chart_key(columns, timeframe, indicators, levels, self.renderer_kwargs)
+                images[i] = self.cache.get(keys[i])
+        pending = [i for i, image in enumerate(images) if image is None]
+
+        if self.executor is None:
+            for i in pending:
+                images[i] = self.renderer.render(charts[i][0], charts[i][1], indicators, levels)
+        else:
+            futures = {i: self.executor.submit(_render, charts[i][0], charts[i][1], indicators, levels) for i in pending}
+            for i, future in futures.items():
+                images[i] = future.result()
+        if self.cache is not None:
+            for i in pending:
+                self.cache.put(keys[i], images[i])
+        if self.save_png:
+            for image, (_, timeframe) in zip(images, charts):
+                Image.fromarray(image).save(self.png_path.format(timeframe=timeframe))
+        return images
+
+    def figure(self, timeframe, indicators=()):
+        """
+        Return the in-process figure of a chart, None when the charts are drawn by workers.
+        """
+        return self.renderer.figure(timeframe, indicators) if self.renderer is not None else None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
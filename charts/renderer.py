@@ -0,0 +1,230 @@
+import threading
+
+import numpy as np
+from PIL import Image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+
+from market_data.candle_store import times_to_epoch_ms, format_times
+
+# Colours of mplfinance's 'charles' style
+UP_COLOR = '#006340'
+DOWN_COLOR = '#a02128'
+TICK_FORMAT = '%Y-%m-%d\n%H:%M'
+PRICE_OVERLAYS = ('ema', 'vwap', 'final_lowerband', 'final_upperband')
+# Matplotlib's text and font caches are shared by all figures and are not thread-safe, so every
+# in-process draw holds this lock, whichever renderer and thread it comes from
+DRAW_LOCK = threading.Lock()
+
+
+def band_columns(indicator):
+    """
+    The band columns a supertrend spec is drawn from ('supertrend_7_2' -> 'final_lowerband_7_2',
+    'final_upperband_7_2'), None for other indicators.
+    """
+    if indicator.split('_')[0] != 'supertrend':
+        return None
+    suffix = indicator[len('supertrend'):]
+    return ('final_lowerband' + suffix, 'final_upperband' + suffix)
+
+
+def chart_columns(data, indicators=()):
+    """
+    Extract the arrays a chart needs from a DataFrame or a dict of columns, times as epoch ms.
+
+    'supertrend' is drawn from its bands, so it pulls in 'final_lowerband' and 'final_upperband'.
+    """
+    names = ['OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume']
+    for indicator in indicators:
+        names.extend(band_columns(indicator) or (indicator,))
+    columns = {}
+    for name in names:
+        values = np.asarray(data[name])
+        columns[name] = times_to_epoch_ms(values) if name == 'OpenTime' else values.astype(np.float64)
+    return columns
+
+
+def rolling_mean(values, window):
+    """
+    Trailing mean over `window` values, NaN until the window is full (like `Series.rolling(window).mean()`).
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.cumsum(np.r_[0.0, values])
+        out[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return out
+
+
+class ChartRenderer:
+    """
+    Candlestick/volume chart renderer that keeps one Agg figure per chart.
+
+    The first render of a timeframe builds the figure and its artists. Later renders only
+    replace the artists' data (candles, volume bars, indicator lines, levels) and redraw the
+    canvas, so no figure is created or leaked per step. The pixels are read straight from
+    the canvas buffer instead of round-tripping through PNG files.
+    """
+    def __init__(self, figsize=(20, 10), dpi: int=100, save_png: bool=False, png_path: str='market_analysis_{timeframe}.png'):
+        """
+        Parameters:
+        figsize (tuple): Size of the candlestick/volume chart in inches.
+        dpi (int): Resolution of the returned images.
+        save_png (bool): Also write every rendered chart to `png_path` (debugging).
+        png_path (str): File name pattern, formatted with `timeframe`.
+        """
+        self.figsize = figsize
+        self.dpi = dpi
+        self.save_png = save_png
+        self.png_path = png_path
+        self.charts = {}
+
+    def _create(self, key, timeframe, indicators):
+        # With indicators the layout follows `BinanceDataFetcher.plot_indicators`, otherwise a price panel over a volume panel
+        oscillators = [indicator for indicator in indicators if not indicator.startswith(PRICE_OVERLAYS + ('supertrend',))]
+        if oscillators:
+            figsize, ratios = (30, 10), [5, 1, 1]
+        elif indicators:
+            figsize, ratios = (20, 10), [3, 1]
+        else:
+            figsize, ratios = self.figsize, [3, 1]
+        fig = Figure(figsize=figsize, dpi=self.dpi)
+        canvas = FigureCanvasAgg(fig)
+        axes = fig.subplots(len(ratios), 1, sharex=True, gridspec_kw={'height_ratios': ratios})
+        price, volume = axes[0], axes[1]
+
+        chart = {
+            'fig': fig,
+            'canvas': canvas,
+            'axes': axes,
+            'wicks': price.add_collection(LineCollection([], linewidths=1)),
+            'bodies': price.add_collection(PolyCollection([], linewidths=0.5)),
+            'volume': volume.add_collection(PolyCollection([], alpha=0.3, label='Volume')),
+            'volume_ma': volume.plot([], [], color='orange', label='Volume MA', linewidth=1)[0],
+            'threshold': volume.axhline(y=0, color='purple', linestyle='--', label='Spike Threshold', alpha=0.5),
+            'lines': {},
+            'levels': [],
+        }
+        for indicator in indicators:
+            bands = band_columns(indicator)
+            if bands is not None:
+                chart['lines'][bands[0]] = price.plot([], [], label='Band', linestyle='--', color='orange')[0]
+                chart['lines'][bands[1]] = price.plot([], [], linestyle='--', color='orange')[0]
+            elif indicator in oscillators:
+                chart['lines'][indicator] = axes[2].plot([], [], label=indicator)[0]
+            else:
+                chart['lines'][indicator] = price.plot([], [], label=indicator)[0]
+        price.set_ylabel('Price')
+        price.set_title(f'{timeframe} Timeframe Analysis', fontsize=14)
+        if indicators:
+            for ax in axes:
+                if ax.get_legend_handles_labels()[0]:
+                    ax.legend(loc='upper left')
+        fig.tight_layout()
+        self.charts[key] = chart
+        return chart
+
+    def figure(self, timeframe, indicators=()):
+        """
+        Return the persistent figure used for `timeframe` (and `indicators`), or None before its first render.
+        """
+        chart = self.charts.get((timeframe, tuple(indicators)))
+        return chart['fig'] if chart is not None else None
+
+    def render(self, data, timeframe, indicators=(), levels=()):
+        """
+        Draw a chart and return its pixels.
+
+        Parameters:
+        data (pd.DataFrame | dict): Candles with OpenTime, Open, High, Low, Close, Volume and
+            the indicator columns; OpenTime as strings or epoch ms.
+        timeframe (str): Timeframe of the candles, one figure is kept per timeframe.
+        indicators (list): Indicators to draw; EMAs, VWAP and the supertrend bands go on the
+            price panel, anything else (e.g. 'rsi') on a third panel. Empty for the plain
+            candlestick and volume chart.
+        levels (list): Prices to mark with horizontal dashed lines (support/resistance).
+
+        Returns:
+        np.ndarray: RGB image, shape (height, width, 3), dtype uint8.
+        """
+        with DRAW_LOCK:
+            return self._render(data, timeframe, tuple(indicators), levels)
+
+    def _render(self, data, timeframe, indicators, levels):
+        key = (timeframe, indicators)
+        chart = self.charts.get(key) or self._create(key, timeframe, indicators)
+        columns = chart_columns(data, indicators)
+        price, volume = chart['axes'][0], chart['axes'][1]
+        n = len(columns['OpenTime'])
+        x = np.arange(n, dtype=np.float64)
+        o, h, l, c, v = (columns[name] for name in ('Open', 'High', 'Low', 'Close', 'Volume'))
+
+        # Candles: wick segments and body rectangles at integer positions, like mplfinance without non-trading gaps
+        colors = np.where(c >= o, UP_COLOR, DOWN_COLOR)
+        chart['wicks'].set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        chart['wicks'].set_colors(colors)
+        left, right = x - 0.3, x + 0.3
+        chart['bodies'].set_verts(np.stack([
+            np.column_stack([left, o]), np.column_stack([left, c]),
+            np.column_stack([right, c]), np.column_stack([right, o]),
+        ], axis=1))
+        chart['bodies'].set_facecolors(colors)
+        chart['bodies'].set_edgecolors(colors)
+
+        # Volume bars, spikes above mean + 2 std in green
+        threshold = v.mean() + 2 * v.std(ddof=1) if n > 1 else np.nan
+        chart['volume'].set_verts(np.stack([
+            np.column_stack([x - 0.4, np.zeros(n)]), np.column_stack([x - 0.4, v]),
+            np.column_stack([x + 0.4, v]), np.column_stack([x + 0.4, np.zeros(n)]),
+        ], axis=1))
+        chart['volume'].set_facecolors(np.where(v > threshold, 'green', 'red'))
+        chart['volume_ma'].set_data(x, rolling_mean(v, 20))
+        chart['threshold'].set_ydata([threshold, threshold])
+
+        for name, line in chart['lines'].items():
+            line.set_data(x, columns[name])
+
+        # Reuse the level lines, adding or dropping only the difference
+        while len(chart['levels']) < len(levels):
+            chart['levels'].append(price.axhline(y=0, color='r', linestyle='--'))
+        while len(chart['levels']) > len(levels):
+            chart['levels'].pop().remove()
+        for line, level in zip(chart['levels'], levels):
+            line.set_ydata([level, level])
+
+        price.set_xlim(-1, n)
+        low, high = np.nanmin(l), np.nanmax(h)
+        if 'vwap' in indicators:
+            price.set_ylim(min(low, np.nanmin(columns['vwap'])) * 0.95, max(high, np.nanmax(columns['vwap'])) * 1.05)
+        elif indicators:
+            price.set_ylim(low * 0.97, high * 1.02)
+        else:
+            pad = (high - low) * 0.05 or 1.0
+            price.set_ylim(low - pad, high + pad)
+        # Keep the spike threshold in view, as autoscaling around an axhline would
+        top = np.nanmax(np.r_[v, threshold]) if n else 0.0
+        volume.set_ylim(0, top * 1.05 if top > 0 else 1.0)
+        for ax in chart['axes'][2:]:
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+        if indicators:
+            ticks = np.arange(0, n, 7)
+        else:
+            # Every 10th candle plus the last one
+            ticks = np.unique(np.r_[np.arange(0, n, 10), n - 1]) if n else np.arange(0)
+        price.set_xticks(ticks)
+        price.set_xticklabels(format_times(columns['OpenTime'][ticks], TICK_FORMAT), rotation=90)
+
+        chart['canvas'].draw()
+        # The canvas buffer is reused by the next draw, so hand out a copy
+        rgb = np.asarray(chart['canvas'].buffer_rgba())[..., :3].copy()
+        if self.save_png:
+            Image.fromarray(rgb).save(self.png_path.format(timeframe=timeframe))
+        return rgb
+
+    def close(self):
+        """
+        Drop all figures.
+        """
+        self.charts.clear()
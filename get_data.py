@@ -1,30 +1,162 @@
 import os
 import datetime
 import time
-import io
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from PIL import Image
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 from binance.client import Client
+from binance.helpers import interval_to_milliseconds
 import mplfinance as mpf
 from tqdm import tqdm
 from io import StringIO
 from matplotlib.gridspec import GridSpec
 # import pandas_ta as ta
-import indicators.indicator as ta
+from indicators.registry import add_indicators
+from market_data.candle_store import CandleStore, TIME_COLUMNS, format_times
+from market_data.kline_buffer import KlineBuffer, parse_klines
+from charts.pool import RenderPool
+
+
+class RequestWeightBudget:
+    """
+    Thread-safe sliding-window budget for exchange request weight.
+
+    Binance limits the total request weight per minute per IP. Every request reserves its
+    weight before it is sent; when the window is full, callers block until enough weight
+    has aged out.
+    """
+    def __init__(self, max_weight=6000, period=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.max_weight = max_weight
+        self.period = period
+        self.clock = clock
+        self.sleep = sleep
+        self.used = 0
+        self.events = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self, weight):
+        if weight > self.max_weight:
+            raise ValueError(f"Request weight {weight} exceeds the budget of {self.max_weight}")
+        while True:
+            with self.lock:
+                now = self.clock()
+                while self.events and now - self.events[0][0] >= self.period:
+                    self.used -= self.events.popleft()[1]
+                if self.used + weight <= self.max_weight:
+                    self.events.append((now, weight))
+                    self.used += weight
+                    return
+                wait = self.period - (now - self.events[0][0])
+            self.sleep(max(wait, 0.001))
+
+
+class KlineDownloader:
+    """
+    Download a kline range as independent windows fetched concurrently.
+
+    The range is split up front into windows of `api_limit` candles (the interval length is
+    known), so no request depends on the previous page. Works with any client exposing a
+    `get_historical_klines(symbol=, interval=, start_str=, end_str=, limit=)` style method.
+    """
+    def __init__(
+        self,
+        client,
+        workers: int=4,
+        api_limit: int=1000,
+        # python-binance's get_historical_klines issues an earliest-timestamp lookup plus the
+        # klines request, weight 2 each
+        request_weight: int=4,
+        budget: RequestWeightBudget=None,
+        retries: int=3,
+        method: str="get_historical_klines"
+    ):
+        self.client = client
+        self.workers = workers
+        self.api_limit = api_limit
+        self.request_weight = request_weight
+        self.budget = budget if budget is not None else RequestWeightBudget()
+        self.retries = retries
+        self.method = method
+
+    def windows(self, interval, start_timestamp, end_timestamp):
+        """
+        Split [start_timestamp, end_timestamp] (epoch ms) into windows of at most `api_limit` candles.
+        """
+        step = interval_to_milliseconds(interval) * self.api_limit
+        return [
+            (window_start, min(window_start + step - 1, end_timestamp))
+            for window_start in range(start_timestamp, end_timestamp + 1, step)
+        ]
+
+    def _fetch(self, symbol, interval, window):
+        fetch = getattr(self.client, self.method)
+        for attempt in range(self.retries + 1):
+            self.budget.acquire(self.request_weight)
+            try:
+                return fetch(
+                    symbol=symbol,
+                    interval=interval,
+                    start_str=window[0],
+                    end_str=window[1],
+                    limit=self.api_limit,
+                )
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f"Error fetching klines for window {window}, retrying: {e}")
+                time.sleep((2 ** attempt) * (0.5 + random.random()))
+
+    def download(self, symbol, interval, start_timestamp, end_timestamp):
+        """
+        Fetch all klines with OpenTime in [start_timestamp, end_timestamp].
+
+        Returns:
+        list: Raw klines ordered by OpenTime, without duplicates.
+        """
+        windows = self.windows(interval, start_timestamp, end_timestamp)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                tqdm(total=len(windows), desc="Fetching data") as pbar:
+            futures = [executor.submit(self._fetch, symbol, interval, window) for window in windows]
+            pages = []
+            for future in futures:
+                pages.append(future.result())
+                pbar.update(1)
+
+        klines, last_open_time = [], None
+        for page in pages:
+            for kline in page:
+                # Windows never overlap, but clients may pad pages; keep OpenTime strictly increasing
+                if last_open_time is None or kline[0] > last_open_time:
+                    klines.append(kline)
+                    last_open_time = kline[0]
+        return klines
+
+
 class BinanceDataFetcher:
     def __init__(
         self, 
         api_key, 
-        api_secret
+        api_secret,
+        workers=1,
+        budget=None
     ):
         """
         Initialize the Binance client with the provided API key and secret.
+
+        With workers > 1, history is downloaded as concurrent windows sharing `budget`
+        (a RequestWeightBudget) instead of page by page.
         """
         self.client = Client(api_key, api_secret)
         self.api_limit = 1000
         self.data = {}
+        self.time_text = {}
+        self.workers = workers
+        self.downloader = KlineDownloader(self.client, workers=workers, api_limit=self.api_limit, budget=budget)
 
     def _get_klines(self, symbol, interval, start_time, end_time):
         """
@@ -43,25 +175,75 @@ class BinanceDataFetcher:
             print(f"Error fetching klines: {e}")
             return []
 
-    def get_historical_data(self, symbol, interval, start_date, end_date=None):
+    def fetch_klines(self, symbol, interval, start_timestamp, end_timestamp):
+        """
+        Fetch the raw klines opened in [start_timestamp, end_timestamp] (epoch ms).
+
+        Unlike `get_historical_data` this keeps no per-symbol state, so it can be called from
+        a background thread (e.g. a prefetcher) while the buffers are used elsewhere.
+        Returns:
+            List of raw klines, oldest first.
+        """
+        # Placeholder for all data
+        all_klines = []
+        current_start = start_timestamp
+
+        # Calculate the total number of iterations needed
+        total_iterations = (end_timestamp - start_timestamp) // self.api_limit
+
+        # The interval length is known, so the range can be fetched as independent windows
+        if self.workers > 1 and interval_to_milliseconds(interval) is not None:
+            if current_start < end_timestamp:
+                all_klines = self.downloader.download(symbol, interval, current_start, end_timestamp)
+        else:
+            # Wrap the while loop with tqdm for a progress bar
+            with tqdm(total=total_iterations, desc="Fetching data") as pbar:
+                while current_start < end_timestamp:
+                    # Fetch klines
+                    klines = self._get_klines(
+                        symbol=symbol,
+                        interval=interval,
+                        start_time=current_start,
+                        end_time=end_timestamp
+                    )
+                    if not klines:
+                        break
+
+                    # Add data and update current_start to the last fetched timestamp
+                    all_klines.extend(klines)
+                    current_start = klines[-1][6] + 1  # CloseTime + 1ms
+
+                    # Update the progress bar
+                    pbar.update(1)
+        return all_klines
+
+    def get_historical_data(self, symbol, interval, start_date, end_date=None, delta=False, as_frame=True):
         """
         Fetch all historical data from the start date to the current time.
+
+        Repeated calls for the same symbol and interval only fetch candles newer than the
+        last one held, and only those are parsed into the typed column buffer.
         Args:
             symbol: Trading pair (e.g., "BTCUSDT").
             interval: Timeframe (e.g., "15m", "4h", "1d").
             start_date: Start date as a string (e.g., "1 Jan 2020 00:00:00").
+            delta: Return only the candles fetched by this call instead of the whole history.
+            as_frame: Return a DataFrame with string times; otherwise a dict of numpy views
+                over the buffer, times in epoch ms.
         Returns:
-            DataFrame containing the historical data.
+            DataFrame (or dict of arrays) containing the historical data.
         """
         # Convert start_date to timestamp
         if symbol not in self.data:
             self.data[symbol] = {}
+            self.time_text[symbol] = {}
         if interval not in self.data[symbol]:
-            self.data[symbol][interval] = []
+            self.data[symbol][interval] = KlineBuffer()
+            self.time_text[symbol][interval] = KlineBuffer({column: object for column in TIME_COLUMNS})
             start_time = datetime.datetime.strptime(start_date, "%d %b %Y %H:%M:%S").replace(tzinfo=datetime.timezone.utc)
             start_timestamp = int(start_time.timestamp() * 1000)
         else:
-            start_timestamp = self.data[symbol][interval][-1][6] + 1
+            start_timestamp = self.data[symbol][interval].last("CloseTime") + 1
         
         # Current time
         if end_date is None:
@@ -70,61 +252,23 @@ class BinanceDataFetcher:
             end_time = datetime.datetime.strptime(end_date, "%d %b %Y %H:%M:%S").replace(tzinfo=datetime.timezone.utc)
             end_timestamp = int(end_time.timestamp() * 1000)
 
-        # Placeholder for all data
-        all_klines = []
-        current_start = start_timestamp
-
-        # Calculate the total number of iterations needed
-        total_iterations = (end_timestamp - start_timestamp) // self.api_limit
-
-        # Wrap the while loop with tqdm for a progress bar
-        with tqdm(total=total_iterations, desc="Fetching data") as pbar:
-            while current_start < end_timestamp:
-                # Fetch klines
-                klines = self._get_klines(
-                    symbol=symbol,
-                    interval=interval,
-                    start_time=current_start,
-                    end_time=end_timestamp
-                )
-                if not klines:
-                    break
+        all_klines = self.fetch_klines(symbol, interval, start_timestamp, end_timestamp)
 
-                # Add data and update current_start to the last fetched timestamp
-                all_klines.extend(klines)
-                current_start = klines[-1][6] + 1  # CloseTime + 1ms
+        buffer = self.data[symbol][interval]
+        text = self.time_text[symbol][interval]
+        new_start, new_end = buffer.append(parse_klines(all_klines))
+        # Times are formatted once per candle, not once per call
+        text.append({column: format_times(buffer.columns[column][new_start:new_end]) for column in TIME_COLUMNS})
 
-                # Update the progress bar
-                pbar.update(1)
+        start = new_start if delta else 0
+        if not as_frame:
+            return buffer.view(start, new_end)
 
-        self.data[symbol][interval].extend(all_klines)
-        
         # Convert to DataFrame
-        df = pd.DataFrame(self.data[symbol][interval], columns=[
-            "OpenTime", "Open", "High", "Low", "Close", "Volume", 
-            "CloseTime", "QuoteAssetVolume", "NumberOfTrades", 
-            "TakerBuyBaseAssetVolume", "TakerBuyQuoteAssetVolume", "Ignore"
-        ])
-        
-        # Convert timestamps to datetime
-        # For the daily timeframe, we need to add the hours, minutes, seconds
-        
-        df['OpenTime'] = pd.to_datetime(df['OpenTime'], unit='ms')
-        df['CloseTime'] = pd.to_datetime(df['CloseTime'], unit='ms')
-        numeric_columns = [
-            "Open", "High", "Low", "Close", "Volume",
-            "QuoteAssetVolume", "NumberOfTrades",
-            "TakerBuyBaseAssetVolume", "TakerBuyQuoteAssetVolume"
-        ]
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        os.makedirs(f"data/", exist_ok=True)
-        df['OpenTime'] = df['OpenTime'].dt.strftime('%d %b %Y %H:%M:%S')
-        df['CloseTime'] = df['CloseTime'].dt.strftime('%d %b %Y %H:%M:%S')
-        df["OpenTime"] = df["OpenTime"].astype(str)  # Convert datetime to string
-        df["CloseTime"] = df["CloseTime"].astype(str)
-        df["Ignore"] = pd.to_numeric(df["Ignore"], errors='coerce').fillna(0).astype(int)
-        # df.to_csv(f"data/{symbol}_{interval}_data.csv", index=False)
+        df = pd.DataFrame(buffer.view(start, new_end))
+        for column in TIME_COLUMNS:
+            df[column] = text.columns[column][start:new_end]
+        df["Ignore"] = 0
         return df
 
     def add_indicator(self, df, indicators):
@@ -133,120 +277,44 @@ class BinanceDataFetcher:
         for col in required_columns:
             if col not in df.columns:
                 raise ValueError(f"DataFrame must contain the column: {col}")
-        # df['OpenTime'] = pd.to_datetime(df['OpenTime'])
-        # df.set_index('OpenTime', inplace=True)
-
-        # Add specified indicators to the DataFrame
-        if 'ema_20' in indicators:
-            df = ta.ema(df, length=20)
-
-        if 'ema_50' in indicators:
-            df = ta.ema(df, length=50)
-
-        if 'ema_100' in indicators:
-            df = ta.ema(df, length=100)
-
-        if 'ema_200' in indicators:
-            df = ta.ema(df, length=200)
-
-        if 'supertrend' in indicators:
-            df = ta.supertrend(df, length=10, multiplier=3)
-
-        if 'rsi' in indicators:
-            df = ta.rsi(df, length=14)
+        # Specs such as 'ema_34', 'rsi_7' or 'supertrend_10_3' are resolved by the registry,
+        # which computes intermediates shared between indicators (true range, close diff) once
+        return add_indicators(df, indicators)
+    
+    @staticmethod
+    def mpf_frame(df):
+        """
+        The OHLCV columns of `df` (a DataFrame or a CandleSeries) indexed by OpenTime, as mplfinance
+        expects them. Only these five columns and the index are built, not a copy of the whole frame.
+        """
+        open_time = np.asarray(df['OpenTime'])
+        index = pd.to_datetime(open_time, unit='ms') if np.issubdtype(open_time.dtype, np.integer) else pd.to_datetime(open_time)
+        return pd.DataFrame({column: np.asarray(df[column]) for column in ('Open', 'High', 'Low', 'Close', 'Volume')}, index=index)
 
-        if 'vwap' in indicators:
-            df = ta.vwap(df)
+    @staticmethod
+    def volume_profile(volume):
+        """
+        Return the 20 candle volume moving average, the spike threshold and the spike flags.
+        """
+        volume = pd.Series(np.asarray(volume, dtype=np.float64))
+        threshold = volume.mean() + 2 * volume.std()
+        return volume.rolling(window=20).mean().to_numpy(), threshold, (volume > threshold).to_numpy()
 
-        # df.reset_index(inplace=True)
-        # df["OpenTime"] = df["OpenTime"].astype(str)  # Convert datetime to string
-        # df["CloseTime"] = df["CloseTime"].astype(str)
-        # df["Ignore"] = pd.to_numeric(df["Ignore"], errors='coerce').fillna(0).astype(int)
-        return df
-    
     def plot_candlestick(self, df, fig):
         ax = fig.axes[0]
-        df_mpf = df.copy()
-        df_mpf['OpenTime'] = pd.to_datetime(df_mpf['OpenTime'])
-        df_mpf.set_index('OpenTime', inplace=True)
+        df_mpf = self.mpf_frame(df)
         mpf.plot(df_mpf, type='candle', style='charles', ax=ax, volume=False, ylabel='Price', datetime_format='%Y-%m-%d %H:%M', show_nontrading=False)
         return fig
     
     def plot_volume(self, df, fig):
-        df = df.copy()
         ax = fig.axes[1]
-        df.loc[:, 'Volume_MA'] = df['Volume'].rolling(window=20).mean()
-        df.loc[:, 'Volume_Threshold'] = df['Volume'].mean() + 2 * df['Volume'].std()
-        df.loc[:, 'IsSpike'] = df['Volume'] > df['Volume_Threshold']
-        colors = ['green' if spike else 'red' for spike in df['IsSpike']]
+        volume_ma, threshold, is_spike = self.volume_profile(df['Volume'])
+        colors = ['green' if spike else 'red' for spike in is_spike]
         ax.bar(df['OpenTime'], df['Volume'], color=colors, alpha=0.3, label='Volume')
-        ax.plot(df['OpenTime'], df['Volume_MA'], color='orange', label='Volume MA', linewidth=1)
-        ax.axhline(y=df['Volume_Threshold'].iloc[0], color='purple', linestyle='--', label='Spike Threshold', alpha=0.5)
+        ax.plot(df['OpenTime'], volume_ma, color='orange', label='Volume MA', linewidth=1)
+        ax.axhline(y=threshold, color='purple', linestyle='--', label='Spike Threshold', alpha=0.5)
         return fig
 
-    def plot_candlestick_and_volume(self, df, timeframe, figsize=(20, 10)):
-        """
-        Creates separate candlestick charts with volume for each dataframe.
-
-        Parameters:
-            dataframes (list): List of dataframes, each containing the required columns.
-            figsize (tuple): Tuple for figure size.
-        """
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=figsize, 
-                                    gridspec_kw={'height_ratios': [3, 1]}, 
-                                    sharex=True)
-        
-        # Convert data for mplfinance
-        df_mpf = df.copy()
-        
-        # Convert OpenTime to datetime if it's not already
-        df_mpf['OpenTime'] = pd.to_datetime(df_mpf['OpenTime'])
-        df_mpf.set_index('OpenTime', inplace=True)
-        # Plot candlesticks using mplfinance
-        # last_timestamp = df_mpf.index[-1]
-        mpf.plot(df_mpf, type='candle', style='charles',
-            ax=ax1, volume=False, 
-            ylabel='Price',
-            datetime_format='%Y-%m-%d %H:%M:%S',
-            show_nontrading=False, 
-            # vlines=dict(vlines=[last_timestamp],colors=('r','g','b','c'))
-        )
-        #draw a vertical line at the last timestamp
-        copy_df = df.copy()
-        # Precompute volume metrics using .loc to avoid SettingWithCopyWarning
-        copy_df.loc[:, 'Volume_MA'] = copy_df['Volume'].rolling(window=20).mean()
-        copy_df.loc[:, 'Volume_Threshold'] = copy_df['Volume'].mean() + 2 * copy_df['Volume'].std()
-        copy_df.loc[:, 'IsSpike'] = copy_df['Volume'] > copy_df['Volume_Threshold']
-        
-        # Plot volume
-        colors = ['green' if spike else 'red' for spike in copy_df['IsSpike']]
-        ax2.bar(copy_df['OpenTime'], copy_df['Volume'], color=colors, alpha=0.3, label='Volume')
-        ax2.plot(copy_df['OpenTime'], copy_df['Volume_MA'], color='orange', label='Volume MA', linewidth=1)
-        ax2.axhline(y=copy_df['Volume_Threshold'].iloc[0], color='purple', 
-                    linestyle='--', label='Spike Threshold', alpha=0.5)
-                
-        # Set title
-        plt.title(f'{timeframe} Timeframe Analysis', fontsize=14)
-            
-        # Display every 10th tick on the x-axis for the price chart
-        # Get every 10th timestamp and append the last timestamp if not already included
-        xticks = list(copy_df['OpenTime'].iloc[::10])
-        if copy_df['OpenTime'].iloc[-1] not in xticks:
-            xticks.append(copy_df['OpenTime'].iloc[-1])
-        ax1.set_xticks(xticks)
-        ax1.set_xticklabels([pd.to_datetime(x).strftime('%Y-%m-%d\n%H:%M') for x in xticks], rotation=90)
-        
-        # Save figure
-        plt.tight_layout()
-        plt.savefig(f'market_analysis_{timeframe}.png', bbox_inches='tight', dpi=300)
-        
-        img_buf = io.BytesIO()
-        plt.savefig(img_buf, format='png')
-        img_buf.seek(0)
-        img = Image.open(img_buf).convert('RGB')
-        
-        return img, fig   
-    
     def plot_indicators(self, df, indicators):
         if 'rsi' in indicators:
             fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(30, 10),
@@ -296,27 +364,23 @@ if __name__ == "__main__":
     load_local = True
     fetcher = BinanceDataFetcher(API_KEY, API_SECRET)
 
-    # Example: Fetch BTCUSDT 15-minute data from 1 Jan 2020 to now
+    store = CandleStore("downloaded_data")
+    timeframes = ["15m", "1h", "4h", "1d"]
+
+    # Example: Fetch SOLUSDT data from 1 Jan 2024 to now
     if load_local:
-        data_15m = pd.read_csv("SOLUSDT_15m_data.csv")
-        data_1h = pd.read_csv("SOLUSDT_1h_data.csv")
-        data_4h = pd.read_csv("SOLUSDT_4h_data.csv")
-        data_1d = pd.read_csv("SOLUSDT_1d_data.csv")
+        data = {timeframe: store.read_frame("SOLUSDT", timeframe, "1 Jan 2024") for timeframe in timeframes}
     else:
-        data_15m = fetcher.get_historical_data("SOLUSDT", "15m", "1 Jan 2024")
-        data_1h = fetcher.get_historical_data("SOLUSDT", "1h", "1 Jan 2024")
-        data_4h = fetcher.get_historical_data("SOLUSDT", "4h", "1 Jan 2024")
-        data_1d = fetcher.get_historical_data("SOLUSDT", "1d", "1 Jan 2024")
-        
-        data_15m.to_csv("SOLUSDT_15m_data.csv", index=False)
-        data_1h.to_csv("SOLUSDT_1h_data.csv", index=False)
-        data_4h.to_csv("SOLUSDT_4h_data.csv", index=False)
-        data_1d.to_csv("SOLUSDT_1d_data.csv", index=False)
-        
-    fetcher.plot_candlestick_and_volume(data_15m[-200:], "15m")
-    fetcher.plot_candlestick_and_volume(data_1h[-200:], "1h")
-    fetcher.plot_candlestick_and_volume(data_4h[-200:], "4h")
-    fetcher.plot_candlestick_and_volume(data_1d[-200:], "1d")
+        data = {}
+        for timeframe in timeframes:
+            data[timeframe] = fetcher.get_historical_data("SOLUSDT", timeframe, "1 Jan 2024 00:00:00")
+            store.append("SOLUSDT", timeframe, data[timeframe])
+    data_15m, data_1h, data_4h, data_1d = (data[timeframe] for timeframe in timeframes)
+
+    # Draw the four charts in parallel, writing market_analysis_{timeframe}.png
+    pool = RenderPool(workers=len(timeframes), save_png=True)
+    pool.render_many([data_15m[-200:], data_1h[-200:], data_4h[-200:], data_1d[-200:]], timeframes)
+    pool.close()
 
     # plt.figure(figsize=(12, 6))
     # fetcher.plot_candle_with_volume_profile("BTCUSDT", data1.iloc[0])
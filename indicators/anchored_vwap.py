@@ -0,0 +1,126 @@
+import numpy as np
+
+from market_data.candle_store import to_epoch_ms
+from market_data.kline_buffer import KlineBuffer
+from market_data.resample import interval_bounds
+
+
+class AnchoredVWAP:
+    """
+    VWAP over any range of a candle series in O(1), from prefix sums.
+
+    The prefix sums of typical price x volume and of volume are built once and grown by
+    `extend`; they live in growable buffers, so appending a candle per step is O(1)
+    amortised. The VWAP from any anchor (a session or week start, a swing low, any
+    timestamp) to any later candle is a difference of two prefix sums, so it no longer
+    depends on how much history happens to be loaded. Without an anchor it equals
+    `indicators.indicator.vwap` on the whole series.
+    """
+    def __init__(self, open_time=(), high=(), low=(), close=(), volume=()):
+        self.candles = KlineBuffer({"OpenTime": np.int64})
+        # Prefix sums with a leading 0: the sum over rows [lo, hi) is prefix[hi] - prefix[lo]
+        self.prefix = KlineBuffer({"PV": np.float64, "Volume": np.float64})
+        self.prefix.append({"PV": np.zeros(1), "Volume": np.zeros(1)})
+        self.extend(open_time, high, low, close, volume)
+
+    @classmethod
+    def from_candles(cls, candles):
+        """
+        Build from candle columns (a CandleSeries, dict or DataFrame with epoch ms OpenTime).
+        """
+        return cls(*(np.asarray(candles[column]) for column in ("OpenTime", "High", "Low", "Close", "Volume")))
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def length(self):
+        return len(self.candles)
+
+    @property
+    def times(self):
+        """
+        OpenTime (epoch ms) of the candles, a view over the buffer.
+        """
+        return self.candles.columns["OpenTime"][:self.length]
+
+    @property
+    def pv(self):
+        return self.prefix.columns["PV"][:self.length + 1]
+
+    @property
+    def volume(self):
+        return self.prefix.columns["Volume"][:self.length + 1]
+
+    def extend(self, open_time, high, low, close, volume):
+        """
+        Append candles (newer than the last one held).
+        """
+        volume = np.asarray(volume, dtype=np.float64)
+        if len(volume) == 0:
+            return
+        typical = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64) + np.asarray(close, dtype=np.float64)) / 3
+        # The running sums continue from the last prefix, exactly as one cumulative sum would
+        pv = np.cumsum(np.r_[self.prefix.last("PV"), typical * volume])[1:]
+        cum_volume = np.cumsum(np.r_[self.prefix.last("Volume"), volume])[1:]
+        self.candles.append({"OpenTime": np.asarray(open_time, dtype=np.int64)})
+        self.prefix.append({"PV": pv, "Volume": cum_volume})
+
+    def index_of(self, time):
+        """
+        Row of the first candle opened at or after `time` (epoch ms or string).
+        """
+        return int(np.searchsorted(self.times, to_epoch_ms(time), side="left"))
+
+    def between(self, lo, hi, extra_pv=0.0, extra_volume=0.0):
+        """
+        VWAP of rows [lo, hi), plus an optional partial candle (its typical price x volume and
+        volume), e.g. the forming candle. `lo` and `hi` may be arrays.
+        """
+        volume = self.volume[hi] - self.volume[lo] + extra_volume
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.pv[hi] - self.pv[lo] + extra_pv) / volume
+
+    def vwap(self, anchor=None, time=None):
+        """
+        VWAP from the candle opened at `anchor` (default: the first candle) through the last
+        candle opened at or before `time` (default: the last candle).
+        """
+        lo = 0 if anchor is None else self.index_of(anchor)
+        hi = self.length if time is None else int(np.searchsorted(self.times, to_epoch_ms(time), side="right"))
+        return float(self.between(lo, hi)) if hi > lo else np.nan
+
+    def anchored(self, anchor=None):
+        """
+        The VWAP series from `anchor` onwards, one value per candle, NaN before the anchor.
+        """
+        lo = 0 if anchor is None else self.index_of(anchor)
+        out = np.full(self.length, np.nan)
+        out[lo:] = self.between(lo, np.arange(lo + 1, self.length + 1))
+        return out
+
+    def session_anchors(self, period):
+        """
+        Row of the first candle of each candle's session, sessions being candles of `period`
+        ('1d', '1w', '4h', ...; Binance alignment, see `interval_bounds`).
+        """
+        session_start, _ = interval_bounds(self.times, period)
+        return np.searchsorted(self.times, session_start, side="left")
+
+    def session(self, period):
+        """
+        VWAP that resets at every `period` boundary (e.g. daily or weekly VWAP), one value per candle.
+        """
+        return self.between(self.session_anchors(period), np.arange(1, self.length + 1))
+
+    def swing_anchor(self, values, time=None, lookback: int=100, kind: str="low"):
+        """
+        Open time of the swing low (lowest of the lows passed as `values`) or, with kind='high',
+        the swing high (highest of the highs) over the last `lookback` candles up to `time`, to
+        anchor a VWAP on it.
+        """
+        hi = self.length if time is None else int(np.searchsorted(self.times, to_epoch_ms(time), side="right"))
+        lo = max(hi - lookback, 0)
+        window = np.asarray(values, dtype=np.float64)[lo:hi]
+        offset = np.nanargmin(window) if kind == "low" else np.nanargmax(window)
+        return int(self.times[lo + offset])
@@ -0,0 +1,209 @@
+import numpy as np
+
+
+def stack_series(series, align: str="right"):
+    """
+    Stack 1-D series of different lengths into one (rows x time) matrix padded with NaN.
+
+    Parameters:
+    series (list): 1-D arrays, e.g. the closes of every symbol of a watchlist.
+    align (str): 'right' lines up the latest values (histories starting at different times),
+        'left' lines up the first ones.
+
+    Returns:
+    tuple: (matrix, mask) where mask is True on the real values.
+    """
+    width = max((len(values) for values in series), default=0)
+    matrix = np.full((len(series), width), np.nan)
+    mask = np.zeros((len(series), width), dtype=bool)
+    for row, values in enumerate(series):
+        span = slice(width - len(values), width) if align == "right" else slice(0, len(values))
+        matrix[row, span] = values
+        mask[row, span] = True
+    return matrix, mask
+
+
+def _prepare(values, mask, *params):
+    """
+    Broadcast the inputs to (rows x time) float64 matrices, the mask to the same shape and
+    every parameter to one value per row. Returns (values, mask, first, *params) where
+    `first` is the first valid column of each row.
+    """
+    values = [np.atleast_2d(np.asarray(value, dtype=np.float64)) for value in values]
+    params = [np.atleast_1d(np.asarray(param, dtype=np.float64)) for param in params]
+    # A single series with one parameter per row is repeated for every row
+    rows = max([value.shape[0] for value in values] + [len(param) for param in params])
+    shape = np.broadcast_shapes((rows, 1), *(value.shape for value in values))
+    values = [np.broadcast_to(value, shape) for value in values]
+    if mask is None:
+        mask = np.logical_and.reduce([~np.isnan(value) for value in values])
+    mask = np.broadcast_to(np.asarray(mask, dtype=bool), shape)
+    first = np.where(mask.any(axis=1), mask.argmax(axis=1), shape[1])
+    params = [np.broadcast_to(param, (shape[0],)) for param in params]
+    return values, mask, first, params
+
+
+def ema_batch(close, length, mask=None):
+    """
+    EMA of every row, matching `indicators.indicator.ema` (pandas ewm, adjust=False).
+
+    Parameters:
+    close (np.ndarray): (rows x time) closes; a 1-D series is broadcast against per-row lengths.
+    length (int | np.ndarray): The span, one value or one per row (parameter sets x time).
+    mask (np.ndarray): True where a row has data, default: where close is not NaN. Each row's
+        data is one contiguous run, as from `stack_series`.
+
+    Returns:
+    np.ndarray: (rows x time) EMA, NaN outside the mask.
+    """
+    (close,), mask, first, (length,) = _prepare([close], mask, length)
+    alpha = 2 / (length + 1)
+    old_wt = 1.0 - alpha
+    total_wt = old_wt + alpha
+    out = np.full(close.shape, np.nan)
+    weighted = np.full(close.shape[0], np.nan)
+    for t in range(close.shape[1]):
+        cur = close[:, t]
+        updated = (old_wt * weighted + alpha * cur) / total_wt
+        # Same recursion as pandas: the first value starts the mean, equal values leave it untouched
+        weighted = np.where(t == first, cur, np.where(mask[:, t] & (weighted != cur), updated, weighted))
+        out[:, t] = np.where(mask[:, t], weighted, np.nan)
+    return out
+
+
+def _rolling_mean(values, window, first):
+    """
+    Trailing mean over a per-row `window`, NaN until `window` values of the row are in.
+    """
+    rows, width = values.shape
+    cumsum = np.zeros((rows, width + 1))
+    np.cumsum(np.nan_to_num(values), axis=1, out=cumsum[:, 1:])
+    t = np.arange(width)
+    lag = t[None, :] + 1 - window.astype(np.int64)[:, None]
+    total = cumsum[:, 1:] - np.take_along_axis(cumsum, np.clip(lag, 0, width), axis=1)
+    return np.where(lag >= first[:, None], total / window[:, None], np.nan)
+
+
+def rsi_batch(close, length=14, mask=None):
+    """
+    RSI of every row, matching `indicators.indicator.rsi` (simple moving averages of gains and
+    losses) up to floating point rounding, the rolling sums come from prefix sums.
+
+    Parameters:
+    close (np.ndarray): (rows x time) closes, or a 1-D series with per-row lengths.
+    length (int | np.ndarray): The period, one value or one per row.
+    mask (np.ndarray): Valid values, see `ema_batch`.
+
+    Returns:
+    np.ndarray: (rows x time) RSI, NaN outside the mask.
+    """
+    (close,), mask, first, (length,) = _prepare([close], mask, length)
+    delta = np.zeros(close.shape)
+    delta[:, 1:] = close[:, 1:] - close[:, :-1]
+    # As with pandas' diff, a row's first value has no change and counts as neither gain nor loss
+    delta[~mask] = 0.0
+    delta[np.arange(len(first))[first < close.shape[1]], first[first < close.shape[1]]] = 0.0
+    gain = _rolling_mean(np.where(delta > 0, delta, 0.0), length, first)
+    loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), length, first)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + gain / loss))
+    return np.where(mask, rsi, np.nan)
+
+
+def vwap_batch(high, low, close, volume, mask=None):
+    """
+    VWAP of every row from its first candle, matching `indicators.indicator.vwap`.
+
+    Returns:
+    np.ndarray: (rows x time) VWAP, NaN outside the mask.
+    """
+    (high, low, close, volume), mask, _, _ = _prepare([high, low, close, volume], mask)
+    typical = np.where(mask, (high + low + close) / 3 * volume, 0.0)
+    cum_volume = np.cumsum(np.where(mask, volume, 0.0), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.cumsum(typical, axis=1) / cum_volume
+    return np.where(mask, vwap, np.nan)
+
+
+def atr_batch(high, low, close, length=10, mask=None):
+    """
+    ATR (Wilder smoothing) of every row, matching `indicators.indicator.atr`.
+
+    Returns:
+    np.ndarray: (rows x time) ATR, NaN for the first `length - 1` values of each row and outside the mask.
+    """
+    (high, low, close), mask, first, (length,) = _prepare([high, low, close], mask, length)
+    return _atr(high, low, close, mask, first, length)
+
+
+def _atr(high, low, close, mask, first, length):
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    prev_close[np.arange(len(first))[first < close.shape[1]], first[first < close.shape[1]]] = np.nan
+    ranges = np.fmax(np.abs(high - low), np.fmax(np.abs(high - prev_close), np.abs(prev_close - low)))
+
+    alpha = 1 / length
+    out = np.full(close.shape, np.nan)
+    weighted = np.full(close.shape[0], np.nan)
+    old_wt = np.ones(close.shape[0])
+    for t in range(close.shape[1]):
+        cur = ranges[:, t]
+        valid = mask[:, t]
+        decayed = old_wt * (1 - alpha)
+        updated = np.where(weighted != cur, (decayed * weighted + cur) / (decayed + 1), weighted)
+        start = t == first
+        weighted = np.where(start, cur, np.where(valid, updated, weighted))
+        old_wt = np.where(start, 1.0, np.where(valid, decayed + 1, old_wt))
+        ready = valid & (t - first + 1 >= length)
+        out[:, t] = np.where(ready, weighted, np.nan)
+    return out
+
+
+def supertrend_batch(high, low, close, length=10, multiplier=3, mask=None):
+    """
+    Supertrend of every row, matching `indicators.indicator.supertrend_kernel`.
+
+    Parameters:
+    high, low, close (np.ndarray): (rows x time) prices, or 1-D series with per-row parameters.
+    length (int | np.ndarray): ATR period, one value or one per row.
+    multiplier (float | np.ndarray): ATR multiplier, one value or one per row.
+    mask (np.ndarray): Valid values, see `ema_batch`.
+
+    Returns:
+    tuple: (trend, final_lowerband, final_upperband) matrices; trend is True for an uptrend,
+        the bands are NaN on the inactive side and outside the mask.
+    """
+    (high, low, close), mask, first, (length, multiplier) = _prepare([high, low, close], mask, length, multiplier)
+    atr = _atr(high, low, close, mask, first, length)
+    hl2 = (high + low) / 2
+    upper = hl2 + multiplier[:, None] * atr
+    lower = hl2 - multiplier[:, None] * atr
+
+    rows, width = close.shape
+    trend = np.ones((rows, width), dtype=bool)
+    final_upper = np.full((rows, width), np.nan)
+    final_lower = np.full((rows, width), np.nan)
+    prev_trend = np.ones(rows, dtype=bool)
+    prev_upper = np.full(rows, np.nan)
+    prev_lower = np.full(rows, np.nan)
+    for t in range(width):
+        valid = mask[:, t]
+        start = t == first
+        cur_close, cur_upper, cur_lower = close[:, t], upper[:, t], lower[:, t]
+        up = cur_close > prev_upper
+        down = ~up & (cur_close < prev_lower)
+        keep = ~up & ~down
+        cur_trend = np.where(up, True, np.where(down, False, prev_trend))
+        cur_lower = np.where(keep & cur_trend & (cur_lower < prev_lower), prev_lower, cur_lower)
+        cur_upper = np.where(keep & ~cur_trend & (cur_upper > prev_upper), prev_upper, cur_upper)
+        # A row's first candle is an uptrend with both raw bands, like the single-series kernel
+        cur_trend = np.where(start, True, cur_trend)
+        cur_upper = np.where(start, upper[:, t], np.where(cur_trend, np.nan, cur_upper))
+        cur_lower = np.where(start, lower[:, t], np.where(cur_trend, cur_lower, np.nan))
+        prev_trend = np.where(valid, cur_trend, prev_trend)
+        prev_upper = np.where(valid, cur_upper, prev_upper)
+        prev_lower = np.where(valid, cur_lower, prev_lower)
+        trend[:, t] = np.where(valid, cur_trend, True)
+        final_upper[:, t] = np.where(valid, cur_upper, np.nan)
+        final_lower[:, t] = np.where(valid, cur_lower, np.nan)
+    return trend, final_lower, final_upper
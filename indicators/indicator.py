@@ -29,97 +29,206 @@ def vwap(df):
     df.loc[:, 'vwap'] = (((df['High'] + df['Low'] + df['Close']) / 3) * df['Volume']).cumsum() / df['Volume'].cumsum()
     return df
 
-def supertrend(df, length=10, multiplier=3):
-    
-    high = df['High']
-    low = df['Low']
-    close = df['Close']
-    
-    # calculate ATR
-    price_diffs = [high - low, 
-                   high - close.shift(), 
-                   close.shift() - low]
-    true_range = pd.concat(price_diffs, axis=1)
-    true_range = true_range.abs().max(axis=1)
-    # default ATR calculation in supertrend indicator
-    atr = true_range.ewm(alpha=1/length,min_periods=length).mean() 
-    # df['atr'] = df['tr'].rolling(atr_period).mean()
-    
-    # HL2 is simply the average of high and low prices
+def _ewm_update(weighted, old_wt, cur, alpha, adjust=True):
+    """
+    Advance an exponentially weighted mean by one value, mirroring pandas' ewm recursion.
+
+    Parameters:
+    weighted (float): The current weighted mean (NaN if nothing observed yet).
+    old_wt (float): The accumulated weight of `weighted`.
+    cur (float): The new value.
+    alpha (float): Smoothing factor.
+    adjust (bool): Use the adjusted (weights normalised) form of the average.
+
+    Returns:
+    tuple: The updated (weighted, old_wt).
+    """
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            new_wt = 1.0 if adjust else alpha
+            # avoid numerical errors on constant series
+            if weighted != cur:
+                weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+            old_wt = old_wt + new_wt if adjust else 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+
+def _ewm_mean(values, alpha, min_periods=0, adjust=True):
+    """
+    Exponentially weighted mean over a 1-D array, matching pandas' `ewm(alpha=...).mean()`.
+
+    Parameters:
+    values (np.ndarray): Input values (NaNs are skipped, as in pandas with ignore_na=False).
+    alpha (float): Smoothing factor.
+    min_periods (int): Minimum number of observations before a value is emitted.
+    adjust (bool): Use the adjusted (weights normalised) form of the average.
+
+    Returns:
+    np.ndarray: The exponentially weighted mean.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return pd.Series(values).ewm(alpha=alpha, min_periods=min_periods, adjust=adjust).mean().to_numpy()
+
+
+def true_range(high, low, close):
+    """
+    Calculate the True Range over raw arrays.
+
+    Parameters:
+    high (np.ndarray): High prices.
+    low (np.ndarray): Low prices.
+    close (np.ndarray): Close prices.
+
+    Returns:
+    np.ndarray: max(high - low, |high - prev_close|, |prev_close - low|), with the
+    first value falling back to high - low.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+    ranges = np.abs(np.vstack([high - low, high - prev_close, prev_close - low]))
+    return np.fmax.reduce(ranges, axis=0)
+
+
+def atr(high, low, close, length=10):
+    """
+    Calculate the Average True Range (Wilder smoothing) over raw arrays.
+
+    Parameters:
+    high (np.ndarray): High prices.
+    low (np.ndarray): Low prices.
+    close (np.ndarray): Close prices.
+    length (int): The ATR period.
+
+    Returns:
+    np.ndarray: The ATR, NaN for the first `length - 1` values.
+    """
+    return _ewm_mean(true_range(high, low, close), alpha=1/length, min_periods=length)
+
+
+def supertrend_kernel(high, low, close, length=10, multiplier=3, atr_values=None):
+    """
+    Compute the Supertrend over raw arrays in a single pass.
+
+    Parameters:
+    high (np.ndarray): High prices.
+    low (np.ndarray): Low prices.
+    close (np.ndarray): Close prices.
+    length (int): The ATR period.
+    multiplier (float): The ATR multiplier for the bands.
+    atr_values (np.ndarray): Precomputed `atr(high, low, close, length)`, computed here if None.
+
+    Returns:
+    tuple: (trend, final_lowerband, final_upperband) where trend is a boolean array
+    (True for an uptrend) and the bands are NaN on the inactive side.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    if atr_values is None:
+        atr_values = atr(high, low, close, length)
     hl2 = (high + low) / 2
-    # upperband and lowerband calculation
-    # notice that final bands are set to be equal to the respective bands
-    final_upperband = upperband = hl2 + (multiplier * atr)
-    final_lowerband = lowerband = hl2 - (multiplier * atr)
-    
-    # initialize Supertrend column to True
-    supertrend = [True] * len(df)
-    
-    for i in range(1, len(df.index)):
-        curr, prev = i, i-1
-        
-        # if current close price crosses above upperband
-        if close[curr] > final_upperband[prev]:
-            supertrend[curr] = True
-        # if current close price crosses below lowerband
-        elif close[curr] < final_lowerband[prev]:
-            supertrend[curr] = False
-        # else, the trend continues
+    # Plain lists keep the recursion free of numpy/pandas scalar boxing
+    upper = (hl2 + multiplier * atr_values).tolist()
+    lower = (hl2 - multiplier * atr_values).tolist()
+    closes = close.tolist()
+    n = len(closes)
+    trend = [True] * n
+    nan = np.nan
+    for curr in range(1, n):
+        prev = curr - 1
+        if closes[curr] > upper[prev]:
+            trend[curr] = True
+        elif closes[curr] < lower[prev]:
+            trend[curr] = False
         else:
-            supertrend[curr] = supertrend[prev]
-            
-            # adjustment to the final bands
-            if supertrend[curr] == True and final_lowerband[curr] < final_lowerband[prev]:
-                final_lowerband[curr] = final_lowerband[prev]
-            if supertrend[curr] == False and final_upperband[curr] > final_upperband[prev]:
-                final_upperband[curr] = final_upperband[prev]
-
-        # to remove bands according to the trend direction
-        if supertrend[curr] == True:
-            final_upperband[curr] = np.nan
+            trend[curr] = trend[prev]
+            if trend[curr] and lower[curr] < lower[prev]:
+                lower[curr] = lower[prev]
+            if not trend[curr] and upper[curr] > upper[prev]:
+                upper[curr] = upper[prev]
+        if trend[curr]:
+            upper[curr] = nan
         else:
-            final_lowerband[curr] = np.nan
-    
-    df['supertrend'] = supertrend
+            lower[curr] = nan
+    return np.asarray(trend, dtype=bool), np.asarray(lower), np.asarray(upper)
+
+
+def supertrend(df, length=10, multiplier=3):
+    """
+    Calculate the Supertrend indicator.
+
+    Parameters:
+    df (pd.DataFrame): DataFrame containing the data with 'High', 'Low', 'Close'.
+    length (int): The ATR period (default is 10).
+    multiplier (float): The ATR multiplier for the bands (default is 3).
+
+    Returns:
+    pd.DataFrame: The DataFrame with 'supertrend', 'final_lowerband' and 'final_upperband' columns added.
+    """
+    trend, final_lowerband, final_upperband = supertrend_kernel(
+        df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(), length, multiplier
+    )
+    df['supertrend'] = trend
     df['final_lowerband'] = final_lowerband
     df['final_upperband'] = final_upperband
 
     return df
 
 def supertrend1(df, length=10, multiplier=3):
-    # Calculate the True Range (TR)
-    df['High_Low'] = df['High'] - df['Low']
-    df['High_Close'] = abs(df['High'] - df['Close'].shift(1))
-    df['Low_Close'] = abs(df['Low'] - df['Close'].shift(1))
-    df['True_Range'] = df[['High_Low', 'High_Close', 'Low_Close']].max(axis=1)
+    """
+    Calculate the rolling-ATR variant of the Supertrend indicator.
+
+    Parameters:
+    df (pd.DataFrame): DataFrame containing the data with 'High', 'Low', 'Close'.
+    length (int): The rolling ATR window (default is 10).
+    multiplier (float): The ATR multiplier for the bands (default is 3).
+
+    Returns:
+    pd.DataFrame: The DataFrame with 'ATR', 'supertrend_upper', 'supertrend_lower',
+    'Supertrend' and 'Trend_Direction' columns added.
+    """
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
 
     # Calculate the Average True Range (ATR)
-    df['ATR'] = df['True_Range'].rolling(window=length).mean()
+    atr_values = pd.Series(true_range(high, low, close)).rolling(window=length).mean().to_numpy()
 
     # Calculate the Supertrend
-    df['supertrend_upper'] = (df['High'] + df['Low']) / 2 + (multiplier * df['ATR'])
-    df['supertrend_lower'] = (df['High'] + df['Low']) / 2 - (multiplier * df['ATR'])
-
-    # Initialize the Supertrend and Trend Direction
-    df['Supertrend'] = 0.0
-    df['Trend_Direction'] = 0
+    hl2 = (high + low) / 2
+    upper = (hl2 + multiplier * atr_values).tolist()
+    lower = (hl2 - multiplier * atr_values).tolist()
+    closes = close.tolist()
+    n = len(closes)
+    band = [0.0] * n
+    direction = [0] * n
 
-    for i in range(1, len(df)):
-        if df.loc[i - 1, 'Trend_Direction'] == 1:  # Previous trend was up
-            df.loc[i, 'Supertrend'] = df.loc[i, 'supertrend_upper'] if df.loc[i, 'Close'] > df.loc[i - 1, 'Supertrend'] else df.loc[i - 1, 'Supertrend']
-            df.loc[i, 'Trend_Direction'] = 1 if df.loc[i, 'Close'] > df.loc[i, 'Supertrend'] else -1
+    for i in range(1, n):
+        if direction[i - 1] == 1:  # Previous trend was up
+            band[i] = upper[i] if closes[i] > band[i - 1] else band[i - 1]
+            direction[i] = 1 if closes[i] > band[i] else -1
         else:  # Previous trend was down
-            df.loc[i, 'Supertrend'] = df.loc[i, 'supertrend_lower'] if df.loc[i, 'Close'] < df.loc[i - 1, 'Supertrend'] else df.loc[i - 1, 'Supertrend']
-            df.loc[i, 'Trend_Direction'] = -1 if df.loc[i, 'Close'] < df.loc[i, 'Supertrend'] else 1
-        
+            band[i] = lower[i] if closes[i] < band[i - 1] else band[i - 1]
+            direction[i] = -1 if closes[i] < band[i] else 1
+
         # Update Upper_Band and Lower_Band
-        if df.loc[i, 'Trend_Direction'] == 1:
-            df.loc[i, 'supertrend_upper'] = min(df.loc[i, 'supertrend_upper'], df.loc[i - 1, 'supertrend_upper'])
+        if direction[i] == 1:
+            upper[i] = min(upper[i], upper[i - 1])
         else:
-            df.loc[i, 'supertrend_lower'] = max(df.loc[i, 'supertrend_lower'], df.loc[i - 1, 'supertrend_lower'])
+            lower[i] = max(lower[i], lower[i - 1])
 
-    # Clean up temporary columns
-    df.drop(columns=['High_Low', 'High_Close', 'Low_Close', 'True_Range'], inplace=True)
+    df['ATR'] = atr_values
+    df['supertrend_upper'] = upper
+    df['supertrend_lower'] = lower
+    df['Supertrend'] = band
+    df['Trend_Direction'] = direction
 
     return df
 
@@ -0,0 +1,183 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from indicators.indicator import true_range, _ewm_mean, supertrend_kernel
+
+# name -> {'function', 'params', 'defaults', 'columns'}, filled by `register`
+INDICATORS = {}
+# name -> function(context, *params), filled by `intermediate`
+INTERMEDIATES = {}
+
+
+def register(name, columns=None):
+    """
+    Register an indicator under `name`.
+
+    The decorated function(context, *params) returns one array per output column. Specs
+    append the parameters to the name ('ema_34', 'supertrend_10_3'); missing trailing
+    parameters take the function's defaults. The output columns are `columns` (default: the
+    name) plus the parameter suffix of the spec, so 'rsi' writes 'rsi' and 'rsi_7' writes 'rsi_7'.
+    """
+    def wrap(function):
+        params = list(inspect.signature(function).parameters.values())[1:]
+        INDICATORS[name] = {
+            "function": function,
+            "params": tuple(param.name for param in params),
+            "defaults": tuple(param.default for param in params),
+            "columns": tuple(columns or (name,)),
+        }
+        return function
+    return wrap
+
+
+def intermediate(name):
+    """
+    Register a shared intermediate series, computed at most once per `IndicatorContext`.
+    """
+    def wrap(function):
+        INTERMEDIATES[name] = function
+        return function
+    return wrap
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def parse_spec(spec):
+    """
+    Split an indicator spec into its registered name and parameters.
+
+    Returns:
+    tuple: (name, params, columns), or None when the spec names no registered indicator or
+        its parameters are not numbers.
+    """
+    parts = spec.split("_")
+    for split in range(len(parts), 0, -1):
+        name = "_".join(parts[:split])
+        if name not in INDICATORS:
+            continue
+        entry = INDICATORS[name]
+        try:
+            params = tuple(_number(part) for part in parts[split:])
+        except ValueError:
+            return None
+        if len(params) > len(entry["params"]) or inspect.Parameter.empty in entry["defaults"][len(params):]:
+            return None
+        params += entry["defaults"][len(params):]
+        suffix = spec[len(name):]
+        return name, params, tuple(column + suffix for column in entry["columns"])
+    return None
+
+
+class IndicatorContext:
+    """
+    The candle columns of one frame plus the intermediates derived from them.
+
+    Indicators ask for intermediates with `get`; each (name, params) pair is computed on
+    first use and then shared, so the dependency graph (e.g. supertrend -> atr -> true_range)
+    is evaluated once per frame however many indicators need it.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.cache = {}
+
+    def __getitem__(self, column):
+        key = ("column", column)
+        if key not in self.cache:
+            self.cache[key] = np.asarray(self.data[column], dtype=np.float64)
+        return self.cache[key]
+
+    def get(self, name, *params):
+        key = (name,) + params
+        if key not in self.cache:
+            self.cache[key] = INTERMEDIATES[name](self, *params)
+        return self.cache[key]
+
+    def compute(self, specs):
+        """
+        Compute the indicator specs; unknown specs are skipped.
+
+        Returns:
+        dict: Output column -> array, in the order of `specs`.
+        """
+        values = {}
+        for spec in specs:
+            parsed = parse_spec(spec)
+            if parsed is None:
+                continue
+            name, params, columns = parsed
+            values.update(zip(columns, INDICATORS[name]["function"](self, *params)))
+        return values
+
+
+@intermediate("true_range")
+def _true_range(context):
+    return true_range(context["High"], context["Low"], context["Close"])
+
+
+@intermediate("atr")
+def _atr(context, length):
+    return _ewm_mean(context.get("true_range"), alpha=1/length, min_periods=length)
+
+
+@intermediate("close_diff")
+def _close_diff(context):
+    return pd.Series(context["Close"]).diff()
+
+
+@intermediate("gains")
+def _gains(context):
+    delta = context.get("close_diff")
+    return delta.where(delta > 0, 0)
+
+
+@intermediate("losses")
+def _losses(context):
+    delta = context.get("close_diff")
+    return -delta.where(delta < 0, 0)
+
+
+@intermediate("typical_price")
+def _typical_price(context):
+    return (pd.Series(context["High"]) + pd.Series(context["Low"]) + pd.Series(context["Close"])) / 3
+
+
+@register("ema")
+def _ema(context, length=20):
+    return (pd.Series(context["Close"]).ewm(span=length, adjust=False).mean().to_numpy(),)
+
+
+@register("rsi")
+def _rsi(context, length=14):
+    gain = context.get("gains").rolling(window=length).mean()
+    loss = context.get("losses").rolling(window=length).mean()
+    return ((100 - (100 / (1 + gain / loss))).to_numpy(),)
+
+
+@register("vwap")
+def _vwap(context):
+    volume = pd.Series(context["Volume"])
+    return (((context.get("typical_price") * volume).cumsum() / volume.cumsum()).to_numpy(),)
+
+
+@register("supertrend", columns=("supertrend", "final_lowerband", "final_upperband"))
+def _supertrend(context, length=10, multiplier=3):
+    return supertrend_kernel(
+        context["High"], context["Low"], context["Close"], length, multiplier, atr_values=context.get("atr", length)
+    )
+
+
+def add_indicators(df, indicators):
+    """
+    Add the columns of the indicator specs (e.g. ['ema_34', 'rsi_7', 'supertrend_10_3', 'vwap'])
+    to `df` in one assignment. Specs that name no registered indicator are ignored.
+    """
+    values = IndicatorContext(df).compute(indicators)
+    if not values:
+        return df
+    df = df.drop(columns=[column for column in values if column in df.columns])
+    return pd.concat([df, pd.DataFrame(values, index=df.index)], axis=1)
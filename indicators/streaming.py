@@ -0,0 +1,254 @@
+import math
+
+import numpy as np
+
+from indicators.indicator import _ewm_update
+from indicators.registry import parse_spec
+
+
+class StreamingIndicator:
+    """
+    Base class for indicators that are updated one candle at a time.
+
+    Each indicator keeps the state of the last *closed* candle. A still-forming candle
+    can be passed repeatedly with `closed=False`; every revision is evaluated against
+    the committed state, so only the final `closed=True` update advances it.
+    """
+    columns = ()
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._state = self.initial_state()
+        self.values = {column: np.nan for column in self.columns}
+
+    def initial_state(self):
+        raise NotImplementedError
+
+    def step(self, state, candle):
+        """
+        Apply one candle to `state`.
+
+        Returns:
+        tuple: (new_state, values) where values maps column name to value.
+        """
+        raise NotImplementedError
+
+    def update(self, candle, closed=True):
+        """
+        Feed one candle.
+
+        Parameters:
+        candle (Mapping): Candle with 'High', 'Low', 'Close' and 'Volume' fields.
+        closed (bool): Whether the candle is final. Forming candles do not advance the state.
+
+        Returns:
+        dict: The indicator values for this candle.
+        """
+        state, self.values = self.step(self._state, candle)
+        if closed:
+            self._state = state
+        return self.values
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    Streaming counterpart of `indicators.indicator.ema`.
+    """
+    def __init__(self, length, suffix=None):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.columns = (f"ema_{length}" if suffix is None else "ema" + suffix,)
+        super().__init__()
+
+    def initial_state(self):
+        # (weighted mean, accumulated weight)
+        return (np.nan, 1.0)
+
+    def step(self, state, candle):
+        weighted, old_wt = state
+        close = float(candle['Close'])
+        if weighted != weighted:
+            weighted, old_wt = close, 1.0
+        else:
+            weighted, old_wt = _ewm_update(weighted, old_wt, close, self.alpha, adjust=False)
+        return (weighted, old_wt), {self.columns[0]: weighted}
+
+
+class StreamingRSI(StreamingIndicator):
+    """
+    Streaming counterpart of `indicators.indicator.rsi` (simple moving average of gains and losses).
+    """
+    columns = ('rsi',)
+
+    def __init__(self, length=14, suffix=''):
+        self.length = length
+        self.columns = tuple(column + suffix for column in type(self).columns)
+        super().__init__()
+
+    def initial_state(self):
+        # (previous close, last `length` gains, last `length` losses)
+        return (None, (), ())
+
+    def step(self, state, candle):
+        prev_close, gains, losses = state
+        close = float(candle['Close'])
+        delta = 0.0 if prev_close is None else close - prev_close
+        gains = (gains + (max(delta, 0.0),))[-self.length:]
+        losses = (losses + (max(-delta, 0.0),))[-self.length:]
+        value = np.nan
+        if len(gains) == self.length:
+            gain = math.fsum(gains) / self.length
+            loss = math.fsum(losses) / self.length
+            if loss > 0:
+                value = 100 - (100 / (1 + gain / loss))
+            elif gain > 0:
+                value = 100.0
+        return (close, gains, losses), {self.columns[0]: value}
+
+
+class StreamingVWAP(StreamingIndicator):
+    """
+    Streaming counterpart of `indicators.indicator.vwap`.
+    """
+    columns = ('vwap',)
+
+    def __init__(self, suffix=''):
+        self.columns = tuple(column + suffix for column in type(self).columns)
+        super().__init__()
+
+    def initial_state(self):
+        # (cumulative typical price * volume, cumulative volume)
+        return (0.0, 0.0)
+
+    def step(self, state, candle):
+        cum_pv, cum_volume = state
+        volume = float(candle['Volume'])
+        typical_price = (float(candle['High']) + float(candle['Low']) + float(candle['Close'])) / 3
+        cum_pv += typical_price * volume
+        cum_volume += volume
+        value = cum_pv / cum_volume if cum_volume else np.nan
+        return (cum_pv, cum_volume), {self.columns[0]: value}
+
+
+class StreamingSupertrend(StreamingIndicator):
+    """
+    Streaming counterpart of `indicators.indicator.supertrend`.
+    """
+    columns = ('supertrend', 'final_lowerband', 'final_upperband')
+
+    def __init__(self, length=10, multiplier=3, suffix=''):
+        self.length = length
+        self.multiplier = multiplier
+        self.columns = tuple(column + suffix for column in type(self).columns)
+        super().__init__()
+
+    def initial_state(self):
+        # (atr weighted mean, atr weight, observations, previous close,
+        #  previous final upper band, previous final lower band, previous trend)
+        return (np.nan, 1.0, 0, None, np.nan, np.nan, True)
+
+    def step(self, state, candle):
+        weighted, old_wt, nobs, prev_close, prev_upper, prev_lower, prev_trend = state
+        high, low, close = float(candle['High']), float(candle['Low']), float(candle['Close'])
+
+        if prev_close is None:
+            tr = abs(high - low)
+            weighted, old_wt = tr, 1.0
+        else:
+            tr = max(abs(high - low), abs(high - prev_close), abs(prev_close - low))
+            weighted, old_wt = _ewm_update(weighted, old_wt, tr, 1 / self.length)
+        nobs += 1
+        atr = weighted if nobs >= self.length else np.nan
+
+        hl2 = (high + low) / 2
+        upper = hl2 + self.multiplier * atr
+        lower = hl2 - self.multiplier * atr
+        trend = True
+        if prev_close is not None:
+            if close > prev_upper:
+                trend = True
+            elif close < prev_lower:
+                trend = False
+            else:
+                trend = prev_trend
+                if trend and lower < prev_lower:
+                    lower = prev_lower
+                if not trend and upper > prev_upper:
+                    upper = prev_upper
+            if trend:
+                upper = np.nan
+            else:
+                lower = np.nan
+
+        state = (weighted, old_wt, nobs, close, upper, lower, trend)
+        return state, dict(zip(self.columns, (trend, lower, upper)))
+
+
+def make_streaming_indicator(name):
+    """
+    Build the streaming indicator for an indicator spec ('ema_20', 'rsi_7', 'vwap', 'supertrend_10_3'),
+    writing the same columns as `indicators.registry`.
+
+    Returns None for specs the registry does not know either, so both ignore them alike.
+    """
+    parsed = parse_spec(name)
+    if parsed is None:
+        return None
+    indicator, params, _ = parsed
+    suffix = name[len(indicator):]
+    if indicator == 'ema':
+        return StreamingEMA(*params, suffix=suffix)
+    if indicator == 'rsi':
+        return StreamingRSI(*params, suffix=suffix)
+    if indicator == 'vwap':
+        return StreamingVWAP(suffix=suffix)
+    if indicator == 'supertrend':
+        return StreamingSupertrend(*params, suffix=suffix)
+    return None
+
+
+class IndicatorStream:
+    """
+    A set of streaming indicators fed from the same candle sequence.
+
+    `position` counts the closed candles consumed so far, which lets callers advance the
+    stream to a row index of a DataFrame without re-reading earlier rows.
+    """
+    def __init__(self, indicators):
+        self.indicators = [make_streaming_indicator(name) for name in indicators]
+        self.indicators = [indicator for indicator in self.indicators if indicator is not None]
+        self.columns = [column for indicator in self.indicators for column in indicator.columns]
+        self.position = 0
+
+    def reset(self):
+        for indicator in self.indicators:
+            indicator.reset()
+        self.position = 0
+
+    def update(self, candle, closed=True):
+        """
+        Feed one candle to every indicator and return the merged column values.
+        """
+        values = {}
+        for indicator in self.indicators:
+            values.update(indicator.update(candle, closed=closed))
+        if closed:
+            self.position += 1
+        return values
+
+    def advance(self, df, idx):
+        """
+        Consume the closed candles of `df` (a DataFrame or a dict of column arrays) up to
+        (not including) row `idx`.
+
+        Moving backwards resets the stream and replays from the first row.
+        """
+        if idx < self.position:
+            self.reset()
+        if idx > self.position:
+            rows = zip(*(np.asarray(df[column])[self.position:idx] for column in ('High', 'Low', 'Close', 'Volume')))
+            for high, low, close, volume in rows:
+                self.update({'High': high, 'Low': low, 'Close': close, 'Volume': volume})
+        return self
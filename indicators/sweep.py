@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from indicators.registry import INDICATORS, IndicatorContext
+from trading_env.backtester import backtest, signals_to_decisions
+
+
+def close_above(columns, values, lower=None, upper=None):
+    """
+    Long while the close is above the indicator line (e.g. an EMA), short below it.
+    """
+    line = next(iter(values.values()))
+    return np.where(np.isnan(line), 0, np.where(columns["Close"] > line, 1, -1))
+
+
+def supertrend_side(columns, values, lower=None, upper=None):
+    """
+    Long in a Supertrend uptrend, short in a downtrend.
+    """
+    return np.where(values["supertrend"], 1, -1)
+
+
+def rsi_reversion(columns, values, lower=30, upper=70):
+    """
+    Long from an RSI below `lower` until it rises above `upper`, and the reverse for shorts.
+    """
+    rsi = values["rsi"]
+    entries = np.where(rsi < lower, 1.0, np.where(rsi > upper, -1.0, np.nan))
+    return pd.Series(entries).ffill().fillna(0).to_numpy()
+
+
+# Rule-based signals, name -> function(columns, values, **signal_params) returning 1/-1/0 per candle
+SIGNALS = {"close_above": close_above, "supertrend_side": supertrend_side, "rsi_reversion": rsi_reversion}
+
+
+def param_grid(**params):
+    """
+    Expand parameter value lists into every combination, e.g.
+    param_grid(length=[7, 10, 14], multiplier=[2, 3]) -> [{'length': 7, 'multiplier': 2}, ...].
+    """
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*(params[name] for name in names))]
+
+
+class SharedColumns:
+    """
+    Arrays placed once in one shared memory block, so worker processes map them instead of
+    receiving a pickled copy with every task.
+    """
+    def __init__(self, columns):
+        columns = {name: np.ascontiguousarray(values) for name, values in columns.items() if np.asarray(values).dtype != object}
+        self.layout, offset = {}, 0
+        for name, values in columns.items():
+            self.layout[name] = (offset, values.dtype.str, values.shape)
+            # 64 byte alignment keeps every column aligned for vector loads
+            offset += -(-values.nbytes // 64) * 64
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.columns = self._views(self.shm, self.layout)
+        for name, values in columns.items():
+            self.columns[name][...] = values
+
+    @staticmethod
+    def _views(shm, layout):
+        return {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, (offset, dtype, shape) in layout.items()
+        }
+
+    @property
+    def handle(self):
+        return self.shm.name, self.layout
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Map the arrays of `handle` in another process. Returns (shared memory, column views).
+        """
+        name, layout = handle
+        shm = shared_memory.SharedMemory(name=name)
+        return shm, cls._views(shm, layout)
+
+    def close(self):
+        self.columns = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Shared arrays of the current worker process, attached once by `_init_worker`
+_worker = {}
+
+
+def _init_worker(handles):
+    for key, handle in handles.items():
+        shm, columns = SharedColumns.attach(handle) if handle is not None else (None, None)
+        _worker[key] = (shm, columns)
+
+
+def evaluate(columns, base, indicator, params, signal=None, signal_params=None, score=None, backtest_kwargs=None):
+    """
+    Compute one parameter set and score it.
+
+    With a `signal`, the signal becomes decisions at each candle's CloseTime and is
+    backtested on the 1 minute `base` candles; the backtest stats are the metrics. A `score`
+    function(columns, values, params) returning a dict of metrics replaces or extends them.
+
+    Returns:
+    dict: params, metrics and the compute time.
+    """
+    start = time.perf_counter()
+    entry = INDICATORS[indicator]
+    values = dict(zip(entry["columns"], entry["function"](IndicatorContext(columns), **params)))
+    result = {"indicator": indicator, "params": params}
+    if signal is not None:
+        signal = SIGNALS[signal] if isinstance(signal, str) else signal
+        position = signal(columns, values, **(signal_params or {}))
+        backtest_kwargs = dict(backtest_kwargs or {})
+        stop_pct, take_pct = backtest_kwargs.pop("stop_pct", None), backtest_kwargs.pop("take_pct", None)
+        decisions = signals_to_decisions(columns["CloseTime"], position, columns["Close"], stop_pct, take_pct)
+        result.update(backtest(base, decisions, **backtest_kwargs)["stats"])
+    if score is not None:
+        result.update(score(columns, values, params))
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _evaluate_chunk(chunk, options):
+    columns = _worker["columns"][1]
+    base = _worker["base"][1] if _worker["base"][1] is not None else columns
+    return [evaluate(columns, base, params=params, **options) for params in chunk]
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True, default=_json_value)
+
+
+def ranked_path(out_path):
+    """
+    Path of the ranked results of `out_path`: its extension replaced by '.ranked.jsonl'.
+    """
+    return os.path.splitext(out_path)[0] + ".ranked.jsonl"
+
+
+def _name(function):
+    if function is None or isinstance(function, str):
+        return function
+    return f"{function.__module__}.{function.__qualname__}"
+
+
+def _header(indicator, signal, signal_params, score, backtest_kwargs):
+    """
+    First line of a results file: what its results were computed with, everything but the grid.
+    """
+    run = {
+        "indicator": indicator,
+        "signal": _name(signal),
+        "signal_params": signal_params or {},
+        "score": _name(score),
+        "backtest_kwargs": backtest_kwargs or {},
+    }
+    return json.dumps({"sweep": run}, sort_keys=True, default=_json_value)
+
+
+def sweep(
+    columns,
+    indicator,
+    grid,
+    base=None,
+    signal=None,
+    signal_params=None,
+    score=None,
+    backtest_kwargs=None,
+    workers: int=None,
+    chunksize: int=8,
+    out_path: str="sweep_results.jsonl",
+    rank_by: str="total_return",
+    top: int=50
+):
+    """
+    Evaluate an indicator over a grid of parameters on all cores.
+
+    The candle arrays (and the 1 minute `base` used by backtests) are put in shared memory
+    once; workers receive only parameter chunks. Each result is appended to `out_path` as
+    it arrives, parameter sets already in the file are skipped, so an interrupted sweep
+    resumes. The file starts with a header line recording the indicator, signal, score and
+    backtest arguments, and a file written for different ones is refused. When done, all
+    results are ranked by `rank_by` into `ranked_path(out_path)` (e.g.
+    sweep_results.ranked.jsonl).
+
+    Parameters:
+    columns (dict | pd.DataFrame): Candles the indicator runs on, with epoch ms CloseTime
+        when a signal is backtested.
+    indicator (str): Name of a registered indicator (see `indicators.registry`), e.g. 'ema'.
+    grid (list): Parameter dicts, see `param_grid` (numpy scalars are stored as Python numbers).
+    base (dict | pd.DataFrame): 1 minute candles for the backtest, default `columns`.
+    signal (str | callable): Name in `SIGNALS` or a module level
+        function(columns, values, **signal_params).
+    signal_params (dict): Extra arguments of the signal.
+    score (callable): Module level function(columns, values, params) returning extra metrics.
+    backtest_kwargs (dict): Arguments of `backtest`, plus stop_pct and take_pct for the decisions.
+    workers (int): Worker processes, default one per core; <= 1 runs in-process.
+    chunksize (int): Parameter sets per task.
+    out_path (str): JSONL file the results are streamed to.
+    rank_by (str): Metric the ranking sorts on, highest first.
+    top (int): Number of ranked results returned.
+
+    Returns:
+    pd.DataFrame: The `top` results by `rank_by`.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    columns = {name: np.asarray(values) for name, values in dict(columns).items()}
+    base = {name: np.asarray(values) for name, values in dict(base).items()} if base is not None else None
+    options = {"indicator": indicator, "signal": signal, "signal_params": signal_params, "score": score, "backtest_kwargs": backtest_kwargs}
+    grid = [{name: _json_value(value) for name, value in params.items()} for params in grid]
+
+    header = _header(indicator, signal, signal_params, score, backtest_kwargs)
+    lines = []
+    if os.path.exists(out_path):
+        with open(out_path, "rb+") as f:
+            data = f.read()
+            # An interrupted run can leave a torn last line, the next result would be glued onto it
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                f.truncate(complete)
+        lines = data[:complete].decode().splitlines()
+    done = set()
+    if lines:
+        if lines[0] != header:
+            raise ValueError(f"{out_path} holds results of a different sweep, expected the header {header}")
+        for line in lines[1:]:
+            try:
+                done.add(_key(json.loads(line)["params"]))
+            except json.JSONDecodeError:
+                continue
+    else:
+        with open(out_path, "w") as f:
+            f.write(header + "\n")
+    pending = [params for params in grid if _key(params) not in done]
+    chunks = [pending[i:i + chunksize] for i in range(0, len(pending), chunksize)]
+
+    with open(out_path, "a") as out:
+        def write(results):
+            for result in results:
+                out.write(json.dumps(result, default=_json_value) + "\n")
+            out.flush()
+
+        if workers <= 1:
+            for chunk in chunks:
+                write([evaluate(columns, base if base is not None else columns, params=params, **options) for params in chunk])
+        else:
+            shared = {"columns": SharedColumns(columns), "base": SharedColumns(base) if base is not None else None}
+            handles = {key: value.handle if value is not None else None for key, value in shared.items()}
+            try:
+                # Spawned rather than forked, as in charts.pool: the parent may be running threads
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(handles,),
+                ) as executor:
+                    # A bounded number of chunks in flight keeps memory flat for large grids
+                    queue, in_flight = iter(chunks), set()
+                    for chunk in itertools.islice(queue, workers * 4):
+                        in_flight.add(executor.submit(_evaluate_chunk, chunk, options))
+                    while in_flight:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            write(future.result())
+                            for chunk in itertools.islice(queue, 1):
+                                in_flight.add(executor.submit(_evaluate_chunk, chunk, options))
+            finally:
+                for value in shared.values():
+                    if value is not None:
+                        value.close()
+    return rank_results(out_path, rank_by, top)
+
+
+def rank_results(out_path, rank_by: str="total_return", top: int=50):
+    """
+    Rank the streamed results of `out_path` by `rank_by` (highest first), write them all to
+    `ranked_path(out_path)` and return the `top` ones.
+    """
+    ranked = []
+    with open(out_path) as f:
+        for i, line in enumerate(f):
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "sweep" in result:
+                continue
+            value = result.get(rank_by)
+            ranked.append((value if value is not None else -np.inf, i, result))
+    ranked = heapq.nlargest(len(ranked), ranked, key=lambda item: (item[0], -item[1]))
+    with open(ranked_path(out_path), "w") as f:
+        for _, _, result in ranked:
+            f.write(json.dumps(result) + "\n")
+    return pd.json_normalize([result for _, _, result in ranked[:top]])
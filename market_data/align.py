@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from market_data.candles import CandleSeries
+from market_data.candle_store import TIME_COLUMNS, to_epoch_ms, times_to_epoch_ms
+
+
+def closed_index(times, close_times):
+    """
+    For every time, the index of the last candle closed at or before it, -1 when none is.
+
+    Parameters:
+    times (np.ndarray): Query times, epoch ms (e.g. the base candles' CloseTime).
+    close_times (np.ndarray): Sorted CloseTime of the higher timeframe candles, epoch ms.
+    """
+    return np.searchsorted(times_to_epoch_ms(close_times), times_to_epoch_ms(times), side="right") - 1
+
+
+def project(values, index):
+    """
+    Gather `values` at `index` (from `closed_index`), NaN where the index is -1.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in "fc":
+        values = values.astype(np.float64)
+    out = values[np.maximum(index, 0)] if len(values) else np.full(len(index), np.nan)
+    out[index < 0] = np.nan
+    return out
+
+
+def _series(candles, precision):
+    if isinstance(candles, CandleSeries):
+        return candles
+    if isinstance(candles, pd.DataFrame):
+        return CandleSeries.from_frame(candles, precision)
+    return CandleSeries(candles, precision)
+
+
+def align_timeframes(base, higher, columns=None, precision: str="float64"):
+    """
+    Project the columns of higher timeframes onto every candle of a base timeframe, without
+    look-ahead: a base candle only sees the higher timeframe candles closed when it closed
+    (e.g. on a 15m candle closing at 10:59:59.999 the 1h candle of 10:00 is visible, the
+    1h candle of 11:00 is not). One binary search per timeframe, no per-row joins.
+
+    Parameters:
+    base (CandleSeries | dict | pd.DataFrame): Base timeframe candles with CloseTime.
+    higher (dict): timeframe -> candles (with CloseTime) carrying the feature columns.
+    columns (dict | list): Columns to project, per timeframe or one list for all (default:
+        every column except the times).
+    precision (str): Float precision of the table, see `CandleSeries`.
+
+    Returns:
+    FeatureTable: The base columns plus '<timeframe>_<column>' for every projected column.
+    """
+    base = _series(base, precision)
+    features = dict(base.columns)
+    for timeframe, candles in higher.items():
+        candles = _series(candles, precision)
+        names = columns.get(timeframe) if isinstance(columns, dict) else columns
+        names = [name for name in candles if name not in TIME_COLUMNS] if names is None else names
+        index = closed_index(base["CloseTime"], candles["CloseTime"])
+        for name in names:
+            features[f"{timeframe}_{name}"] = project(candles[name], index)
+    return FeatureTable(CandleSeries(features, precision))
+
+
+class FeatureTable:
+    """
+    Wide table of base candles and their aligned higher timeframe features.
+
+    `at(time)` returns the row of the last base candle closed by `time`. On a gap-free base
+    series the row is found arithmetically in O(1), otherwise by binary search.
+    """
+    def __init__(self, series):
+        self.series = series
+        close_times = series["CloseTime"]
+        steps = np.diff(close_times)
+        # Constant spacing (no missing candles) allows index arithmetic instead of a search
+        self.step = int(steps[0]) if len(steps) and np.all(steps == steps[0]) else None
+        self.first_close = int(close_times[0]) if len(close_times) else None
+
+    def __len__(self):
+        return len(self.series)
+
+    def __getitem__(self, column):
+        return self.series[column]
+
+    @property
+    def columns(self):
+        return list(self.series)
+
+    def index_at(self, time):
+        """
+        Row of the last base candle closed at or before `time` (epoch ms or string), -1 if none.
+        """
+        time = to_epoch_ms(time)
+        if self.first_close is None:
+            return -1
+        if self.step is not None:
+            return int(min((time - self.first_close) // self.step, len(self) - 1)) if time >= self.first_close else -1
+        return int(np.searchsorted(self.series["CloseTime"], time, side="right")) - 1
+
+    def at(self, time):
+        """
+        The features known at `time`, as a dict, or None before the first base candle closed.
+        """
+        index = self.index_at(time)
+        return self.series[index] if index >= 0 else None
+
+    def until(self, time, count: int=None):
+        """
+        The last `count` rows (all if None) known at `time`, as views.
+        """
+        index = self.index_at(time) + 1
+        return self.series[max(index - count, 0) if count is not None else 0:index]
+
+    def to_frame(self, time_format=None):
+        """
+        The table as a DataFrame, times as epoch ms unless a `time_format` is given.
+        """
+        return self.series.to_frame(time_format, ignore=False)
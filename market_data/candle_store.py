@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import datetime
+
+import numpy as np
+import pandas as pd
+
+TIME_FORMAT = "%d %b %Y %H:%M:%S"
+
+# Column name -> on-disk dtype. Times are epoch milliseconds, the unused 'Ignore' field is dropped.
+KLINE_SCHEMA = {
+    "OpenTime": np.dtype("<i8"),
+    "Open": np.dtype("<f8"),
+    "High": np.dtype("<f8"),
+    "Low": np.dtype("<f8"),
+    "Close": np.dtype("<f8"),
+    "Volume": np.dtype("<f8"),
+    "CloseTime": np.dtype("<i8"),
+    "QuoteAssetVolume": np.dtype("<f8"),
+    "NumberOfTrades": np.dtype("<i8"),
+    "TakerBuyBaseAssetVolume": np.dtype("<f8"),
+    "TakerBuyQuoteAssetVolume": np.dtype("<f8"),
+}
+TIME_COLUMNS = ("OpenTime", "CloseTime")
+
+
+def to_epoch_ms(value):
+    """
+    Convert a timestamp to epoch milliseconds (UTC).
+
+    Parameters:
+    value (int | str | datetime.datetime | np.datetime64): Epoch ms, a '%d %b %Y %H:%M:%S'
+        string (shorter forms such as '1 Jan 2024' are accepted too) or a datetime.
+
+    Returns:
+    int: Epoch milliseconds.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.strptime(value, TIME_FORMAT)
+        except ValueError:
+            value = pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(np.datetime64(value, "ms").astype(np.int64))
+
+
+def times_to_epoch_ms(values):
+    """
+    Vectorised `to_epoch_ms` for a column of timestamps (ints, datetimes or '%d %b %Y %H:%M:%S' strings).
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.int64)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ms]").astype(np.int64)
+    parsed = pd.to_datetime(pd.Series(values), format=TIME_FORMAT)
+    return parsed.to_numpy().astype("datetime64[ms]").astype(np.int64)
+
+
+def format_time(value, time_format=TIME_FORMAT):
+    """
+    Format one epoch millisecond value (UTC) as a string.
+    """
+    return datetime.datetime.fromtimestamp(value / 1000, tz=datetime.timezone.utc).strftime(time_format)
+
+
+def format_times(values, time_format=TIME_FORMAT):
+    """
+    Format epoch milliseconds as strings, used at the edges where callers still expect text timestamps.
+    """
+    return pd.to_datetime(np.asarray(values, dtype=np.int64), unit="ms").strftime(time_format).to_numpy(dtype=object)
+
+
+def frame_to_columns(df):
+    """
+    Extract the KLINE_SCHEMA columns of a DataFrame as typed arrays, times as epoch ms.
+    """
+    return {
+        column: times_to_epoch_ms(df[column].to_numpy()) if column in TIME_COLUMNS else df[column].to_numpy(dtype=dtype)
+        for column, dtype in KLINE_SCHEMA.items()
+    }
+
+
+def columns_to_frame(columns, time_format=TIME_FORMAT):
+    """
+    Build the DataFrame layout returned by `BinanceDataFetcher.get_historical_data` from kline columns.
+    """
+    df = pd.DataFrame(dict(columns))
+    if time_format is not None:
+        for column in TIME_COLUMNS:
+            if column in df.columns:
+                df[column] = format_times(df[column].to_numpy(), time_format)
+    return df
+
+
+def month_of(values):
+    """
+    Return the 'YYYY-MM' partition key for each epoch millisecond value.
+    """
+    months = np.asarray(values, dtype=np.int64).astype("datetime64[ms]").astype("datetime64[M]")
+    return np.datetime_as_string(months, unit="M")
+
+
+def missing_ranges(open_time, start, end, step):
+    """
+    Return the [lo, hi] time ranges (epoch ms) within [start, end] that the candles opened at
+    `open_time` (sorted) leave uncovered, candles being `step` ms long.
+    """
+    open_time = np.asarray(open_time, dtype=np.int64)
+    if len(open_time) == 0:
+        return [(start, end)] if start <= end else []
+    ranges = []
+    if open_time[0] > start + step - 1:
+        ranges.append((start, int(open_time[0]) - 1))
+    for gap in np.flatnonzero(np.diff(open_time) > step):
+        ranges.append((int(open_time[gap]) + step, int(open_time[gap + 1]) - 1))
+    if open_time[-1] + step <= end:
+        ranges.append((int(open_time[-1]) + step, end))
+    return ranges
+
+
+class CandleStore:
+    """
+    Columnar candle store, partitioned by symbol, interval and month.
+
+    Layout: {root}/{symbol}/{interval}/{YYYY-MM}/{column}.bin, one raw little-endian array per
+    column (see KLINE_SCHEMA). Reads memory-map only the partitions overlapping the requested
+    range and only the requested columns. Appends add bytes to the end of the newest partition
+    files; the newest row is rewritten in place when a still-forming candle is stored again with
+    its final values. Rows older than the newest one (a backfill) are merged into their month
+    partitions, which are then rewritten whole.
+    """
+    def __init__(self, root: str="downloaded_data"):
+        self.root = root
+
+    def _interval_path(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def _column_path(self, symbol, interval, month, column):
+        return os.path.join(self._interval_path(symbol, interval), month, f"{column}.bin")
+
+    def partitions(self, symbol, interval):
+        """
+        List the month partitions stored for a symbol and interval, oldest first.
+        """
+        path = self._interval_path(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+    def _partition_length(self, symbol, interval, month):
+        # A partially written append leaves columns of different lengths, only complete rows count
+        lengths = []
+        for column, dtype in KLINE_SCHEMA.items():
+            path = self._column_path(symbol, interval, month, column)
+            lengths.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(lengths)
+
+    def _load_column(self, symbol, interval, month, column, length):
+        if length == 0:
+            return np.empty(0, dtype=KLINE_SCHEMA[column])
+        path = self._column_path(symbol, interval, month, column)
+        return np.memmap(path, dtype=KLINE_SCHEMA[column], mode="r", shape=(length,))
+
+    def last_open_time(self, symbol, interval):
+        """
+        Return the OpenTime (epoch ms) of the newest stored candle, or None if nothing is stored.
+        """
+        for month in reversed(self.partitions(symbol, interval)):
+            length = self._partition_length(symbol, interval, month)
+            if length:
+                return int(self._load_column(symbol, interval, month, "OpenTime", length)[-1])
+        return None
+
+    def append(self, symbol, interval, data):
+        """
+        Append klines to the store.
+
+        Parameters:
+        symbol (str): Trading pair (e.g., "SOLUSDT").
+        interval (str): Timeframe (e.g., "15m").
+        data (pd.DataFrame | dict): Kline columns. Times may be epoch ms, datetimes or
+            '%d %b %Y %H:%M:%S' strings. A row with the newest candle's OpenTime replaces it
+            (a live fetch ends with a forming candle), rows before it are merged into their
+            month partitions, replacing stored rows with the same OpenTime.
+
+        Returns:
+        int: The number of rows appended, merged or replaced.
+        """
+        if isinstance(data, pd.DataFrame):
+            data = {column: data[column].to_numpy() for column in data.columns}
+        if len(data.get("OpenTime", ())) == 0:
+            return 0
+        columns = {}
+        for column, dtype in KLINE_SCHEMA.items():
+            values = data[column]
+            if column in TIME_COLUMNS:
+                values = times_to_epoch_ms(values)
+            columns[column] = np.asarray(values).astype(dtype, copy=False)
+
+        order = np.argsort(columns["OpenTime"], kind="stable")
+        open_time = columns["OpenTime"][order]
+        # Of duplicated OpenTimes the last one given is the most recent snapshot of the candle
+        keep = np.r_[open_time[1:] != open_time[:-1], True]
+        last = self.last_open_time(symbol, interval)
+        replaced = 0
+        if last is not None:
+            same = np.flatnonzero(keep & (open_time == last))
+            if len(same):
+                self._replace_last(symbol, interval, last, {column: values[order[same[0]]] for column, values in columns.items()})
+                replaced = 1
+            older = order[keep & (open_time < last)]
+            if len(older):
+                self._merge(symbol, interval, {column: values[older] for column, values in columns.items()})
+                replaced += len(older)
+            keep &= open_time > last
+        rows = order[keep]
+        if len(rows) == 0:
+            return replaced
+
+        months = month_of(columns["OpenTime"][rows])
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for chunk in np.split(np.arange(len(rows)), boundaries):
+            month = months[chunk[0]]
+            partition = os.path.join(self._interval_path(symbol, interval), month)
+            os.makedirs(partition, exist_ok=True)
+            length = self._partition_length(symbol, interval, month)
+            for column in KLINE_SCHEMA:
+                path = self._column_path(symbol, interval, month, column)
+                with open(path, "ab") as f:
+                    # Drop the tail of an interrupted append before adding new rows
+                    f.truncate(length * KLINE_SCHEMA[column].itemsize)
+                    f.write(np.ascontiguousarray(columns[column][rows[chunk]]).tobytes())
+        self._write_schema(symbol, interval)
+        return len(rows) + replaced
+
+    def _merge(self, symbol, interval, columns):
+        # Merge rows (sorted, unique OpenTimes) into their month partitions and rewrite those
+        months = month_of(columns["OpenTime"])
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for chunk in np.split(np.arange(len(months)), boundaries):
+            month = months[chunk[0]]
+            partition = os.path.join(self._interval_path(symbol, interval), month)
+            os.makedirs(partition, exist_ok=True)
+            length = self._partition_length(symbol, interval, month)
+            stored = {column: np.array(self._load_column(symbol, interval, month, column, length)) for column in KLINE_SCHEMA}
+            # New rows win over stored rows with the same OpenTime
+            kept = ~np.isin(stored["OpenTime"], columns["OpenTime"][chunk])
+            merged = {column: np.concatenate([stored[column][kept], columns[column][chunk]]) for column in KLINE_SCHEMA}
+            order = np.argsort(merged["OpenTime"], kind="stable")
+            # Write every column aside first, then swap them in
+            for column in KLINE_SCHEMA:
+                with open(self._column_path(symbol, interval, month, column) + ".tmp", "wb") as f:
+                    f.write(np.ascontiguousarray(merged[column][order]).tobytes())
+            for column in KLINE_SCHEMA:
+                path = self._column_path(symbol, interval, month, column)
+                os.replace(path + ".tmp", path)
+
+    def _replace_last(self, symbol, interval, last, row):
+        # Overwrite the newest stored row in place, e.g. a candle stored while it was still forming
+        month = month_of([last])[0]
+        index = self._partition_length(symbol, interval, month) - 1
+        for column, dtype in KLINE_SCHEMA.items():
+            with open(self._column_path(symbol, interval, month, column), "r+b") as f:
+                f.seek(index * dtype.itemsize)
+                f.write(np.asarray(row[column], dtype=dtype).tobytes())
+
+    def _write_schema(self, symbol, interval):
+        path = os.path.join(self._interval_path(symbol, interval), "_schema.json")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                json.dump({column: dtype.str for column, dtype in KLINE_SCHEMA.items()}, f, indent=2)
+
+    def read(self, symbol, interval, start=None, end=None, columns=None):
+        """
+        Read candles whose OpenTime lies in [start, end].
+
+        Parameters:
+        symbol (str): Trading pair.
+        interval (str): Timeframe.
+        start (int | str | datetime.datetime): Inclusive lower bound, None for the first stored candle.
+        end (int | str | datetime.datetime): Inclusive upper bound, None for the last stored candle.
+        columns (list): Columns to return (default: all of KLINE_SCHEMA).
+
+        Returns:
+        dict: Column name -> numpy array, times as int64 epoch milliseconds.
+        """
+        columns = list(KLINE_SCHEMA) if columns is None else list(columns)
+        start = None if start is None else to_epoch_ms(start)
+        end = None if end is None else to_epoch_ms(end)
+        first_month = None if start is None else month_of([start])[0]
+        last_month = None if end is None else month_of([end])[0]
+
+        parts = {column: [] for column in columns}
+        for month in self.partitions(symbol, interval):
+            if (first_month is not None and month < first_month) or (last_month is not None and month > last_month):
+                continue
+            length = self._partition_length(symbol, interval, month)
+            open_time = self._load_column(symbol, interval, month, "OpenTime", length)
+            lo = 0 if start is None else np.searchsorted(open_time, start, side="left")
+            hi = length if end is None else np.searchsorted(open_time, end, side="right")
+            if hi <= lo:
+                continue
+            for column in columns:
+                parts[column].append(np.array(self._load_column(symbol, interval, month, column, length)[lo:hi]))
+        return {
+            column: np.concatenate(chunks) if chunks else np.empty(0, dtype=KLINE_SCHEMA[column])
+            for column, chunks in parts.items()
+        }
+
+    def read_frame(self, symbol, interval, start=None, end=None, columns=None, time_format=TIME_FORMAT):
+        """
+        Read candles as a DataFrame, formatting OpenTime/CloseTime with `time_format`.
+
+        Pass time_format=None to keep the times as int64 epoch milliseconds.
+        """
+        return columns_to_frame(self.read(symbol, interval, start, end, columns), time_format)
+
+
+if __name__ == "__main__":
+    # Import legacy CSV exports: python -m market_data.candle_store <root> <symbol> <interval> <csv>
+    root, symbol, interval, csv_path = sys.argv[1:5]
+    appended = CandleStore(root).append(symbol, interval, pd.read_csv(csv_path))
+    print(f"Appended {appended} rows from {csv_path} to {root}/{symbol}/{interval}")
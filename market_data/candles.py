@@ -0,0 +1,135 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from market_data.candle_store import KLINE_SCHEMA, TIME_COLUMNS, TIME_FORMAT, to_epoch_ms, times_to_epoch_ms, columns_to_frame
+
+# Float dtype of each precision mode; times always stay int64 epoch ms
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+class CandleSeries(Mapping):
+    """
+    Candles held as contiguous typed arrays, one per column.
+
+    Times are int64 epoch milliseconds, prices, volumes and indicator columns are float64,
+    or float32 with precision='float32' (half the memory, about 7 significant digits).
+    Slicing by row (`series[a:b]`) or by time (`between`, `until`) returns a series of views
+    over the same arrays, nothing is copied. It behaves as a read-only mapping of column name
+    to array, so code written for the column dicts of `KlineBuffer.view` accepts it as is.
+    DataFrames are only built at the edges, with `from_frame` and `to_frame`.
+    """
+    def __init__(self, columns, precision: str="float64"):
+        """
+        Parameters:
+        columns (dict): Column name -> array, sorted by OpenTime. Time columns may be epoch ms,
+            datetimes or '%d %b %Y %H:%M:%S' strings.
+        precision (str): 'float64' or 'float32' for the float columns.
+        """
+        self.precision = precision
+        dtype = PRECISIONS[precision]
+        self.columns = {}
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if name in TIME_COLUMNS:
+                values = times_to_epoch_ms(values)
+            elif values.dtype.kind == "f" and values.dtype != dtype:
+                values = values.astype(dtype)
+            elif values.dtype == object:
+                continue
+            self.columns[name] = values
+
+    @classmethod
+    def _wrap(cls, columns, precision):
+        # Builds a series over arrays that are already typed, without checking or casting them
+        series = cls.__new__(cls)
+        series.precision = precision
+        series.columns = columns
+        return series
+
+    @classmethod
+    def from_frame(cls, df, precision: str="float64"):
+        """
+        Build a series from a DataFrame of `get_historical_data` layout; 'Ignore' and text columns are dropped.
+        """
+        return cls({column: df[column].to_numpy() for column in df.columns if column != "Ignore"}, precision)
+
+    def to_frame(self, time_format=TIME_FORMAT, ignore: bool=True):
+        """
+        Build the DataFrame layout of `get_historical_data` (string times and an 'Ignore'
+        column after the kline columns). Pass time_format=None to keep epoch ms.
+        """
+        df = columns_to_frame(self.columns, time_format)
+        if ignore:
+            df.insert(min(len(KLINE_SCHEMA), len(df.columns)), "Ignore", 0)
+        return df
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, (int, np.integer)):
+            return {name: values[key].item() for name, values in self.columns.items()}
+        if isinstance(key, slice):
+            return self._wrap({name: values[key] for name, values in self.columns.items()}, self.precision)
+        raise TypeError(f"CandleSeries indices must be column names, integers or slices, not {type(key).__name__}")
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns["OpenTime"]) if "OpenTime" in self.columns else 0
+
+    def __repr__(self):
+        return f"CandleSeries({len(self)} candles, {len(self.columns)} columns, {self.precision})"
+
+    @property
+    def times(self):
+        return self.columns["OpenTime"]
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def index_of(self, time, side: str="right"):
+        """
+        Row index of epoch ms `time` in OpenTime, by binary search (see `np.searchsorted`).
+        """
+        return int(np.searchsorted(self.times, to_epoch_ms(time), side=side))
+
+    def between(self, start_time=None, end_time=None):
+        """
+        Candles opened in [start_time, end_time] (None for unbounded), as views.
+        """
+        lo = 0 if start_time is None else self.index_of(start_time, "left")
+        hi = len(self) if end_time is None else self.index_of(end_time, "right")
+        return self[lo:hi]
+
+    def until(self, time, count: int=None):
+        """
+        The last `count` candles (all if None) closed at or before `time`, as views (the same
+        rule as `FeatureTable.index_at`).
+        """
+        hi = int(np.searchsorted(self.columns["CloseTime"], to_epoch_ms(time), side="right"))
+        return self[max(hi - count, 0) if count is not None else 0:hi]
+
+    def tail(self, count):
+        return self[max(len(self) - count, 0):]
+
+    def with_columns(self, **columns):
+        """
+        Return a series sharing this one's arrays plus the given columns (e.g. indicator values).
+        """
+        series = CandleSeries(columns, self.precision)
+        return self._wrap({**self.columns, **series.columns}, self.precision)
+
+    def select(self, names):
+        """
+        Return a series with only the given columns.
+        """
+        return self._wrap({name: self.columns[name] for name in names}, self.precision)
+
+    def astype(self, precision):
+        """
+        Return a copy with the float columns in another precision.
+        """
+        return CandleSeries(self.columns, precision)
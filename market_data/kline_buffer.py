@@ -0,0 +1,108 @@
+import numpy as np
+
+from market_data.candle_store import KLINE_SCHEMA
+
+# Position of each stored column in a raw Binance kline list
+KLINE_FIELDS = {
+    "OpenTime": 0,
+    "Open": 1,
+    "High": 2,
+    "Low": 3,
+    "Close": 4,
+    "Volume": 5,
+    "CloseTime": 6,
+    "QuoteAssetVolume": 7,
+    "NumberOfTrades": 8,
+    "TakerBuyBaseAssetVolume": 9,
+    "TakerBuyQuoteAssetVolume": 10,
+}
+
+
+def parse_klines(klines):
+    """
+    Parse raw Binance klines (lists of numbers and numeric strings) straight into typed arrays.
+
+    Parameters:
+    klines (list): Raw klines as returned by `get_historical_klines`.
+
+    Returns:
+    dict: Column name -> numpy array with the dtype from KLINE_SCHEMA.
+    """
+    if len(klines) == 0:
+        return {column: np.empty(0, dtype=dtype) for column, dtype in KLINE_SCHEMA.items()}
+    raw = np.array([kline[:len(KLINE_FIELDS)] for kline in klines], dtype=object)
+    return {
+        column: raw[:, KLINE_FIELDS[column]].astype(dtype)
+        for column, dtype in KLINE_SCHEMA.items()
+    }
+
+
+class KlineBuffer:
+    """
+    Growable columnar buffer of candles.
+
+    Columns are preallocated numpy arrays that double in capacity when full, so appending
+    n rows costs O(n) amortised and reading returns views without copying the history.
+    """
+    def __init__(self, schema=KLINE_SCHEMA, capacity: int=1024):
+        self.schema = dict(schema)
+        self.columns = {column: np.empty(capacity, dtype=dtype) for column, dtype in self.schema.items()}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def capacity(self):
+        return len(next(iter(self.columns.values())))
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        capacity = max(size, 2 * self.capacity)
+        for column, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.length] = values[:self.length]
+            self.columns[column] = grown
+
+    def append(self, columns):
+        """
+        Append rows given as a dict of equally long arrays.
+
+        Returns:
+        tuple: The (start, end) row range occupied by the new rows.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        start, end = self.length, self.length + size
+        self._reserve(end)
+        for column in self.schema:
+            self.columns[column][start:end] = columns[column]
+        self.length = end
+        return start, end
+
+    def replace_last(self, row):
+        """
+        Overwrite the last row with a dict of scalar column values.
+        """
+        for column in self.schema:
+            self.columns[column][self.length - 1] = row[column]
+
+    def truncate(self, length: int):
+        """
+        Drop the rows from `length` on, keeping the capacity.
+        """
+        self.length = min(self.length, length)
+
+    def view(self, start: int=0, end: int=None, columns=None):
+        """
+        Return views over rows [start, end) of the requested columns (default: all).
+        """
+        end = self.length if end is None else min(end, self.length)
+        columns = self.schema if columns is None else columns
+        return {column: self.columns[column][start:end] for column in columns}
+
+    def last(self, column):
+        """
+        Return the last value of `column`, or None when the buffer is empty.
+        """
+        return self.columns[column][self.length - 1].item() if self.length else None
@@ -0,0 +1,93 @@
+import numpy as np
+
+from market_data.candle_store import CandleStore, KLINE_SCHEMA
+from market_data.kline_buffer import KlineBuffer
+
+
+class MinuteCache:
+    """
+    Append-only cache of 1 minute candles for a replay.
+
+    Rows live in a growable columnar buffer in memory and are persisted to a CandleStore,
+    whose column files are only ever appended to. Writes are batched: nothing touches the
+    disk until `flush_every` new rows are pending (or `flush` is called), so the per-step
+    cost no longer grows with the length of the session.
+    """
+    def __init__(self, store: CandleStore, symbol: str, interval: str="1m", flush_every: int=1000):
+        self.store = store
+        self.symbol = symbol
+        self.interval = interval
+        self.flush_every = flush_every
+        self.buffer = KlineBuffer()
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def times(self):
+        """
+        OpenTime (epoch ms) of the cached rows, a view over the buffer.
+        """
+        return self.buffer.columns["OpenTime"][:len(self.buffer)]
+
+    def last_open_time(self):
+        return self.buffer.last("OpenTime")
+
+    def append(self, columns, persisted: bool=False):
+        """
+        Append kline columns (epoch ms times), skipping rows before the newest cached row.
+        A row with the newest cached OpenTime replaces it, since a minute cached at the live
+        edge may still have been forming; the replaced row is written to the store again.
+
+        Parameters:
+        columns (dict): Kline columns as returned by `parse_klines` or `frame_to_columns`.
+        persisted (bool): The rows already exist in the store (e.g. they were just loaded
+            from it), so they do not need to be written again.
+
+        Returns:
+        tuple: The (start, end) row range that was added or replaced.
+        """
+        open_time = np.asarray(columns["OpenTime"], dtype=np.int64)
+        last = self.last_open_time()
+        start = len(self.buffer)
+        keep = slice(None)
+        if last is not None:
+            same = np.flatnonzero(open_time == last)
+            if len(same):
+                self.buffer.replace_last({column: np.asarray(columns[column])[same[-1]] for column in KLINE_SCHEMA})
+                start -= 1
+                if not persisted:
+                    self.flushed = min(self.flushed, start)
+            keep = slice(int(np.searchsorted(open_time, last, side="right")), None)
+        _, end = self.buffer.append({column: np.asarray(columns[column])[keep] for column in KLINE_SCHEMA})
+        if persisted and self.flushed >= start:
+            self.flushed = end
+        if len(self.buffer) - self.flushed >= self.flush_every:
+            self.flush()
+        return start, end
+
+    def flush(self):
+        """
+        Persist the rows added since the last flush.
+        """
+        if self.flushed < len(self.buffer):
+            self.store.append(self.symbol, self.interval, self.buffer.view(self.flushed))
+            self.flushed = len(self.buffer)
+
+    def window(self, start_time, end_time):
+        """
+        Return the (lo, hi) row range of candles opened in [start_time, end_time], by binary search.
+        """
+        times = self.times
+        return (
+            int(np.searchsorted(times, start_time, side="left")),
+            int(np.searchsorted(times, end_time, side="right")),
+        )
+
+    def view(self, start_time, end_time, columns=None):
+        """
+        Return views over the candles opened in [start_time, end_time].
+        """
+        lo, hi = self.window(start_time, end_time)
+        return self.buffer.view(lo, hi, columns)
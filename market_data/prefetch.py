@@ -0,0 +1,94 @@
+import queue
+import threading
+
+MINUTE_MS = 60 * 1000
+
+
+class MinutePrefetcher:
+    """
+    Read-ahead loader of 1 minute candles for historical replays.
+
+    A background thread walks [start_time, end_time] in chunks of `chunk_minutes` and hands
+    each fetched chunk over through a bounded queue, so at most `lookahead` chunks are held
+    ahead of the consumer. The consumer asks for everything up to the simulation clock with
+    `take_until`, which only blocks when the replay has caught up with the download.
+    """
+    def __init__(self, fetch, start_time: int, end_time: int, chunk_minutes: int=7 * 24 * 60, lookahead: int=4):
+        """
+        Parameters:
+        fetch (callable): fetch(start_ms, end_ms) -> kline columns (epoch ms times) opened in [start_ms, end_ms].
+        start_time (int): First minute to load, epoch ms.
+        end_time (int): Last minute to load, epoch ms. Later minutes are left to the caller (live edge).
+        chunk_minutes (int): Minutes per fetch.
+        lookahead (int): Maximum number of fetched chunks waiting to be consumed.
+        """
+        self.fetch = fetch
+        self.start_time = start_time
+        self.end_time = end_time
+        self.chunk_ms = chunk_minutes * MINUTE_MS
+        # Every minute up to `covered_until` (inclusive) has been handed to the consumer
+        self.covered_until = start_time - 1
+        self._chunks = queue.Queue(maxsize=lookahead)
+        # Error of the background thread, raised again by every later `take_until`
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="minute-prefetcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        """
+        Whether the whole [start_time, end_time] range has been consumed.
+        """
+        return self.covered_until >= self.end_time
+
+    def _put(self, item):
+        # Wait for room in the queue, giving up when the prefetcher is closed
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        cursor = self.start_time
+        try:
+            while cursor <= self.end_time and not self._stop.is_set():
+                chunk_end = min(cursor + self.chunk_ms - 1, self.end_time)
+                self._put((chunk_end, self.fetch(cursor, chunk_end)))
+                cursor = chunk_end + 1
+        except Exception as e:
+            # Re-raised in the consumer thread by `take_until`
+            self._put((None, e))
+
+    def take_until(self, time):
+        """
+        Yield the fetched chunks (kline columns) in order until every minute up to `time`
+        (epoch ms, capped at end_time) has been handed out.
+        """
+        time = min(time, self.end_time)
+        while self.covered_until < time:
+            if self._error is not None:
+                raise self._error
+            if self._stop.is_set():
+                raise RuntimeError("The minute prefetcher is closed")
+            try:
+                chunk_end, columns = self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                # Everything was handed out and the thread ended without an error: the range is exhausted
+                if not self._thread.is_alive() and self._chunks.empty():
+                    raise RuntimeError("The minute prefetcher stopped before reaching the requested time")
+                continue
+            if chunk_end is None:
+                self._error = columns
+                raise columns
+            self.covered_until = chunk_end
+            yield columns
+
+    def close(self):
+        """
+        Stop the background thread. Chunks not yet consumed are dropped.
+        """
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from market_data.candle_store import KLINE_SCHEMA
+from market_data.kline_buffer import KlineBuffer
+
+UNIT_MS = {"s": 1000, "m": 60 * 1000, "h": 60 * 60 * 1000, "d": 24 * 60 * 60 * 1000, "w": 7 * 24 * 60 * 60 * 1000}
+# Binance weekly candles open on Monday 00:00 UTC, the epoch was a Thursday
+WEEK_OFFSET_MS = 4 * UNIT_MS["d"]
+ADDITIVE_COLUMNS = ("Volume", "QuoteAssetVolume", "NumberOfTrades", "TakerBuyBaseAssetVolume", "TakerBuyQuoteAssetVolume")
+
+
+def interval_bounds(open_time, interval):
+    """
+    Map epoch millisecond timestamps to the candle of `interval` that contains them.
+
+    Buckets follow Binance alignment: fixed-length intervals ('3m', '2h', '12h', '3d', ...) are
+    aligned to the epoch in UTC, weeks start on Monday and months ('1M') on the calendar month.
+
+    Returns:
+    tuple: (bucket_start, bucket_end) arrays in epoch ms, bucket_end exclusive.
+    """
+    open_time = np.asarray(open_time, dtype=np.int64)
+    count, unit = int(interval[:-1]), interval[-1]
+    if unit == "M":
+        months = open_time.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+        first = (months // count) * count
+        to_ms = lambda m: m.astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64)
+        return to_ms(first), to_ms(first + count)
+    if unit not in UNIT_MS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    width = count * UNIT_MS[unit]
+    offset = WEEK_OFFSET_MS if unit == "w" else 0
+    start = (open_time - offset) // width * width + offset
+    return start, start + width
+
+
+def resample(base, interval):
+    """
+    Aggregate a base candle series (e.g. 1m) into `interval` candles in one vectorised pass.
+
+    Parameters:
+    base (dict | pd.DataFrame): Kline columns sorted by OpenTime, times in epoch ms.
+    interval (str): Target timeframe (e.g., '3m', '2h', '12h', '1d').
+
+    Returns:
+    dict: Kline columns of the resampled series. The last candle may be partial.
+    """
+    open_time = np.asarray(base["OpenTime"], dtype=np.int64)
+    if len(open_time) == 0:
+        return {column: np.empty(0, dtype=dtype) for column, dtype in KLINE_SCHEMA.items()}
+    bucket_start, bucket_end = interval_bounds(open_time, interval)
+    starts = np.flatnonzero(np.r_[True, bucket_start[1:] != bucket_start[:-1]])
+    ends = np.r_[starts[1:], len(open_time)] - 1
+
+    out = {
+        "OpenTime": bucket_start[starts],
+        "Open": np.asarray(base["Open"], dtype=np.float64)[starts],
+        "High": np.maximum.reduceat(np.asarray(base["High"], dtype=np.float64), starts),
+        "Low": np.minimum.reduceat(np.asarray(base["Low"], dtype=np.float64), starts),
+        "Close": np.asarray(base["Close"], dtype=np.float64)[ends],
+        "CloseTime": bucket_end[starts] - 1,
+    }
+    for column in ADDITIVE_COLUMNS:
+        out[column] = np.add.reduceat(np.asarray(base[column], dtype=KLINE_SCHEMA[column]), starts)
+    return {column: out[column] for column in KLINE_SCHEMA}
+
+
+def resample_many(base, intervals):
+    """
+    Build several timeframes from the same base series.
+
+    Returns:
+    dict: interval -> kline columns (see `resample`).
+    """
+    return {interval: resample(base, interval) for interval in intervals}
+
+
+RUNNING_SCHEMA = {
+    "BucketStart": np.dtype("<i8"),
+    "SegmentStart": np.dtype("<i8"),
+    "High": np.dtype("<f8"),
+    "Low": np.dtype("<f8"),
+    **{column: KLINE_SCHEMA[column] for column in ADDITIVE_COLUMNS},
+}
+
+
+class FormingCandleIndex:
+    """
+    Answer "what does the still-forming candle of a timeframe look like at time t" in O(1).
+
+    For every base row and every timeframe it keeps the running high/low and running sums
+    since the start of that row's bucket, plus the row where the bucket started. Looking up
+    the forming candle is then one binary search for t and a handful of array reads,
+    independent of how many base candles the bucket spans. New base rows are indexed
+    incrementally with `extend`.
+    """
+    def __init__(self, intervals, base: KlineBuffer=None):
+        self.intervals = list(intervals)
+        # The base buffer may be shared with its owner (e.g. a MinuteCache), see `sync`
+        self.base = KlineBuffer() if base is None else base
+        self.running = {interval: KlineBuffer(RUNNING_SCHEMA) for interval in self.intervals}
+        self.indexed = 0
+
+    def __len__(self):
+        return self.indexed
+
+    def extend(self, columns):
+        """
+        Append and index new base rows (dict of kline columns, epoch ms times, OpenTime after the last indexed row).
+        """
+        self.base.append({column: columns[column] for column in KLINE_SCHEMA})
+        self.sync()
+
+    def sync(self, changed: int=None):
+        """
+        Index base rows appended to the (shared) base buffer since the last call.
+
+        Parameters:
+        changed (int): First base row that was rewritten in place (e.g. a forming minute that
+            received its final values); it and every row after it are indexed again.
+        """
+        if changed is not None and changed < self.indexed:
+            for running in self.running.values():
+                running.truncate(changed)
+            self.indexed = changed
+        start, end = self.indexed, len(self.base)
+        if end == start:
+            return
+        new = self.base.view(start, end)
+        for interval in self.intervals:
+            running = self.running[interval]
+            bucket_start, _ = interval_bounds(new["OpenTime"], interval)
+            is_first = np.r_[True, bucket_start[1:] != bucket_start[:-1]]
+            segments = np.cumsum(is_first)
+            rows = {
+                "BucketStart": bucket_start,
+                "SegmentStart": (start + np.flatnonzero(is_first))[segments - 1],
+            }
+            grouped = {
+                "High": pd.Series(new["High"]).groupby(segments).cummax().to_numpy(copy=True),
+                "Low": pd.Series(new["Low"]).groupby(segments).cummin().to_numpy(copy=True),
+            }
+            for column in ADDITIVE_COLUMNS:
+                grouped[column] = pd.Series(new[column]).groupby(segments).cumsum().to_numpy(copy=True)
+
+            # Carry the running values of a bucket that was already open before these rows
+            if start > 0 and running.columns["BucketStart"][start - 1] == bucket_start[0]:
+                carry = segments == 1
+                rows["SegmentStart"][carry] = running.columns["SegmentStart"][start - 1]
+                grouped["High"][carry] = np.maximum(grouped["High"][carry], running.columns["High"][start - 1])
+                grouped["Low"][carry] = np.minimum(grouped["Low"][carry], running.columns["Low"][start - 1])
+                for column in ADDITIVE_COLUMNS:
+                    grouped[column][carry] += running.columns[column][start - 1]
+            running.append({**rows, **grouped})
+        self.indexed = end
+
+    def forming(self, interval, time):
+        """
+        Return the partial candle of `interval` containing `time` (epoch ms), built from every
+        base row opened at or before `time`, or None if no base row of that bucket is indexed.
+        """
+        i = int(np.searchsorted(self.base.columns["OpenTime"][:self.indexed], time, side="right")) - 1
+        if i < 0:
+            return None
+        running = self.running[interval].columns
+        bucket_start, _ = interval_bounds(np.array([time]), interval)
+        if running["BucketStart"][i] != bucket_start[0]:
+            return None
+        base = self.base.columns
+        first = running["SegmentStart"][i]
+        candle = {
+            "OpenTime": int(running["BucketStart"][i]),
+            "Open": float(base["Open"][first]),
+            "High": float(running["High"][i]),
+            "Low": float(running["Low"][i]),
+            "Close": float(base["Close"][i]),
+            "CloseTime": int(base["CloseTime"][i]),
+        }
+        for column in ADDITIVE_COLUMNS:
+            candle[column] = running[column][i].item()
+        return {column: candle[column] for column in KLINE_SCHEMA}
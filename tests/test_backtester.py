@@ -0,0 +1,23 @@
+import numpy as np
+
+from trading_env.backtester import backtest, signals_to_decisions, CLOSED
+
+MINUTE = 60 * 1000
+
+
+def test_flat_signal_closes_the_position():
+    n = 100
+    open_time = MINUTE * np.arange(n, dtype=np.int64)
+    price = 100.0 + np.arange(n, dtype=np.float64)
+    base = {"OpenTime": open_time, "Open": price, "High": price + 0.5, "Low": price - 0.5, "Close": price}
+    signal = np.array([1] * 10 + [0] * 90)
+
+    decisions = signals_to_decisions(open_time + MINUTE - 1, signal, price)
+    trades = backtest(base, decisions, fee=0.0)["trades"]
+
+    assert len(trades) == 1
+    trade = trades.iloc[0]
+    # Long from the open of bar 1 until the flat signal of bar 10 is acted on at the open of bar 11
+    assert trade["reason"] == CLOSED
+    assert trade["entry_time"] == MINUTE and trade["exit_time"] == 11 * MINUTE
+    assert np.isclose(trade["return"], price[11] / price[1] - 1)
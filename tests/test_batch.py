@@ -0,0 +1,54 @@
+from PIL import Image
+
+from agents.batch import BatchRun, LocalBatchBackend
+from agents.market_analysis_agent import MarketAnalysisAgent
+from agents.stub_client import StubClient
+from agents.trend_analysis_agent import TrendAnalysisAgent
+
+STEPS = [1_700_000_000_000 + 15 * 60 * 1000 * i for i in range(5)]
+
+
+def echo_step(request):
+    # The last content block is the step marker added by the test agents
+    return request["messages"][0]["content"][-1]["text"]
+
+
+class MarkedTrendAgent(TrendAnalysisAgent):
+    def request(self, images):
+        request = super().request(images)
+        request["messages"][0]["content"].append({"type": "text", "text": f"trend {images[0].info['step']}"})
+        return request
+
+
+class MarkedMarketAgent(MarketAnalysisAgent):
+    def request(self, images):
+        request = super().request(images)
+        request["messages"][0]["content"].append({"type": "text", "text": f"market {images[0].info['step']}"})
+        return request
+
+
+def chart(step):
+    image = Image.new("RGB", (16, 16), "white")
+    image.info["step"] = step
+    return [image]
+
+
+def test_local_batch_results_map_back_to_custom_ids(tmp_path):
+    client = StubClient(latency=0, responder=echo_step)
+    agents = [MarkedTrendAgent("key", client=client), MarkedMarketAgent("key", client=client)]
+    run = BatchRun(str(tmp_path / "run"), LocalBatchBackend(str(tmp_path / "batches"), client), max_batch_requests=3)
+    for step in STEPS:
+        for agent in agents:
+            run.record(step, agent, chart(step))
+
+    assert len(run.submit()) == 4
+    assert run.poll() == 0
+
+    for step in STEPS:
+        for agent, name in zip(agents, ("trend", "market")):
+            assert run.results[run.custom_id(step, agent)]["text"] == f"{name} {step}"
+    assert run.joined() == {step: {"MarkedTrendAgent": f"trend {step}", "MarkedMarketAgent": f"market {step}"} for step in STEPS}
+
+    # A resumed run sees everything as already submitted and collected
+    resumed = BatchRun(str(tmp_path / "run"), run.backend)
+    assert resumed.submit() == [] and resumed.pending() == []
@@ -0,0 +1,27 @@
+import numpy as np
+
+from market_data.candle_store import CandleStore
+from market_data.kline_buffer import parse_klines
+
+MINUTE = 60 * 1000
+JANUARY = 1_704_067_200_000
+FEBRUARY = 1_706_745_600_000
+
+
+def raw_klines(start, n, close="1.5"):
+    return [[t, "1", "2", "0.5", close, "10", t + MINUTE - 1, "15", 3, "5", "7.5"] for t in range(start, start + n * MINUTE, MINUTE)]
+
+
+def test_append_backfills_older_months(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("SOLUSDT", "1m", parse_klines(raw_klines(FEBRUARY, 100)))
+
+    assert store.append("SOLUSDT", "1m", parse_klines(raw_klines(JANUARY, 100))) == 100
+    # Overlapping the January rows: the new values replace the stored ones
+    assert store.append("SOLUSDT", "1m", parse_klines(raw_klines(JANUARY + 50 * MINUTE, 100, close="3"))) == 100
+
+    stored = store.read("SOLUSDT", "1m")
+    assert len(stored["OpenTime"]) == 250
+    assert np.all(np.diff(stored["OpenTime"]) > 0)
+    assert stored["Close"][49] == 1.5 and stored["Close"][50] == 3.0
+    assert store.partitions("SOLUSDT", "1m") == ["2024-01", "2024-02"]
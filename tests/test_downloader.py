@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+import get_data
+from get_data import BinanceDataFetcher, RequestWeightBudget
+
+MINUTE = 60 * 1000
+START = 1_700_006_400_000
+
+
+class FakeClient:
+    """
+    Serves 1 minute klines for every minute, at most `limit` per call, like get_historical_klines.
+    """
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str, limit=1000):
+        with self.lock:
+            self.calls += 1
+        first = -(-start_str // MINUTE) * MINUTE
+        times = range(first, min(end_str + 1, first + limit * MINUTE), MINUTE)
+        return [[t, "1", "2", "0.5", "1.5", "10", t + MINUTE - 1, "15", 3, "5", "7.5"] for t in times]
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(get_data, "Client", FakeClient)
+
+
+def test_windowed_download_matches_sequential(fake_client):
+    end = START + 3500 * MINUTE
+    sequential = BinanceDataFetcher("key", "secret", workers=1).fetch_klines("SOLUSDT", "1m", START, end)
+    parallel_fetcher = BinanceDataFetcher("key", "secret", workers=4)
+    parallel = parallel_fetcher.fetch_klines("SOLUSDT", "1m", START, end)
+
+    assert len(sequential) == 3501
+    assert parallel == sequential
+    assert parallel_fetcher.client.calls == 4
+
+
+def test_budget_blocks_once_spent():
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    budget = RequestWeightBudget(max_weight=10, period=60.0, clock=lambda: now[0], sleep=sleep)
+    budget.acquire(4)
+    now[0] += 5.0
+    budget.acquire(4)
+    assert sleeps == []
+
+    # 8 of 10 used: the next 4 only fit once the first request has aged out of the window
+    budget.acquire(4)
+    assert sleeps == [55.0]
+    assert budget.used == 8
+
+    with pytest.raises(ValueError):
+        budget.acquire(11)
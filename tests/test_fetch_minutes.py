@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from market_data.candle_store import CandleStore
+from market_data.kline_buffer import parse_klines
+from trading_env.trading_environment import TradingEnvironment
+
+MINUTE = 60 * 1000
+START = 1_700_006_400_000
+
+
+def raw_klines(lo, hi):
+    """
+    Raw exchange klines for every minute opened in [lo, hi].
+    """
+    first = -(-lo // MINUTE) * MINUTE
+    return [
+        [t, "1", "2", "0.5", "1.5", "10", t + MINUTE - 1, "15", 3, "5", "7.5"]
+        for t in range(first, hi + 1, MINUTE)
+    ]
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.calls = []
+
+    def fetch_klines(self, symbol, interval, start, end):
+        self.calls.append((start, end))
+        return raw_klines(start, end)
+
+
+def test_fetch_minutes_fills_holes_in_the_store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("SOLUSDT", "1m", parse_klines(raw_klines(START, START + 60 * MINUTE)))
+    store.append("SOLUSDT", "1m", parse_klines(raw_klines(START + 120 * MINUTE, START + 180 * MINUTE)))
+    env = SimpleNamespace(save_store=store, symbol="SOLUSDT", fetcher=FakeFetcher())
+
+    minutes = TradingEnvironment.fetch_minutes(env, START, START + 240 * MINUTE)
+
+    assert len(minutes["OpenTime"]) == 241
+    assert np.all(np.diff(minutes["OpenTime"]) == MINUTE)
+    assert env.fetcher.calls == [
+        (START + 61 * MINUTE, START + 120 * MINUTE - 1),
+        (START + 181 * MINUTE, START + 240 * MINUTE),
+    ]
@@ -0,0 +1,43 @@
+import numpy as np
+
+from market_data.candle_store import CandleStore, KLINE_SCHEMA
+from market_data.minute_cache import MinuteCache
+from market_data.resample import FormingCandleIndex
+
+MINUTE = 60 * 1000
+
+
+def minutes(start, closes):
+    """
+    Kline columns for consecutive 1 minute candles closing at `closes`.
+    """
+    n = len(closes)
+    open_time = start + MINUTE * np.arange(n, dtype=np.int64)
+    closes = np.asarray(closes, dtype=np.float64)
+    columns = {column: np.ones(n, dtype=dtype) for column, dtype in KLINE_SCHEMA.items()}
+    columns.update(
+        OpenTime=open_time, CloseTime=open_time + MINUTE - 1,
+        Open=closes, High=closes, Low=closes, Close=closes,
+    )
+    return columns
+
+
+def test_append_replaces_revised_last_minute(tmp_path):
+    store = CandleStore(str(tmp_path))
+    cache = MinuteCache(store, "SOLUSDT", flush_every=1)
+    index = FormingCandleIndex(["5m"], base=cache.buffer)
+
+    start = 1_700_000_100_000 - 1_700_000_100_000 % (5 * MINUTE)
+    cache.append(minutes(start, [10.0, 11.0]))
+    index.sync()
+    assert store.read("SOLUSDT", "1m")["Close"].tolist() == [10.0, 11.0]
+
+    # The second minute was still forming, it comes back with its final values plus a new minute
+    changed, end = cache.append(minutes(start + MINUTE, [15.0, 12.0]))
+    index.sync(changed=changed)
+
+    assert (changed, end) == (1, 3)
+    assert cache.buffer.view()["Close"].tolist() == [10.0, 15.0, 12.0]
+    assert store.read("SOLUSDT", "1m")["Close"].tolist() == [10.0, 15.0, 12.0]
+    forming = index.forming("5m", start + 2 * MINUTE)
+    assert forming["High"] == 15.0
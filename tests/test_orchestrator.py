@@ -0,0 +1,52 @@
+import asyncio
+
+from PIL import Image
+
+from agents.orchestrator import AgentOrchestrator
+from agents.stub_client import AsyncStubClient, StubClient
+from agents.trend_analysis_agent import TrendAnalysisAgent
+
+
+def make_agent(latency, responder=None):
+    return TrendAnalysisAgent("key", client=StubClient(latency=0), async_client=AsyncStubClient(latency=latency, responder=responder))
+
+
+def image_data(request):
+    return request["messages"][0]["content"][1]["source"]["data"]
+
+
+def chart(shade):
+    return [Image.new("RGB", (32, 32), (shade, shade, shade))]
+
+
+def test_concurrency_limit_and_result_order():
+    # The response names the chart it was given, so results can be matched to their pipelines
+    agent = make_agent(0.05, responder=image_data)
+    orchestrator = AgentOrchestrator(max_in_flight=3, timeout=5.0)
+    images = [chart(shade) for shade in range(0, 250, 25)]
+    assert len({image_data(agent.request(charts)) for charts in images}) == len(images)
+
+    async def pipeline(charts):
+        return await orchestrator.call(agent, charts)
+
+    results = orchestrator.run([pipeline(charts) for charts in images])
+
+    expected = [image_data(agent.request(charts)) for charts in images]
+    assert results == expected
+    assert agent.async_anthropic.peak_in_flight == 3
+    assert orchestrator.calls == 10
+
+
+def test_timeout_is_returned_in_place():
+    fast, slow = make_agent(0.01), make_agent(1.0)
+    orchestrator = AgentOrchestrator(max_in_flight=4, timeout=0.2)
+
+    async def pipeline(agent):
+        return await orchestrator.call(agent, chart(0))
+
+    results = orchestrator.run([pipeline(fast), pipeline(slow), pipeline(fast)])
+
+    assert isinstance(results[1], asyncio.TimeoutError)
+    assert isinstance(results[0], str) and isinstance(results[2], str)
+    assert orchestrator.timeouts == 1
+    assert slow.async_anthropic.in_flight == 0
@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+
+from indicators.sweep import sweep, param_grid, ranked_path
+
+MINUTE = 60 * 1000
+
+
+def candles(n=500):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    open_time = 1_700_000_000_000 + MINUTE * np.arange(n, dtype=np.int64)
+    return {"OpenTime": open_time, "CloseTime": open_time + MINUTE - 1, "Open": close,
+            "High": close + 1, "Low": close - 1, "Close": close, "Volume": np.ones(n)}
+
+
+def test_sweep_numpy_grid_and_torn_resume(tmp_path):
+    out_path = str(tmp_path / "results.jsonl")
+    columns = candles()
+    sweep(columns, "ema", param_grid(length=np.arange(5, 8)), signal="close_above", workers=1, out_path=out_path)
+
+    # Simulate a run killed halfway through writing a line
+    with open(out_path, "a") as f:
+        f.write('{"indicator": "ema", "params": {"len')
+    ranked = sweep(columns, "ema", param_grid(length=np.arange(5, 10)), signal="close_above", workers=1, out_path=out_path)
+
+    with open(out_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["params"]["length"] for line in lines[1:]] == [5, 6, 7, 8, 9]
+    assert len(ranked) == 5
+    with open(ranked_path(out_path)) as f:
+        assert len(f.readlines()) == 5
@@ -1,15 +1,21 @@
 import os
-import io
 from PIL import Image
 from dotenv import load_dotenv
-import pandas as pd
-import matplotlib.pyplot as plt
-import re
+import json
+import time
+import queue
+import threading
 import yaml
-from get_data import BinanceDataFetcher
 from agents.trend_analysis_agent import TrendAnalysisAgent
 from agents.market_analysis_agent import MarketAnalysisAgent
 from trading_env.trading_environment import TradingEnvironment
+from analyze_trend import TrendAnalyzer
+from charts.renderer import ChartRenderer
+from market_data.candle_store import format_time
+
+# Marks the end of the stream in the stage queues
+_DONE = object()
+
 
 class Trader:
     def __init__(
@@ -22,6 +28,13 @@ class Trader:
         indicators: list,
         load_local: bool,
         save_path: str,
+        time_increment: int=5,
+        min_candles: int=100,
+        prefetch: str='background',
+        queue_size: int=2,
+        max_steps: int=None,
+        decisions_path: str=None,
+        verbose: bool=False,
         **kwargs
     ):
         self.symbol = symbol
@@ -32,6 +45,11 @@ class Trader:
         self.indicators = indicators
         self.load_local = load_local
         self.save_path = save_path
+        self.time_increment = time_increment
+        self.queue_size = queue_size
+        self.max_steps = max_steps
+        self.decisions_path = decisions_path
+        self.verbose = verbose
         self.env = TradingEnvironment(
 			api_key=os.getenv("API_KEY"),
 			api_secret=os.getenv("API_SECRET"), 
@@ -42,11 +60,145 @@ class Trader:
 			end_date=self.end_date,
 			indicators=self.indicators,
 			load_local=self.load_local,
-			save_path=self.save_path
+			save_path=self.save_path,
+			time_increment=self.time_increment,
+			min_candles=min_candles,
+			prefetch=prefetch,
+			headless=True
 		)
         self.trend_analysis_agent = TrendAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"))
         self.market_analysis_agent = MarketAnalysisAgent(os.getenv("ANTHROPIC_API_KEY"))
-        
+        # Stage two charts are drawn by the agent stage, on figures of its own. Draws from both
+        # stages are serialised by `charts.renderer.DRAW_LOCK`, matplotlib is not thread-safe.
+        self.level_renderer = ChartRenderer()
+        self.decisions = []
+        self.stats = {}
+        self._stop = threading.Event()
+
+    def _put(self, q, item):
+        # Blocks while the next stage is behind (backpressure), gives up on shutdown
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, name, source, sink, work):
+        """
+        Run one pipeline stage: take items from `source` (None for the first stage, which
+        iterates `work()` instead), process them and pass the results to `sink`.
+        """
+        stats = self.stats[name] = {'items': 0, 'busy_seconds': 0.0, 'wait_seconds': 0.0}
+        try:
+            items = work() if source is None else None
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(items, _DONE) if items is not None else self._get(source)
+                if item is _DONE:
+                    break
+                if items is None:
+                    stats['wait_seconds'] += time.perf_counter() - start
+                    start = time.perf_counter()
+                    item = work(item)
+                stats['busy_seconds'] += time.perf_counter() - start
+                stats['items'] += 1
+                if sink is not None:
+                    wait = time.perf_counter()
+                    if not self._put(sink, item):
+                        break
+                    stats['wait_seconds'] += time.perf_counter() - wait
+        except BaseException as e:
+            stats['error'] = e
+            self._stop.set()
+        finally:
+            if sink is not None:
+                self._put(sink, _DONE)
+
+    def _states(self):
+        for n, (step_time, state) in enumerate(self.env.steps()):
+            if self.max_steps is not None and n >= self.max_steps:
+                return
+            yield step_time, state
+
+    def _render(self, item):
+        step_time, state = item
+        imgs, _ = self.env.render(state)
+        return step_time, state, imgs
+
+    def _analyze(self, item):
+        step_time, state, imgs = item
+        trend = self.trend_analysis_agent.analyze(imgs)
+        levels = TrendAnalyzer.parse_levels(trend)
+        stage2_charts = [
+            Image.fromarray(self.level_renderer.render(self.env.state_columns(state[timeframe]), timeframe, self.indicators, levels=levels))
+            for timeframe in self.timeframes
+        ]
+        decision = {
+            'time': step_time,
+            'levels': levels,
+            'decision': self.market_analysis_agent.analyze(stage2_charts),
+        }
+        self.decisions.append(decision)
+        if self.decisions_path is not None:
+            with open(self.decisions_path, 'a') as f:
+                f.write(json.dumps(decision) + '\n')
+        if self.verbose:
+            print(format_time(step_time), decision['decision'])
+        return decision
+
+    def run(self):
+        """
+        Step through the replay as a pipeline: data (clock, 1m data, forming candles) -> render -> agents.
+
+        The stages run in their own threads, connected by queues of `queue_size` steps, so the
+        next steps are fetched and rendered while the agents wait on the model, and a slow
+        stage holds the earlier ones back instead of letting work pile up. Stops at the end of
+        the replay, after `max_steps`, on Ctrl-C or when a stage fails (the error is re-raised).
+        Per-stage throughput is kept in `stats` and printed only when `verbose`.
+
+        Returns:
+        list: The decisions, one dict (time, levels, decision) per step.
+        """
+        self._stop.clear()
+        states, images = queue.Queue(self.queue_size), queue.Queue(self.queue_size)
+        stages = [
+            threading.Thread(target=self._stage, args=('data', None, states, self._states), name='data', daemon=True),
+            threading.Thread(target=self._stage, args=('render', states, images, self._render), name='render', daemon=True),
+            threading.Thread(target=self._stage, args=('agents', images, None, self._analyze), name='agents', daemon=True),
+        ]
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        try:
+            while any(stage.is_alive() for stage in stages):
+                for stage in stages:
+                    stage.join(timeout=0.2)
+        except KeyboardInterrupt:
+            self._stop.set()
+            for stage in stages:
+                stage.join()
+        finally:
+            self.env.close()
+        elapsed = time.perf_counter() - start
+        for name, stats in self.stats.items():
+            stats['per_second'] = stats['items'] / elapsed if elapsed else 0.0
+            if self.verbose:
+                print(name, {key: value for key, value in stats.items() if key != 'error'})
+        for stats in self.stats.values():
+            if 'error' in stats:
+                raise stats['error']
+        return self.decisions
+
 if __name__ == "__main__":
     load_dotenv('envs/.env')
 
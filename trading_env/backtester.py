@@ -0,0 +1,302 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+ACTIONS = {"BUY": 1, "SELL": -1, "NO_TRADE": 0}
+# Exit reasons in the trade table
+STOP, TAKE_PROFIT, CLOSED, UNFILLED = "stop_loss", "take_profit", "closed", "unfilled"
+# Field labels of the MarketAnalysisAgent levels, in their positional order
+LABELS = {"entry": "Entry(?: Price)?", "exit": "Exit(?: Price)?", "stop_loss": "Stop(?: Loss)?", "take_profit": "Take Profit"}
+
+
+def parse_decision(text, horizon="Short Term"):
+    """
+    Parse an agent response into a decision.
+
+    Understands the MarketAnalysisAgent format
+    '< Short Term: BUY: <Entry Price: Exit Price: Stop Loss: Take Profit><Reasoning> >' (the
+    `horizon` section is used, entry prices that say "current" are filled at market, a
+    response without that section is no trade) and the TradingAgent format '<BUY: <Exit Price>: <Reasoning> >', which is a market order with a take profit.
+
+    Returns:
+    dict: side (1 buy, -1 sell, 0 no trade), entry, stop_loss, take_profit (NaN when not given).
+    """
+    decision = {"side": 0, "entry": np.nan, "stop_loss": np.nan, "take_profit": np.nan}
+    section = re.search(rf"{horizon}\s*:\s*<?\s*(BUY|SELL|NO_TRADE)\s*>?\s*:?(.*?)(?:Long Term|Short Term|$)", text, re.S)
+    number = r"(\d+(?:\.\d+)?)"
+    if section is not None:
+        decision["side"] = ACTIONS[section.group(1)]
+        fields = re.search(r"<([^<>]*)>", section.group(2))
+        if fields is not None:
+            fields = fields.group(1).replace(",", "")
+            labelled = {key: re.search(label + r"\s*:?\s*" + number, fields, re.I) for key, label in LABELS.items()}
+            if any(labelled.values()):
+                found = {key: float(match.group(1)) for key, match in labelled.items() if match}
+            else:
+                # Positional: entry, exit, stop loss, take profit; "current" entries fill at market
+                found = {}
+                for key, part in zip(LABELS, fields.split(":")):
+                    value = re.search(number, part)
+                    if value is not None and "current" not in part.lower():
+                        found[key] = float(value.group(1))
+            for key in ("entry", "stop_loss", "take_profit"):
+                decision[key] = found.get(key, np.nan)
+            # The exit price doubles as take profit when none is given
+            if np.isnan(decision["take_profit"]):
+                decision["take_profit"] = found.get("exit", np.nan)
+        return decision
+    if re.search(r"(?:Short|Long) Term\s*:", text):
+        # Horizon sections without the requested one: no decision for this horizon
+        return decision
+    simple = re.search(r"(BUY|SELL|NO_TRADE)\s*>?\s*:\s*<?\s*" + number, text.replace(",", ""))
+    if simple is not None:
+        decision["side"] = ACTIONS[simple.group(1)]
+        decision["take_profit"] = float(simple.group(2))
+        return decision
+    action = re.search(r"\b(BUY|SELL|NO_TRADE)\b", text)
+    if action is not None:
+        decision["side"] = ACTIONS[action.group(1)]
+    return decision
+
+
+def decisions_from_responses(responses, horizon="Short Term"):
+    """
+    Build a decision table from (time, agent response text) pairs, e.g. `Trader.decisions`
+    or `BatchRun.joined()` items.
+    """
+    rows = []
+    for time, text in responses:
+        rows.append({"time": int(time), **parse_decision(text, horizon)})
+    return pd.DataFrame(rows, columns=["time", "side", "entry", "stop_loss", "take_profit"])
+
+
+def signals_to_decisions(times, signal, close=None, stop_pct: float=None, take_pct: float=None):
+    """
+    Turn a rule-based signal series (1 long, -1 short, 0 flat, one value per candle) into
+    decisions, emitted only when the signal changes. A change to 0 is a flat decision, which
+    closes the open position.
+
+    Parameters:
+    times (array): Time each signal becomes known, epoch ms (e.g. the candles' CloseTime).
+    signal (array): Desired position per candle.
+    close (array): Close prices, needed for percentage stops and targets.
+    stop_pct (float): Stop loss distance as a fraction of the close (e.g. 0.02).
+    take_pct (float): Take profit distance as a fraction of the close.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    signal = np.nan_to_num(np.asarray(signal, dtype=np.float64)).astype(np.int8)
+    changes = np.flatnonzero(np.r_[signal[0] != 0, signal[1:] != signal[:-1]])
+    side = signal[changes]
+    decisions = {
+        "time": times[changes],
+        "side": side,
+        "entry": np.full(len(changes), np.nan),
+        "stop_loss": np.full(len(changes), np.nan),
+        "take_profit": np.full(len(changes), np.nan),
+        "flat": side == 0,
+    }
+    if close is not None:
+        price = np.asarray(close, dtype=np.float64)[changes]
+        if stop_pct is not None:
+            decisions["stop_loss"] = price * (1 - side * stop_pct)
+        if take_pct is not None:
+            decisions["take_profit"] = price * (1 + side * take_pct)
+    return pd.DataFrame(decisions)
+
+
+def _first_in_segments(mask, starts, lengths):
+    """
+    Offset of the first True of `mask` within each segment [start, start + length) of the
+    concatenated segments, or the segment length when there is none.
+    """
+    total = len(mask)
+    idx = np.where(mask, np.arange(total), total)
+    nonempty = lengths > 0
+    first = np.full(len(starts), total)
+    if total:
+        first[nonempty] = np.minimum.reduceat(idx, starts[nonempty])
+    return np.minimum(first - starts, lengths)
+
+
+def backtest(
+    base,
+    decisions,
+    fee: float=0.001,
+    slippage: float=0.0,
+    position_size: float=1.0,
+    risk_per_trade: float=None,
+    max_leverage: float=1.0,
+    max_hold_minutes: int=None,
+    initial_equity: float=10000.0,
+    same_bar: str="stop"
+):
+    """
+    Simulate decisions on 1 minute candles, vectorised over all trades.
+
+    A BUY/SELL decision at time T opens a position on the first candle opened after T: at
+    its open (market, entry NaN) or, for a limit entry, on the first candle whose range
+    touches the entry price before the next BUY/SELL decision replaces the order. The
+    position is closed at the stop loss or take profit, resolved from each candle's
+    high/low, or at the open of the candle where the next BUY/SELL decision is filled, or
+    `max_hold_minutes` after its own fill. A flat decision (side 0 with `flat` set, see
+    `signals_to_decisions`) closes the position at the open of the first candle after it.
+    Limit orders that never fill and NO_TRADE decisions leave an open position running. When one candle touches both levels,
+    `same_bar` decides which one counts ('stop' is the conservative choice).
+
+    Parameters:
+    base (dict | pd.DataFrame): 1 minute candles, OpenTime (epoch ms), Open, High, Low, Close.
+    decisions (pd.DataFrame | list): time (epoch ms), side (1/-1/0) or action ('BUY'...),
+        entry, stop_loss, take_profit (NaN for none) and optionally flat (bool).
+    fee (float): Fee rate per side, applied to entry and exit notional.
+    slippage (float): Adverse price slippage per fill, as a fraction.
+    position_size (float): Fraction of equity per trade (ignored with risk_per_trade).
+    risk_per_trade (float): Size each trade so that the stop loss loses this fraction of equity.
+    max_leverage (float): Cap of the position size as a multiple of equity.
+    max_hold_minutes (int): Close positions after this many minutes.
+    initial_equity (float): Starting equity.
+    same_bar (str): 'stop' or 'take_profit', the level assumed hit first.
+
+    Returns:
+    dict: 'trades' (pd.DataFrame), 'equity' (np.ndarray, per 1 minute candle, marked to the
+        close) and 'stats' (dict).
+    """
+    if same_bar not in ("stop", "take_profit"):
+        raise ValueError(f"Unknown same_bar: {same_bar}, expected 'stop' or 'take_profit'")
+    open_time = np.asarray(base["OpenTime"], dtype=np.int64)
+    o, h, l, c = (np.asarray(base[column], dtype=np.float64) for column in ("Open", "High", "Low", "Close"))
+    n = len(open_time)
+
+    decisions = pd.DataFrame(decisions)
+    if "side" not in decisions and "action" in decisions:
+        decisions["side"] = decisions["action"].map(ACTIONS)
+    for column in ("entry", "stop_loss", "take_profit"):
+        if column not in decisions:
+            decisions[column] = np.nan
+    if "flat" not in decisions:
+        decisions["flat"] = False
+    decisions = decisions.sort_values("time", kind="stable")
+    decisions = decisions[(decisions["side"] != 0) | decisions["flat"].astype(bool)]
+    side = decisions["side"].to_numpy(dtype=np.int8)
+    # A flat decision is a market order that opens nothing: it fills, and so ends the open position, at the next open
+    flat = side == 0
+    entry_limit = np.where(flat, np.nan, decisions["entry"].to_numpy(dtype=np.float64))
+    stop = decisions["stop_loss"].to_numpy(dtype=np.float64)
+    take = decisions["take_profit"].to_numpy(dtype=np.float64)
+
+    # An order is live from the first candle after its decision until the next decision replaces it
+    start = np.searchsorted(open_time, decisions["time"].to_numpy(dtype=np.int64), side="right")
+    order_lengths = np.maximum(np.r_[start[1:], n] - start, 0)
+    order_starts = np.cumsum(order_lengths) - order_lengths
+    order_bars = np.repeat(start - order_starts, order_lengths) + np.arange(order_lengths.sum())
+
+    # Entry: market at the first open, or the first candle touching the limit price
+    limit_r = np.repeat(entry_limit, order_lengths)
+    market = np.isnan(entry_limit)
+    touched = (l[order_bars] <= limit_r) & (limit_r <= h[order_bars])
+    fill_offset = np.where(market, 0, _first_in_segments(touched | np.repeat(market, order_lengths), order_starts, order_lengths))
+    filled = fill_offset < order_lengths
+    fill_bar = start + fill_offset
+    entry_price = np.where(market, o[np.minimum(fill_bar, n - 1)], entry_limit)
+    entry_price = entry_price * (1 + side * slippage)
+
+    # A position runs until the next decision that actually fills opens its own position
+    m = len(side)
+    next_filled = np.minimum.accumulate(np.r_[np.where(filled, np.arange(m), m), m][::-1])[::-1][1:]
+    end = np.full(m, n, dtype=np.int64)
+    end[next_filled < m] = fill_bar[next_filled[next_filled < m]]
+    if max_hold_minutes is not None:
+        end = np.minimum(end, fill_bar + max_hold_minutes)
+    end = np.where(filled & ~flat, end, fill_bar)
+
+    # Exit: first candle of the position whose high/low reaches the stop or the target. A market
+    # order fills at the open, so its fill candle's whole range counts; a limit fill is somewhere
+    # inside the candle, so its range is only checked from the next candle on.
+    lengths = np.maximum(end - fill_bar, 0)
+    seg_starts = np.cumsum(lengths) - lengths
+    bars = np.repeat(fill_bar - seg_starts, lengths) + np.arange(lengths.sum())
+    rep = lambda values: np.repeat(values, lengths)
+    side_r, stop_r, take_r = rep(side), rep(stop), rep(take)
+    high_r, low_r = h[bars], l[bars]
+    checked = np.arange(len(bars)) - rep(seg_starts) >= rep(np.where(market, 0, 1))
+    long_r = side_r > 0
+    stop_hit = checked & ~np.isnan(stop_r) & np.where(long_r, low_r <= stop_r, high_r >= stop_r)
+    take_hit = checked & ~np.isnan(take_r) & np.where(long_r, high_r >= take_r, low_r <= take_r)
+    stop_offset = _first_in_segments(stop_hit, seg_starts, lengths)
+    take_offset = _first_in_segments(take_hit, seg_starts, lengths)
+    if same_bar == "stop":
+        stop_first = stop_offset <= take_offset
+    else:
+        stop_first = stop_offset < take_offset
+    exit_offset = np.minimum(stop_offset, take_offset)
+    hit = exit_offset < lengths
+    exit_bar = np.where(hit, fill_bar + exit_offset, np.minimum(end, n - 1))
+    level = np.where(stop_first, stop, take)
+    # A candle that gaps through the level fills at its open
+    gap_open = o[np.minimum(exit_bar, n - 1)] if n else np.full(m, np.nan)
+    gapped = np.where(side > 0, np.where(stop_first, gap_open < level, gap_open > level),
+                      np.where(stop_first, gap_open > level, gap_open < level))
+    exit_price = np.where(hit, np.where(gapped, gap_open, level), np.where(end < n, o[np.minimum(end, n - 1)], c[n - 1] if n else np.nan))
+    exit_price = exit_price * (1 - side * slippage)
+    reason = np.where(~filled, UNFILLED, np.where(hit, np.where(stop_first, STOP, TAKE_PROFIT), CLOSED))
+
+    # Sizing and compounding
+    if risk_per_trade is not None:
+        distance = np.abs(entry_price - stop) / entry_price
+        size = np.where(np.isnan(distance) | (distance == 0), position_size, risk_per_trade / distance)
+    else:
+        size = np.full(len(side), position_size, dtype=np.float64)
+    size = np.where(filled & ~flat, np.minimum(size, max_leverage), 0.0)
+    gross = side * (exit_price / entry_price - 1)
+    fees = fee * (1 + exit_price / entry_price)
+    ret = np.where(filled, size * (gross - fees), 0.0)
+    equity_after = initial_equity * np.cumprod(1 + ret)
+    equity_before = np.r_[initial_equity, equity_after][:-1]
+
+    # Equity per candle: realised equity, marked to the close while a position is open
+    equity = np.full(n, initial_equity, dtype=np.float64)
+    exit_time_bar = np.where(filled, exit_bar, start)
+    realised = np.zeros(n, dtype=np.float64)
+    np.add.at(realised, np.minimum(exit_time_bar, n - 1), np.log1p(ret))
+    if n:
+        equity = initial_equity * np.exp(np.cumsum(realised))
+    held = filled & (exit_time_bar > fill_bar)
+    hold_lengths = np.where(held, exit_time_bar - fill_bar, 0)
+    hold_bars = np.repeat(fill_bar - (np.cumsum(hold_lengths) - hold_lengths), hold_lengths) + np.arange(hold_lengths.sum())
+    trade_of_bar = np.repeat(np.arange(len(side)), hold_lengths)
+    unrealised = size[trade_of_bar] * (side[trade_of_bar] * (c[hold_bars] / entry_price[trade_of_bar] - 1) - fee)
+    equity[hold_bars] = equity_before[trade_of_bar] * (1 + unrealised)
+
+    trades = pd.DataFrame({
+        "decision_time": decisions["time"].to_numpy(dtype=np.int64),
+        "side": side,
+        "entry_time": np.where(filled, open_time[np.minimum(fill_bar, n - 1)], -1),
+        "entry_price": np.where(filled, entry_price, np.nan),
+        "exit_time": np.where(filled, open_time[np.minimum(exit_bar, n - 1)], -1),
+        "exit_price": np.where(filled, exit_price, np.nan),
+        "reason": reason,
+        "size": size,
+        "return": ret,
+        "equity": equity_after,
+    })[~flat].reset_index(drop=True)
+    return {"trades": trades, "equity": equity, "stats": backtest_stats(trades, equity, initial_equity)}
+
+
+def backtest_stats(trades, equity, initial_equity):
+    """
+    Summary statistics of a backtest.
+    """
+    taken = trades[trades["reason"] != UNFILLED]
+    returns = taken["return"].to_numpy()
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = (equity / peak - 1).min() if len(equity) else 0.0
+    wins, losses = returns[returns > 0].sum(), -returns[returns < 0].sum()
+    return {
+        "trades": len(taken),
+        "total_return": float(equity[-1] / initial_equity - 1) if len(equity) else 0.0,
+        "max_drawdown": float(drawdown),
+        "win_rate": float((returns > 0).mean()) if len(returns) else 0.0,
+        "profit_factor": float(wins / losses) if losses > 0 else np.inf if wins > 0 else 0.0,
+        "stop_losses": int((taken["reason"] == STOP).sum()),
+        "take_profits": int((taken["reason"] == TAKE_PROFIT).sum()),
+    }
@@ -1,15 +1,23 @@
 import os
-import io
 from PIL import Image
-from dotenv import load_dotenv
 import pandas as pd
-import matplotlib.pyplot as plt
-import re
 import cv2
 import numpy as np
 import time
-import datetime
 from get_data import BinanceDataFetcher
+from indicators.streaming import IndicatorStream
+from indicators.anchored_vwap import AnchoredVWAP
+from indicators.registry import IndicatorContext
+from market_data.candle_store import CandleStore, KLINE_SCHEMA, to_epoch_ms, format_time, columns_to_frame, missing_ranges
+from market_data.resample import resample_many, FormingCandleIndex, interval_bounds
+from market_data.minute_cache import MinuteCache
+from market_data.candles import CandleSeries
+from market_data.align import align_timeframes
+from market_data.kline_buffer import parse_klines
+from market_data.prefetch import MinutePrefetcher
+from charts.pool import RenderPool
+from charts.cache import ChartCache
+from trading_env.backtester import backtest
 
 
 class TradingEnvironment:
@@ -27,11 +35,23 @@ class TradingEnvironment:
         end_date: str=None, 
         indicators: list=['rsi', 'vwap', 'supertrend'],
         min_candles: int=100,
-        time_increment: int=5
+        time_increment: int=5,
+        download_workers: int=1,
+        base_timeframe: str=None,
+        cache_flush_every: int=1000,
+        prefetch: str=None,
+        prefetch_chunk_minutes: int=7 * 24 * 60,
+        headless: bool=False,
+        save_charts: bool=False,
+        render_workers: int=1,
+        chart_cache_bytes: int=256 * 2**20,
+        chart_cache_dir: str=None,
+        precision: str='float64',
+        vwap_anchor: str=None
     ):
         self.api_key = api_key
         self.api_secret = api_secret
-        self.fetcher = BinanceDataFetcher(self.api_key, self.api_secret)
+        self.fetcher = BinanceDataFetcher(self.api_key, self.api_secret, workers=download_workers)
         self.symbol = symbol
         self.base_path = base_path
         self.save_path = save_path
@@ -42,131 +62,367 @@ class TradingEnvironment:
         self.indicators = indicators
         self.min_candles = min_candles
         self.time_increment = time_increment
+        # Headless: no printing and no GUI window, charts are only drawn when `render` is called
+        self.headless = headless
+        # One persistent figure per timeframe, redrawn in place every step; with render_workers > 1
+        # the timeframes are drawn in parallel by worker processes
+        # Charts whose plotted window did not change since an earlier step are served from the cache
+        self.chart_cache = ChartCache(max_memory_bytes=chart_cache_bytes, directory=chart_cache_dir)
+        self.renderer = RenderPool(render_workers, cache=self.chart_cache, save_png=save_charts)
+        # 'vwap' resets at every period of this interval ('1d', '1w', ...); None anchors it at the first loaded candle
+        self.vwap_anchor = vwap_anchor
+        # Float precision of the candle arrays held per timeframe, 'float32' halves their memory
+        self.precision = precision
+        # With a base timeframe (e.g. '1m') only that series is loaded and every timeframe is derived from it
+        self.base_timeframe = base_timeframe
+        self.base_store = CandleStore(self.base_path)
+        self.save_store = CandleStore(self.save_path)
+        # contains data on 1 minute timeframe, persisted to the save store in batches
+        self.minute_cache = MinuteCache(self.save_store, self.symbol, '1m', flush_every=cache_flush_every)
+        # Running aggregates of the 1 minute data, gives the forming candle of every timeframe in O(1)
+        self.forming_index = FormingCandleIndex(self.timeframes, base=self.minute_cache.buffer)
         self.get_data()
-        self.start_time = datetime.datetime.strptime(from_date, "%d %b %Y %H:%M:%S") if from_date is not None else datetime.datetime.now()-datetime.timedelta(days=1)
-        self.end_time = datetime.datetime.strptime(end_date, "%d %b %Y %H:%M:%S") if end_date is not None else datetime.datetime.now()
-        self.current_time = self.get_minimum_starting_time() if current_time is None else current_time
+        # The simulation clock is kept in epoch milliseconds, times are only parsed/formatted at the edges
+        now = int(time.time() * 1000)
+        self.start_time = to_epoch_ms(from_date) if from_date is not None else now - 24 * 60 * 60 * 1000
+        self.end_time = to_epoch_ms(end_date) if end_date is not None else now
+        self.current_time = self.get_minimum_starting_time() if current_time is None else to_epoch_ms(current_time)
         self.current_idxs = {timeframe: 0 for timeframe in self.timeframes}
-        self.cached_data = pd.DataFrame() # contains data on 1 minute timeframe
+        # One indicator stream per timeframe: closed candles are consumed once, the forming candle is revised in place.
+        # The forming candle's VWAP comes from the prefix sums in `self.vwap` instead.
+        self.indicator_streams = {
+            timeframe: IndicatorStream([indicator for indicator in self.indicators if indicator != 'vwap'])
+            for timeframe in self.timeframes
+        }
         os.makedirs(self.save_path, exist_ok=True)
+        # Historical 1 minute data is loaded ahead of the clock: 'background' streams it in chunks from a
+        # thread, 'bulk' loads the whole range now. Only minutes past the prefetched range hit the network per step.
+        self.prefetch = prefetch
+        self.prefetch_chunk_minutes = prefetch_chunk_minutes
+        self.prefetcher = None
+        if prefetch is not None:
+            self.start_prefetch()
 
-    def load_data(self, symbol: str="SOLUSDT", timeframe: str="15m", from_date: str="1 Jan 2024", end_date: str=None, load_local: bool=False):
+    def load_data(self, symbol: str="SOLUSDT", timeframe: str="15m", from_date: str="1 Jan 2024", end_date: str=None, load_local: bool=False, delta: bool=False):
+        """
+        Load candles as a DataFrame with epoch ms times; strings are only formatted for display.
+        """
         if load_local:
-            df = pd.read_csv(f"{self.base_path}/{symbol}_{timeframe}_data.csv")
-            return df
+            return self.base_store.read_frame(symbol, timeframe, from_date, end_date, time_format=None)
         else:
-            df = self.fetcher.get_historical_data(symbol, timeframe, from_date, end_date)
-            df.to_csv(f"{self.save_path}/{symbol}_{timeframe}_data.csv", index=False)
-            return df
+            columns = self.fetcher.get_historical_data(symbol, timeframe, from_date, end_date, delta=delta, as_frame=False)
+            self.save_store.append(symbol, timeframe, columns)
+            return columns_to_frame(columns, time_format=None)
+
+    def load_candles(self, symbol: str="SOLUSDT", timeframe: str="1m", from_date: str="1 Jan 2024", end_date: str=None, load_local: bool=False):
+        """
+        Like `load_data`, but as a `CandleSeries`: multi-year 1m history never goes through a DataFrame.
+        """
+        if load_local:
+            return CandleSeries(self.base_store.read(symbol, timeframe, from_date, end_date), self.precision)
+        columns = self.fetcher.get_historical_data(symbol, timeframe, from_date, end_date, as_frame=False)
+        self.save_store.append(symbol, timeframe, columns)
+        return CandleSeries(columns, self.precision)
+
+    @property
+    def data(self):
+        """
+        The candles of every timeframe as DataFrames (string times, indicator columns), built from
+        `arrays` on first access for callers that still want that layout, and kept until
+        `get_data` runs again.
+        """
+        if self.frames is None:
+            self.frames = {timeframe: self.arrays[timeframe].to_frame() for timeframe in self.timeframes}
+        return self.frames
 
     def get_data(self):
-        self.data = {}
+        self.features = None
+        self.frames = None
+        self.vwap = {}
+        self.times = {}
+        self.arrays = {}
+        if self.base_timeframe is not None:
+            base = self.load_candles(self.symbol, self.base_timeframe, self.from_date, self.end_date, load_local=self.load_local)
+            derived = resample_many(base, self.timeframes)
+            if self.base_timeframe == '1m':
+                self.add_minute_data(base, persisted=True)
         for timeframe in self.timeframes:
-            df = self.load_data(self.symbol, timeframe, self.from_date, self.end_date, load_local=self.load_local)
-            self.data[timeframe] = df
-            self.data[timeframe] = self.fetcher.add_indicator(self.data[timeframe], self.indicators)
-        return self.data
+            if self.base_timeframe is not None:
+                candles = CandleSeries(derived[timeframe], self.precision)
+            else:
+                candles = self.load_candles(self.symbol, timeframe, self.from_date, self.end_date, load_local=self.load_local)
+            # Typed arrays with epoch ms times, sliced per step (as views); the indicators are computed on them directly
+            self.arrays[timeframe] = candles.with_columns(**IndicatorContext(candles).compute(self.indicators))
+            # Sorted OpenTime index in epoch ms, parsed once so lookups never touch the strings again
+            self.times[timeframe] = self.arrays[timeframe].times
+            if 'vwap' in self.indicators:
+                # Prefix sums of the closed candles, any anchored VWAP is then O(1) per step
+                engine = AnchoredVWAP.from_candles(self.arrays[timeframe])
+                self.vwap[timeframe] = engine
+                if self.vwap_anchor is not None:
+                    self.arrays[timeframe] = self.arrays[timeframe].with_columns(vwap=engine.session(self.vwap_anchor))
+        return self.arrays
+
+    def fetch_minutes(self, start_time, end_time):
+        """
+        Load the 1 minute candles opened in [start_time, end_time] (epoch ms), from the save store
+        where a previous run left them and from the exchange for every range they do not cover
+        (before, between and after the stored rows).
+
+        Safe to call from the prefetch thread: it does not touch the fetcher's buffers or the cache.
+        """
+        stored = self.save_store.read(self.symbol, '1m', start_time, end_time)
+        parts = [stored]
+        for lo, hi in missing_ranges(stored['OpenTime'], start_time, end_time, 60 * 1000):
+            parts.append(parse_klines(self.fetcher.fetch_klines(self.symbol, '1m', lo, hi)))
+        if len(parts) == 1:
+            return stored
+        columns = {column: np.concatenate([part[column] for part in parts]) for column in stored}
+        order = np.argsort(columns['OpenTime'], kind='stable')
+        return {column: values[order] for column, values in columns.items()}
+
+    def start_prefetch(self):
+        """
+        Start loading the 1 minute candles needed between the current time and the end of the
+        historical range (end_date, or now), see `prefetch`.
+        """
+        _, times = self.get_index_from_time(self.current_time)
+        start_time = min(times)
+        if len(self.minute_cache):
+            start_time = max(start_time, self.minute_cache.last_open_time() + 60 * 1000)
+        end_time = min(self.end_time, int(time.time() * 1000))
+        if start_time > end_time:
+            return
+        if self.prefetch == 'bulk':
+            self.add_minute_data(self.fetch_minutes(start_time, end_time))
+        elif self.prefetch == 'background':
+            self.prefetcher = MinutePrefetcher(self.fetch_minutes, start_time, end_time, chunk_minutes=self.prefetch_chunk_minutes)
+        else:
+            raise ValueError(f"Unknown prefetch mode: {self.prefetch}")
+
+    def add_minute_data(self, columns, persisted: bool=False):
+        """
+        Append newly fetched 1 minute candles (kline columns, epoch ms times) to the cache and the forming candle index.
+        """
+        start, _ = self.minute_cache.append(columns, persisted=persisted)
+        self.forming_index.sync(changed=start)
+
+    def close(self):
+        """
+        Stop the prefetcher and the render workers, and persist any 1 minute candles still pending in the cache.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+        self.renderer.close()
+        self.minute_cache.flush()
 
-    def get_index_from_time(self, time:str):
+    def get_index_from_time(self, time):
+        """
+        Find, for every timeframe, the last candle opened at or before `time` (epoch ms or string).
+        Raises ValueError when `time` is before a timeframe's first candle.
+
+        Returns:
+        tuple: (current_idxs, times) with the OpenTime of each located candle in epoch ms.
+        """
+        target_time = to_epoch_ms(time)
         times = []
         for timeframe in self.timeframes:
-            df = self.data[timeframe]
-            target_time = datetime.datetime.strptime(time, "%d %b %Y %H:%M:%S")
-            df['OpenTimeTemp'] = pd.to_datetime(df['OpenTime'])
-            fil = df[df['OpenTimeTemp'] <= target_time]
-            idx = fil.index[-1]
+            idx = int(np.searchsorted(self.times[timeframe], target_time, side='right')) - 1
+            if idx < 0:
+                raise ValueError(f"{format_time(target_time)} is before the first {timeframe} candle")
             self.current_idxs[timeframe] = idx
-            times.append(df['OpenTime'][idx])
-            df.drop(columns=['OpenTimeTemp'], inplace=True)
+            times.append(int(self.times[timeframe][idx]))
         return self.current_idxs, times
     
+    def feature_table(self, columns=None):
+        """
+        The higher timeframes' columns (indicators included) projected onto every candle of the
+        lowest timeframe, using only candles closed by then (see `align_timeframes`). Built once
+        for the default columns; query a step with `feature_table().at(time)`.
+        """
+        if self.features is None or columns is not None:
+            # Timeframes are listed from the lowest to the highest, as in `get_minimum_starting_time`
+            base, higher = self.timeframes[0], self.timeframes[1:]
+            features = align_timeframes(self.arrays[base], {timeframe: self.arrays[timeframe] for timeframe in higher}, columns, self.precision)
+            if columns is not None:
+                return features
+            self.features = features
+        return self.features
+
     def get_minimum_starting_time(self):
-        return self.data[self.timeframes[-1]].iloc[self.min_candles+1]['OpenTime']
+        return int(self.times[self.timeframes[-1]][self.min_candles+1])
     
-    def get_chart_data(self, time:str):
+    def forming_vwap(self, timeframe, idx, forming):
+        """
+        VWAP through the forming candle in O(1): the prefix sums of the closed candles before
+        `idx` plus the forming candle's typical price x volume, from the current session start
+        when `vwap_anchor` is set.
+        """
+        engine = self.vwap[timeframe]
+        lo = 0
+        if self.vwap_anchor is not None:
+            session_start, _ = interval_bounds(np.array([forming['OpenTime']], dtype=np.int64), self.vwap_anchor)
+            lo = min(engine.index_of(int(session_start[0])), idx)
+        volume = forming['Volume']
+        typical = (forming['High'] + forming['Low'] + forming['Close']) / 3
+        return float(engine.between(lo, idx, typical * volume, volume))
+
+    def get_state(self, time):
+        """
+        Build the numeric multi-timeframe state at `time` (epoch ms or string), without any rendering.
+
+        Returns:
+        dict: timeframe -> {'window': column -> array of the last `min_candles` closed candles
+            (views, times in epoch ms, indicator columns included),
+            'forming': dict of the candle forming at `time` with its indicator values, or None}.
+        """
+        time = to_epoch_ms(time)
+        # Take over the prefetched 1 minute chunks up to the query time, this only waits if the replay overtook the download
+        if self.prefetcher is not None:
+            for columns in self.prefetcher.take_until(time + 1000):
+                self.add_minute_data(columns)
+
         # First get the times of each timeframe closest to the target time
         idxs, times = self.get_index_from_time(time)
         
         # Out of all the times, get the furthest time to get the data based on it
-        target_time = datetime.datetime.strptime(time, "%d %b %Y %H:%M:%S")
-        times = [datetime.datetime.strptime(t, "%d %b %Y %H:%M:%S") for t in times]
-        times = [t for t in times if t <= target_time]
-
-        idx = times.index(min(times))
-        furthest_time = times[idx]
-        start_time_for_data = furthest_time if len(self.cached_data) == 0 else self.cached_data.iloc[-1]['OpenTime']
-
-        # If the start time is not in string format, convert it to string format
-        if not isinstance(start_time_for_data, str):
-            start_time_for_data = datetime.datetime.strftime(start_time_for_data, "%d %b %Y %H:%M:%S")
+        furthest_time = min(times)
+        start_time_for_data = furthest_time if len(self.minute_cache) == 0 else self.minute_cache.last_open_time()
 
         # add 1 second to the time, to get latest data
-        time = datetime.datetime.strptime(time, "%d %b %Y %H:%M:%S") + datetime.timedelta(seconds=1)
-        time = datetime.datetime.strftime(time, "%d %b %Y %H:%M:%S")
+        time = time + 1000
                 
         # Get the data on the 1 minute timeframe to be able to create chart at timeframes lower than predefined timeframe.
         # For example if the timeframe is 1day, we get only 1 candle per day, so we use the 1 minute data to create the chart for the current day.
         # only get the data if the time difference is greater than 1 minute
-        if (datetime.datetime.strptime(time, "%d %b %Y %H:%M:%S") - datetime.datetime.strptime(start_time_for_data, "%d %b %Y %H:%M:%S")).total_seconds() > 60:
-            df = self.load_data(self.symbol, '1m', start_time_for_data, time, load_local=False)
-            self.cached_data = pd.concat([self.cached_data, df])
-        self.cached_data.to_csv(f"{self.save_path}/{self.symbol}_cached_data.csv", index=False)
+        if time - start_time_for_data > 60 * 1000:
+            # Only the newly fetched minutes are returned, as typed arrays, and only they are appended to the cache
+            columns = self.fetcher.get_historical_data(self.symbol, '1m', format_time(start_time_for_data), format_time(time), delta=True, as_frame=False)
+            self.add_minute_data(columns)
         # For each timeframe, get the data to be the data taken until current query time + last 100 candles. The current candle data has to be taken from query time.
         # Use the idxs to get the current point for each timeframe to take the data from. Then add the new data from cached data for the pending time. Compute open high,low,close, etc etc by aggregating the data.
-        imgs, figs = [], []
-        
-        
-        for i, timeframe in enumerate(self.timeframes):
-            current_df = self.data[timeframe].iloc[idxs[timeframe]-self.min_candles:idxs[timeframe]]
-            
-            if len(self.cached_data) > 0:
-                # get the corresponding portion from cached data that lies between times[i] and time
-                cached_df = self.cached_data[pd.to_datetime(self.cached_data['OpenTime']) >= times[i]]
-                cached_df = cached_df[pd.to_datetime(cached_df['OpenTime']) <= pd.to_datetime(time)]
-            else:
-                cached_df = pd.DataFrame()
-            if not cached_df.empty:
-                # Aggregate the columns
-                aggregated = {
-                    "OpenTime": cached_df["OpenTime"].iloc[0],  # Start time
-                    "Open": cached_df["Open"].iloc[0],         # First open value
-                    "High": cached_df["High"].max(),           # Max high
-                    "Low": cached_df["Low"].min(),             # Min low
-                    "Close": cached_df["Close"].iloc[-1],      # Last close value
-                    "Volume": cached_df["Volume"].sum(),       # Total volume
-                    "CloseTime": cached_df["CloseTime"].iloc[-1],  # End time
-                    "QuoteAssetVolume": cached_df["QuoteAssetVolume"].sum(),  # Total quote volume
-                    "NumberOfTrades": cached_df["NumberOfTrades"].sum(),      # Total number of trades
-                    "TakerBuyBaseAssetVolume": cached_df["TakerBuyBaseAssetVolume"].sum(),  # Total taker buy base
-                    "TakerBuyQuoteAssetVolume": cached_df["TakerBuyQuoteAssetVolume"].sum(), # Total taker buy quote
-                    "Ignore": 0.0,
-                }
-
-                # Convert the aggregated result to a DataFrame
-                aggregated_df = pd.DataFrame([aggregated])
-                columns = aggregated_df.columns
-
-                # merge the two dataframes
-                df = pd.concat([current_df[columns], aggregated_df[columns]])
-            else:
-                df = current_df
-            # add indicators
-            df = self.fetcher.add_indicator(df, self.indicators)
-            print(timeframe)
-            print(df[['OpenTime','CloseTime']].tail(10))
-
-            img, fig = self.fetcher.plot_candlestick_and_volume(df, timeframe)
-            imgs.append(img)
-            figs.append(fig)
-        #imshow only the last image with opencv
-        cv2.imshow('Chart', cv2.cvtColor(np.array(imgs[0]), cv2.COLOR_RGB2BGR))
-        cv2.waitKey()
+        state = {}
+        for timeframe in self.timeframes:
+            idx = idxs[timeframe]
+            arrays = self.arrays[timeframe]
+            # Fewer than `min_candles` closed candles near the start of the data: the window is shorter, never wrapped
+            window = arrays[max(idx - self.min_candles, 0):idx]
+
+            # The forming candle of this timeframe, aggregated from the 1 minute data up to the query time
+            forming = self.forming_index.forming(timeframe, time)
+            if forming is not None:
+                # Only the forming candle needs new indicator values, the closed candles already carry them
+                stream = self.indicator_streams[timeframe].advance(arrays, idx)
+                forming.update(stream.update(forming, closed=False))
+                if timeframe in self.vwap:
+                    forming['vwap'] = self.forming_vwap(timeframe, idx, forming)
+            state[timeframe] = {'window': window, 'forming': forming}
+        return state
+
+    def state_columns(self, timeframe_state):
+        """
+        One timeframe of `get_state` as columns: the window followed by the forming candle, times in epoch ms.
+        This is what the charts are drawn from.
+        """
+        window, forming = timeframe_state['window'], timeframe_state['forming']
+        if forming is None:
+            return dict(window)
+        return {column: np.append(values, forming[column]) for column, values in window.items()}
+
+    def state_frame(self, timeframe_state):
+        """
+        Convert one timeframe of `get_state` to the DataFrame layout of the loaded data (string times, 'Ignore' column).
+        Only needed for display, charts take `state_columns`.
+        """
+        df = columns_to_frame(self.state_columns(timeframe_state))
+        df.insert(len(KLINE_SCHEMA), 'Ignore', 0)
+        return df
+
+    def chart_images(self, state):
+        """
+        Plot every timeframe of a `get_state` result, without printing or showing anything.
+
+        Returns:
+        list: One PIL image per timeframe.
+        """
+        frames = [self.state_columns(state[timeframe]) for timeframe in self.timeframes]
+        return [Image.fromarray(rgb) for rgb in self.renderer.render_many(frames, self.timeframes)]
+
+    def render(self, state):
+        """
+        Plot every timeframe of a `get_state` result. Outside headless mode the first chart is
+        also shown in a window, which waits for a key press.
+        """
+        if not self.headless:
+            for timeframe in self.timeframes:
+                print(timeframe)
+                print(self.state_frame(state[timeframe])[['OpenTime','CloseTime']].tail(10))
+        imgs = self.chart_images(state)
+        figs = [self.renderer.figure(timeframe) for timeframe in self.timeframes]
+        if not self.headless:
+            #imshow only the last image with opencv
+            cv2.imshow('Chart', cv2.cvtColor(np.asarray(imgs[0]), cv2.COLOR_RGB2BGR))
+            cv2.waitKey()
         return imgs, figs
-    
+
+    def get_chart_data(self, time):
+        return self.render(self.get_state(time))
+
+    def steps(self, start=None, end=None, increment: int=None):
+        """
+        Step the clock from `start` to `end` (inclusive) and yield the state at every step, with no rendering.
+
+        Parameters:
+        start (int | str): First step time, defaults to the current time.
+        end (int | str): Last step time, defaults to the end of the loaded range.
+        increment (int): Minutes per step, defaults to time_increment.
+
+        Yields:
+        tuple: (time in epoch ms, state as returned by `get_state`). Pass the state to `render`
+            to plot a particular step.
+        """
+        current = self.current_time if start is None else to_epoch_ms(start)
+        end = self.end_time if end is None else to_epoch_ms(end)
+        increment = (self.time_increment if increment is None else increment) * 60 * 1000
+        while current <= end:
+            state = self.get_state(current)
+            self.current_time = current + increment
+            yield current, state
+            current = self.current_time
+
+    def record_agent_requests(self, agent, batch, start=None, end=None, increment: int=None):
+        """
+        Replay the steps from `start` to `end` and record the request `agent` would send at each
+        one in `batch` (an `agents.batch.BatchRun`), for offline batch submission.
+
+        Steps recorded by an earlier, interrupted run are skipped without rendering. Charts are
+        rendered without the printing and window of `render`, so replays never wait for a key.
+
+        Returns:
+        int: The number of requests recorded.
+        """
+        recorded = 0
+        for step_time, state in self.steps(start, end, increment):
+            if batch.has(step_time, agent):
+                continue
+            batch.record(step_time, agent, self.chart_images(state))
+            recorded += 1
+        return recorded
+
+    def backtest(self, decisions, start=None, end=None, **kwargs):
+        """
+        Backtest a decision table (see `trading_env.backtester.backtest`) on the 1 minute candles
+        from `start` (default: the first decision) to `end` (default: the end of the environment).
+        """
+        decisions = pd.DataFrame(decisions)
+        start = int(decisions['time'].min()) if start is None else to_epoch_ms(start)
+        end = self.end_time if end is None else to_epoch_ms(end)
+        return backtest(self.fetch_minutes(start, end), decisions, **kwargs)
+
     def get_next_time(self):
         imgs, figs = self.get_chart_data(self.current_time)
-        self.current_time = datetime.datetime.strptime(self.current_time, "%d %b %Y %H:%M:%S") + datetime.timedelta(minutes=self.time_increment)
-        self.current_time = datetime.datetime.strftime(self.current_time, "%d %b %Y %H:%M:%S")
+        self.current_time += self.time_increment * 60 * 1000
         return imgs, figs
 
 if __name__ == "__main__":
@@ -189,8 +445,12 @@ if __name__ == "__main__":
     # _, times = env.get_index_from_time(start_time)
 
     for i in range(10):
-        print('current time',env.current_time)
+        print('current time', format_time(env.current_time))
         env.get_next_time()
         time.sleep(1)
+    env.close()
+    # Headless replay at machine speed (construct with headless=True, prefetch='bulk'), rendering only when needed:
+    # for step_time, state in env.steps(increment=5):
+    #     imgs, figs = env.render(state)
     # env.get_chart_data("1 Nov 2024 11:16:00")
     # env.get_chart_data("1 Nov 2024 11:28:00")